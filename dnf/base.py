@@ -23,25 +23,21 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
-from dnf.comps import CompsQuery
 from dnf.i18n import _, P_, ucd
 from dnf.util import first
-from dnf.yum import history
 from dnf.yum import misc
 from dnf.yum import rpmsack
 from functools import reduce
 import dnf.callback
-import dnf.comps
 import dnf.conf
 import dnf.conf.read
 import dnf.crypto
-import dnf.drpm
 import dnf.exceptions
 import dnf.goal
-import dnf.history
 import dnf.lock
 import dnf.logging
 import dnf.persistor
+import dnf.pkgstore
 import dnf.plugin
 import dnf.query
 import dnf.repo
@@ -76,11 +72,13 @@ class Base(object):
         self._conf = conf or self._setup_default_conf()
         self._goal = None
         self._persistor = None
+        self._mirror_stats = None
         self._sack = None
         self._transaction = None
         self._ts = None
         self._comps = None
         self._history = None
+        self._history_synced = False
         self._tempfiles = set()
         self.ds_callback = dnf.callback.Depsolve()
         self.group_persistor = None
@@ -95,15 +93,9 @@ class Base(object):
     def __exit__(self, *exc_args):
         self.close()
 
-    def _add_repo_to_sack(self, name):
+    def _add_repo_to_sack(self, name, load_filelists=True):
         repo = self.repos[name]
-        try:
-            repo.load()
-        except dnf.exceptions.RepoError as e:
-            if repo.skip_if_unavailable is False:
-                raise
-            logger.warning(_("%s, disabling."), e)
-            repo.disable()
+        if not self._sync_repo(repo):
             return
         hrepo = repo.hawkey_repo
         hrepo.repomd_fn = repo.repomd_fn
@@ -118,10 +110,42 @@ class Base(object):
             hrepo.updateinfo_fn = repo.updateinfo_fn
         else:
             logger.debug("not found updateinfo for: %s" % repo.name)
-        self._sack.load_repo(hrepo, build_cache=True, load_filelists=True,
+        self._sack.load_repo(hrepo, build_cache=True,
+                             load_filelists=load_filelists,
                              load_presto=repo.deltarpm,
                              load_updateinfo=True)
 
+    def _sync_repo(self, repo):
+        """Load the repo metadata, return False if the repo was skipped."""
+        try:
+            repo.load()
+        except dnf.exceptions.RepoError as e:
+            if repo.skip_if_unavailable is False:
+                raise
+            logger.warning(_("%s, disabling."), e)
+            repo.disable()
+            return False
+        return True
+
+    def _sync_repos(self, repos, timer):
+        """Load metadata of `repos`, running up to max_parallel_md_syncs at once.
+
+        Yields the repos in order, each as soon as its metadata are ready while
+        the following are still being synchronized. Repos that fail to
+        synchronize and can be skipped get disabled. Repos checking the repomd
+        signature are left to _add_repo_to_sack(), they might need to prompt for
+        a key import.
+
+        """
+        def sync(repo):
+            if not repo.repo_gpgcheck:
+                stage = dnf.logging.Timer('metadata sync: %s' % repo.id, timer)
+                self._sync_repo(repo)
+                stage()
+            return repo
+        return dnf.util.parallel_imap(sync, repos,
+                                      self.conf.max_parallel_md_syncs)
+
     @staticmethod
     def _setup_default_conf():
         conf = dnf.conf.Conf()
@@ -140,13 +164,13 @@ class Base(object):
         if 'all' in disabled:
             return
         if 'main' not in disabled:
-            for excl in self.conf.exclude:
-                subj = dnf.subject.Subject(excl)
-                pkgs = subj.get_best_query(self.sack)
+            # resolved all at once, as every change to the sack drops the
+            # memoized resolutions:
+            excludes = dnf.subject.resolve_specs(self.sack, self.conf.exclude)
+            includes = dnf.subject.resolve_specs(self.sack, self.conf.include)
+            for pkgs in excludes:
                 self.sack.add_excludes(pkgs)
-            for incl in self.conf.include:
-                subj = dnf.subject.Subject(incl)
-                pkgs = subj.get_best_query(self.sack)
+            for pkgs in includes:
                 self.sack.add_includes(pkgs)
         for r in self.repos.iter_enabled():
             if r.id in disabled:
@@ -172,6 +196,8 @@ class Base(object):
             expired = [r.id for r in self.repos.iter_enabled()
                        if check_expired(r)]
             self._persistor.set_expired_repos(expired)
+        if self._mirror_stats:
+            self._mirror_stats.save()
 
         if self.group_persistor:
             self.group_persistor.save()
@@ -221,8 +247,10 @@ class Base(object):
 
     def activate_persistor(self):
         self._persistor = dnf.persistor.RepoPersistor(self.conf.cachedir)
+        self._mirror_stats = dnf.persistor.MirrorPersistor(self.conf.cachedir)
 
-    def fill_sack(self, load_system_repo=True, load_available_repos=True):
+    def fill_sack(self, load_system_repo=True, load_available_repos=True,
+                  load_filelists=True):
         """Prepare the Sack and the Goal objects. :api."""
         timer = dnf.logging.Timer('sack setup')
         self._sack = dnf.sack.build_sack(self)
@@ -235,8 +263,16 @@ class Base(object):
                     if load_system_repo != 'auto':
                         raise
             if load_available_repos:
-                for r in self.repos.iter_enabled():
-                    self._add_repo_to_sack(r.id)
+                repos = list(self.repos.iter_enabled())
+                if self._mirror_stats is not None:
+                    for r in repos:
+                        r.mirror_stats = self._mirror_stats
+                for r in self._sync_repos(repos, timer):
+                    if not r.enabled:
+                        continue
+                    stage = dnf.logging.Timer('sack load: %s' % r.id, timer)
+                    self._add_repo_to_sack(r.id, load_filelists)
+                    stage()
         conf = self.conf
         self._sack.configure(conf.installonlypkgs, conf.installonly_limit)
         self._setup_excludes_includes()
@@ -248,6 +284,8 @@ class Base(object):
     @dnf.util.lazyattr("_yumdb")
     def yumdb(self):
         db_path = os.path.normpath(self.conf.persistdir + '/yumdb')
+        if self.conf.yumdb_backend == 'sqlite':
+            return rpmsack.SqliteAdditionalPkgDB(db_path + '.sqlite', db_path)
         return rpmsack.AdditionalPkgDB(db_path)
 
     def close(self):
@@ -269,6 +307,10 @@ class Base(object):
         # Do not trigger the lazy creation:
         if self._history is not None:
             self.history.close()
+        yumdb = getattr(self, '_yumdb', None)
+        if yumdb is not None:
+            yumdb.close()
+            del self._yumdb
         self._store_persistent_data()
         self.closeRpmDB()
 
@@ -348,6 +390,7 @@ class Base(object):
 
     def read_comps(self):
         """Create the groups object to access the comps metadata. :api"""
+        import dnf.comps
         timer = dnf.logging.Timer('loading comps')
         self.group_persistor = self._activate_group_persistor()
         self._comps = dnf.comps.Comps()
@@ -385,12 +428,13 @@ class Base(object):
     def _getHistory(self):
         """auto create the history object that to access/append the transaction
            history information. """
+        import dnf.yum.history
         if self._history is None:
             db_path = self.conf.persistdir + "/history"
             releasever = self.conf.releasever
-            self._history = history.YumHistory(db_path, self.yumdb,
-                                               root=self.conf.installroot,
-                                               releasever=releasever)
+            self._history = dnf.yum.history.YumHistory(
+                db_path, self.yumdb, root=self.conf.installroot,
+                releasever=releasever)
         return self._history
 
     history = property(fget=lambda self: self._getHistory(),
@@ -466,11 +510,24 @@ class Base(object):
         inst = inst.filter(pkg=sltr.matches())
         return list(inst)
 
-    def iter_userinstalled(self):
-        """Get iterator over the packages installed by the user."""
-        return (pkg for pkg in self.sack.query().installed()
-                if self.yumdb.get_package(pkg).get('reason') == 'user' and
-                self.yumdb.get_package(pkg).get('from_repo') != 'anakonda')
+    def iter_userinstalled(self, history=None):
+        """Get iterator over the packages installed by the user.
+
+        If `history` is given, the yumdb data it recorded at the end of the
+        transactions are used, and only the packages it does not know are
+        read from the yumdb. The whole yumdb is read instead when the rpmdb
+        or the yumdb changed since the last transaction.
+
+        """
+        installed = self.sack.query().installed().run()
+        get_attrs = self.yumdb.get_attrs
+        if history is not None and \
+           history.yumdb_synced(self._rpmdb_version(self.sack)):
+            get_attrs = history.get_yumdb_attrs
+        attrs = get_attrs(installed, ('reason', 'from_repo'))
+        return (pkg for pkg in installed
+                if attrs[pkg].get('reason') == 'user' and
+                attrs[pkg].get('from_repo') != 'anakonda')
 
     def run_hawkey_goal(self, goal, allow_erasing):
         ret = goal.run(
@@ -609,6 +666,21 @@ class Base(object):
         return self.conf.history_record and \
             not self.ts.isTsFlagSet(rpm.RPMTRANS_FLAG_TEST)
 
+    def _rpmdb_version(self, sack):
+        """Return the version of the rpmdb `sack` was loaded from.
+
+        It is stored with the current rpmdb cookie and only computed again
+        when the rpmdb or the yumdb, which has the checksums, changes.
+
+        """
+        cookie = dnf.rpm.rpmdb_cookie(self.conf.installroot, self.yumdb)
+        persistor = dnf.persistor.RpmdbPersistor(self.conf.cachedir)
+        version = persistor.get_version(cookie)
+        if version is None:
+            version = str(sack.rpmdb_version(self.yumdb))
+            persistor.set_version(cookie, version)
+        return version
+
     def _run_transaction(self, cb):
         """Perform the RPM transaction."""
 
@@ -616,13 +688,14 @@ class Base(object):
             using_pkgs_pats = list(self.conf.history_record_packages)
             installed_query = self.sack.query().installed()
             using_pkgs = installed_query.filter(name=using_pkgs_pats).run()
-            rpmdbv = self.sack.rpmdb_version(self.yumdb)
+            rpmdbv = self._rpmdb_version(self.sack)
             lastdbv = self.history.last()
             if lastdbv is not None:
                 lastdbv = lastdbv.end_rpmdbversion
 
             if lastdbv is None or rpmdbv != lastdbv:
                 logger.debug("RPMDB altered outside of DNF.")
+            self._history_synced = self.history.yumdb_synced(rpmdbv)
 
             cmdline = None
             if hasattr(self, 'args') and self.args:
@@ -732,74 +805,94 @@ class Base(object):
         # tell us if a particular transaction element failed or not we can skip
         # this completely.
         rpmdb_sack = dnf.sack.rpmdb_sack(self)
-
+        now_installed = {(po.name, po.evr, po.arch) : po
+                         for po in rpmdb_sack.query().installed()}
+
+        erased = [tsi.erased for tsi in self._transaction
+                  if tsi.installed is not None and tsi.erased is not None]
+        # read them all at once, propagated_reason() then hits the cache:
+        erased_info = self.yumdb.get_attrs(erased, ('reason', 'installed_by'))
+        loginuid = misc.getloginuid()
+        command_line = None
+        if hasattr(self, 'args') and self.args:
+            command_line = ' '.join(self.args)
+        elif hasattr(self, 'cmds') and self.cmds:
+            command_line = ' '.join(self.cmds)
+
+        stage = dnf.logging.Timer('verify transaction: yumdb', timer)
+        yumdb_items = []
+        synced = []
         for tsi in self._transaction:
             rpo = tsi.installed
             if rpo is None:
                 continue
 
-            installed = rpmdb_sack.query().installed().nevra(
-                rpo.name, rpo.evr, rpo.arch)
-            if len(installed) < 1:
+            po = now_installed.get((rpo.name, rpo.evr, rpo.arch))
+            if po is None:
                 logger.critical(_('%s was supposed to be installed'
                                   ' but is not!' % rpo))
                 count = display_banner(rpo, count)
                 continue
-            po = installed[0]
             count = display_banner(rpo, count)
-            yumdb_info = self.yumdb.get_package(po)
-            yumdb_info.from_repo = rpo.repoid
-
-            yumdb_info.reason = tsi.propagated_reason(self.yumdb,
-                                                      self.conf.installonlypkgs)
-            yumdb_info.releasever = self.conf.releasever
-            if hasattr(self, 'args') and self.args:
-                yumdb_info.command_line = ' '.join(self.args)
-            elif hasattr(self, 'cmds') and self.cmds:
-                yumdb_info.command_line = ' '.join(self.cmds)
+            info = {}
+            info['from_repo'] = rpo.repoid
+
+            info['reason'] = tsi.propagated_reason(self.yumdb,
+                                                   self.conf.installonlypkgs)
+            info['releasever'] = self.conf.releasever
+            if command_line is not None:
+                info['command_line'] = command_line
             csum = rpo.returnIdSum()
             if csum is not None:
-                yumdb_info.checksum_type = str(csum[0])
-                yumdb_info.checksum_data = csum[1]
+                info['checksum_type'] = str(csum[0])
+                info['checksum_data'] = csum[1]
 
             if rpo.from_cmdline:
                 try:
                     st = os.stat(rpo.localPkg())
                     lp_ctime = str(int(st.st_ctime))
                     lp_mtime = str(int(st.st_mtime))
-                    yumdb_info.from_repo_revision = lp_ctime
-                    yumdb_info.from_repo_timestamp = lp_mtime
+                    info['from_repo_revision'] = lp_ctime
+                    info['from_repo_timestamp'] = lp_mtime
                 except Exception:
                     pass
             elif hasattr(rpo.repo, 'repoXML'):
                 md = rpo.repo.repoXML
                 if md and md.revision is not None:
-                    yumdb_info.from_repo_revision = str(md.revision)
+                    info['from_repo_revision'] = str(md.revision)
                 if md:
-                    yumdb_info.from_repo_timestamp = str(md.timestamp)
+                    info['from_repo_timestamp'] = str(md.timestamp)
 
-            loginuid = misc.getloginuid()
             if tsi.op_type in (dnf.transaction.DOWNGRADE,
                                dnf.transaction.REINSTALL,
                                dnf.transaction.UPGRADE):
-                opo = tsi.erased
-                opo_yumdb_info = self.yumdb.get_package(opo)
-                if 'installed_by' in opo_yumdb_info:
-                    yumdb_info.installed_by = opo_yumdb_info.installed_by
+                installed_by = erased_info[tsi.erased].get('installed_by')
+                if installed_by is not None:
+                    info['installed_by'] = installed_by
                 if loginuid is not None:
-                    yumdb_info.changed_by = str(loginuid)
+                    info['changed_by'] = str(loginuid)
             elif loginuid is not None:
-                yumdb_info.installed_by = str(loginuid)
-
-            if self.conf.history_record:
-                self.history.sync_alldb(po)
+                info['installed_by'] = str(loginuid)
+
+            yumdb_items.extend((po, attr, value)
+                               for (attr, value) in info.items())
+            synced.append(po)
+        self.yumdb.write_attrs(yumdb_items)
+        stage()
+
+        history_synced = False
+        if self.conf.history_record:
+            stage = dnf.logging.Timer('verify transaction: history', timer)
+            if not self._history_synced:
+                # the yumdb changed outside of the history, sync all of it
+                synced = list(rpmdb_sack.query().installed())
+            history_synced = self.history.sync_alldb_pkgs(synced)
+            stage()
 
         just_installed = self.sack.query().\
             filter(pkg=self.transaction.install_set)
         for rpo in self.transaction.remove_set:
-            installed = rpmdb_sack.query().installed().nevra(
-                rpo.name, rpo.evr, rpo.arch)
-            if len(installed) > 0:
+            if (rpo.name, rpo.evr, rpo.arch) in now_installed:
                 if not len(just_installed.filter(arch=rpo.arch, name=rpo.name,
                                                  evr=rpo.evr)):
                     msg = _('%s was supposed to be removed but is not!')
@@ -811,7 +904,9 @@ class Base(object):
             yumdb_item.clean()
 
         if self._record_history():
-            rpmdbv = rpmdb_sack.rpmdb_version(self.yumdb)
+            rpmdbv = self._rpmdb_version(rpmdb_sack)
+            if history_synced:
+                self.history.mark_yumdb_synced()
             self.history.end(rpmdbv, 0)
         timer()
 
@@ -824,17 +919,26 @@ class Base(object):
 
         """
 
+        import dnf.drpm
         # select and sort packages to download
         if progress is None:
             progress = dnf.callback.NullDownloadProgress()
 
         lock = dnf.lock.build_download_lock(self.conf.cachedir)
         with lock:
-            drpm = dnf.drpm.DeltaInfo(self.sack.query().installed(), progress)
+            stats = dnf.persistor.DeltaPersistor(self.conf.cachedir)
+            drpm = dnf.drpm.DeltaInfo(self.sack.query().installed(), progress,
+                                      stats)
             remote_pkgs = [po for po in pkglist
                            if not (po.from_cmdline or po.repo.local)]
             for pkg in remote_pkgs:
                 self._tempfiles.add(pkg.localPkg())
+            store = None
+            if self.conf.pkgstore:
+                store = dnf.pkgstore.PackageStore(self.conf.pkgstore)
+                wanted = remote_pkgs
+                remote_pkgs = [pkg for pkg in remote_pkgs
+                               if not store.fetch(pkg)]
             payloads = [dnf.repo.pkg2payload(pkg, progress, drpm.delta_factory,
                                              dnf.repo.RPMPayload)
                         for pkg in remote_pkgs]
@@ -849,6 +953,7 @@ class Base(object):
 
             remote_size = sum(errors.bandwidth_used(pload)
                               for pload in payloads)
+            stats.record_download(remote_size, errors.download_time)
             saving = dnf.repo.update_saving((0, 0), payloads,
                                             errors.recoverable)
 
@@ -870,9 +975,15 @@ class Base(object):
                 if errors.irrecoverable:
                     raise dnf.exceptions.DownloadError(errors.irrecoverable)
 
-                remote_size += \
+                retry_size = \
                     sum(errors.bandwidth_used(pload) for pload in payloads)
+                stats.record_download(retry_size, errors.download_time)
+                remote_size += retry_size
                 saving = dnf.repo.update_saving(saving, payloads, {})
+            stats.save()
+            if store is not None:
+                for pkg in wanted:
+                    store.store(pkg)
 
         if callback_total is not None:
             callback_total(remote_size, beg_download)
@@ -883,6 +994,11 @@ class Base(object):
                     "(%d.1%% saved)")
             percent = 100 - real / full * 100
             logger.info(msg, full / 1024 ** 2, real / 1024 ** 2, percent)
+            if drpm.est_full_time:
+                msg = _("Delta RPMs estimated to take %.1f s instead of "
+                        "%.1f s, rebuilds took %.1f s")
+                logger.info(msg, drpm.est_delta_time, drpm.est_full_time,
+                            drpm.rebuild_time)
 
     def add_remote_rpm(self, path):
         # :api
@@ -892,6 +1008,68 @@ class Base(object):
             self._tempfiles.add(path)
         return self.sack.add_cmdline_package(path)
 
+    def _sig_check_params(self, po):
+        # whether to check the signature of po and whether it has a key to import
+        if po.from_cmdline:
+            return self.conf.localpkg_gpgcheck, False
+        repo = self.repos[po.repoid]
+        return repo.gpgcheck, not not repo.gpgkey
+
+    def _sig_check_result(self, po, hasgpgkey, sigresult):
+        localfn = os.path.basename(po.localPkg())
+
+        if sigresult == 0:
+            result = 0
+            msg = ''
+
+        elif sigresult == 1:
+            if hasgpgkey:
+                result = 1
+            else:
+                result = 2
+            msg = _('Public key for %s is not installed') % localfn
+
+        elif sigresult == 2:
+            result = 2
+            msg = _('Problem opening package %s') % localfn
+
+        elif sigresult == 3:
+            if hasgpgkey:
+                result = 1
+            else:
+                result = 2
+            result = 1
+            msg = _('Public key for %s is not trusted') % localfn
+
+        elif sigresult == 4:
+            result = 2
+            msg = _('Package %s is not signed') % localfn
+
+        return result, msg
+
+    def _sig_check_pkgs(self, pkgs):
+        """Like sigCheckPkg() for each of pkgs, in several processes at once."""
+        params = [self._sig_check_params(po) for po in pkgs]
+        paths = [po.localPkg() for (po, (check, _)) in zip(pkgs, params)
+                 if check]
+        if len(paths) < 2:
+            return [self.sigCheckPkg(po) for po in pkgs]
+        try:
+            sigresults = iter(dnf.rpm.miscutils.checkSigs(
+                self.conf.installroot, paths))
+        except OSError as e:
+            logger.debug('Cannot check the signatures in parallel: %s', e)
+            return [self.sigCheckPkg(po) for po in pkgs]
+
+        results = []
+        for (po, (check, hasgpgkey)) in zip(pkgs, params):
+            if check:
+                results.append(
+                    self._sig_check_result(po, hasgpgkey, next(sigresults)))
+            else:
+                results.append((0, ''))
+        return results
+
     def sigCheckPkg(self, po):
         """Verify the GPG signature of the given package object.
 
@@ -904,51 +1082,12 @@ class Base(object):
                     might help.
               2 = Fatal GPG verification error, give up.
         """
-        if po.from_cmdline:
-            check = self.conf.localpkg_gpgcheck
-            hasgpgkey = 0
-        else:
-            repo = self.repos[po.repoid]
-            check = repo.gpgcheck
-            hasgpgkey = not not repo.gpgkey
-
-        if check:
-            ts = self.rpmconn.readonly_ts
-            sigresult = dnf.rpm.miscutils.checkSig(ts, po.localPkg())
-            localfn = os.path.basename(po.localPkg())
-
-            if sigresult == 0:
-                result = 0
-                msg = ''
-
-            elif sigresult == 1:
-                if hasgpgkey:
-                    result = 1
-                else:
-                    result = 2
-                msg = _('Public key for %s is not installed') % localfn
-
-            elif sigresult == 2:
-                result = 2
-                msg = _('Problem opening package %s') % localfn
-
-            elif sigresult == 3:
-                if hasgpgkey:
-                    result = 1
-                else:
-                    result = 2
-                result = 1
-                msg = _('Public key for %s is not trusted') % localfn
-
-            elif sigresult == 4:
-                result = 2
-                msg = _('Package %s is not signed') % localfn
-
-        else:
-            result = 0
-            msg = ''
-
-        return result, msg
+        check, hasgpgkey = self._sig_check_params(po)
+        if not check:
+            return 0, ''
+        ts = self.rpmconn.readonly_ts
+        sigresult = dnf.rpm.miscutils.checkSig(ts, po.localPkg())
+        return self._sig_check_result(po, hasgpgkey, sigresult)
 
     def clean_used_packages(self):
         """Delete the header and package files used in the
@@ -967,7 +1106,7 @@ class Base(object):
                            _('%s removed'), fn)
 
     def doPackageLists(self, pkgnarrow='all', patterns=None, showdups=None,
-                       ignore_case=False, reponame=None):
+                       ignore_case=False, reponame=None, names=None):
         """Return a :class:`misc.GenericHolder` containing
         lists of package objects.  The contents of the lists are
         specified in various ways by the arguments.
@@ -982,6 +1121,7 @@ class Base(object):
         :param ignore_case: whether to ignore case when searching by
            package names
         :param reponame: limit packages list to the given repository
+        :param names: limit packages list to the packages of these names
         :return: a :class:`misc.GenericHolder` instance with the
            following lists defined::
 
@@ -996,28 +1136,27 @@ class Base(object):
             showdups = self.conf.showdupesfromrepos
         if patterns is None:
             return self._list_pattern(
-                pkgnarrow, patterns, showdups, ignore_case, reponame)
+                pkgnarrow, patterns, showdups, ignore_case, reponame, names)
 
         assert not dnf.util.is_string_type(patterns)
         list_fn = functools.partial(
             self._list_pattern, pkgnarrow, showdups=showdups,
-            ignore_case=ignore_case, reponame=reponame)
+            ignore_case=ignore_case, reponame=reponame, names=names)
         if patterns is None or len(patterns) == 0:
             return list_fn(None)
         yghs = map(list_fn, patterns)
         return reduce(lambda a, b: a.merge_lists(b), yghs)
 
     def _list_pattern(self, pkgnarrow, pattern, showdups, ignore_case,
-                      reponame=None):
-        def is_from_repo(package):
-            """Test whether given package originates from the repository."""
-            if reponame is None:
-                return True
-            return self.yumdb.get_package(package).get('from_repo') == reponame
-
+                      reponame=None, names=None):
         def pkgs_from_repo(packages):
             """Filter out the packages which do not originate from the repo."""
-            return (package for package in packages if is_from_repo(package))
+            if reponame is None:
+                return packages
+            packages = list(packages)
+            attrs = self.yumdb.get_attrs(packages, ('from_repo',))
+            return [package for package in packages
+                    if attrs[package].get('from_repo') == reponame]
 
         def query_for_repo(query):
             """Filter out the packages which do not originate from the repo."""
@@ -1044,6 +1183,8 @@ class Base(object):
         if pattern is not None:
             subj = dnf.subject.Subject(pattern, ignore_case=ic)
             q = subj.get_best_query(self.sack, with_provides=False)
+        if names is not None:
+            q = q.filter(name=names)
 
         # list all packages - those installed and available:
         if pkgnarrow == 'all':
@@ -1120,7 +1261,7 @@ class Base(object):
 
         # not in a repo but installed
         elif pkgnarrow == 'extras':
-            extras = [pkg for pkg in dnf.query.extras_pkgs(q) if is_from_repo(pkg)]
+            extras = list(pkgs_from_repo(dnf.query.extras_pkgs(q)))
 
         # obsoleting packages (and what they obsolete)
         elif pkgnarrow == 'obsoletes':
@@ -1179,6 +1320,7 @@ class Base(object):
         return cnt
 
     def build_comps_solver(self):
+        import dnf.comps
         def reason_fn(pkgname):
             q = self.sack.query().installed().filter(name=pkgname)
             if not q:
@@ -1191,6 +1333,7 @@ class Base(object):
         return dnf.comps.Solver(self.group_persistor, reason_fn)
 
     def environment_install(self, env, types, exclude=None):
+        import dnf.comps
         solver = self.build_comps_solver()
         types = self._translate_comps_pkg_types(types)
         trans = dnf.comps.install_or_skip(solver.environment_install,
@@ -1205,17 +1348,18 @@ class Base(object):
         return self._add_comps_trans(trans)
 
     _COMPS_TRANSLATION = {
-        'default': dnf.comps.DEFAULT,
-        'mandatory': dnf.comps.MANDATORY,
-        'optional': dnf.comps.OPTIONAL
+        'default': 'DEFAULT',
+        'mandatory': 'MANDATORY',
+        'optional': 'OPTIONAL'
     }
 
     @staticmethod
     def _translate_comps_pkg_types(pkg_types):
+        import dnf.comps
         ret = 0
         for (name, enum) in Base._COMPS_TRANSLATION.items():
             if name in pkg_types:
-                ret |= enum
+                ret |= getattr(dnf.comps, enum)
         return ret
 
     def group_install(self, grp, pkg_types, exclude=None):
@@ -1224,6 +1368,7 @@ class Base(object):
             that will be excluded from install set
         """
         # :api
+        import dnf.comps
         def _pattern_to_pkgname(pattern):
             if dnf.util.is_glob_pattern(pattern):
                 q = self.sack.query().filter(name__glob=pattern)
@@ -1247,6 +1392,7 @@ class Base(object):
         return self._add_comps_trans(trans)
 
     def env_group_install(self, patterns, types):
+        from dnf.comps import CompsQuery
         q = CompsQuery(self.comps, self.group_persistor,
                        CompsQuery.ENVIRONMENTS | CompsQuery.GROUPS,
                        CompsQuery.AVAILABLE | CompsQuery.INSTALLED)
@@ -1269,6 +1415,7 @@ class Base(object):
         return self._add_comps_trans(trans)
 
     def env_group_remove(self, patterns):
+        from dnf.comps import CompsQuery
         q = CompsQuery(self.comps, self.group_persistor,
                        CompsQuery.ENVIRONMENTS | CompsQuery.GROUPS,
                        CompsQuery.INSTALLED)
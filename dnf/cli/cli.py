@@ -28,23 +28,10 @@ from . import output
 from dnf.cli import CliError
 from dnf.i18n import ucd, _
 
+import collections
 import datetime
 import dnf
 import dnf.cli.commands
-import dnf.cli.commands.autoremove
-import dnf.cli.commands.clean
-import dnf.cli.commands.distrosync
-import dnf.cli.commands.downgrade
-import dnf.cli.commands.remove
-import dnf.cli.commands.group
-import dnf.cli.commands.install
-import dnf.cli.commands.makecache
-import dnf.cli.commands.reinstall
-import dnf.cli.commands.repolist
-import dnf.cli.commands.search
-import dnf.cli.commands.updateinfo
-import dnf.cli.commands.upgrade
-import dnf.cli.commands.upgradeto
 import dnf.cli.demand
 import dnf.cli.option_parser
 import dnf.conf
@@ -58,10 +45,12 @@ import dnf.plugin
 import dnf.persistor
 import dnf.rpm
 import dnf.sack
+import dnf.subject
 import dnf.util
 import dnf.yum.config
 import dnf.yum.misc
 import hawkey
+import importlib
 import logging
 import operator
 import os
@@ -72,15 +61,70 @@ import time
 logger = logging.getLogger('dnf')
 
 
-def _add_pkg_simple_list_lens(data, pkg, indent=''):
-    """ Get the length of each pkg's column. Add that to data.
+#  The built-in commands having modules of their own, with their aliases. The
+# modules are only imported once one of the commands is looked up.
+_LAZY_COMMANDS = (
+    ('autoremove', 'AutoremoveCommand', ('autoremove',)),
+    ('clean', 'CleanCommand', ('clean',)),
+    ('distrosync', 'DistroSyncCommand',
+     ('distro-sync', 'distribution-synchronization')),
+    ('downgrade', 'DowngradeCommand', ('downgrade',)),
+    ('group', 'GroupCommand',
+     ('group', 'groups', 'grouplist', 'groupinstall', 'groupupdate',
+      'groupremove', 'grouperase', 'groupinfo')),
+    ('install', 'InstallCommand', ('install',)),
+    ('makecache', 'MakeCacheCommand', ('makecache',)),
+    ('reinstall', 'ReinstallCommand', ('reinstall',)),
+    ('remove', 'RemoveCommand', ('remove', 'erase')),
+    ('repolist', 'RepoListCommand', ('repolist',)),
+    ('search', 'SearchCommand', ('search',)),
+    ('updateinfo', 'UpdateInfoCommand', ('updateinfo',)),
+    ('upgrade', 'UpgradeCommand', ('upgrade', 'update')),
+    ('upgradeto', 'UpgradeToCommand', ('upgrade-to', 'update-to')),
+)
+
+
+class _CommandTable(dict):
+    """Command names mapped to the command classes.
+
+    A lazily registered command maps to the (module, class name) pair of its
+    class instead, which is replaced by the class on the first lookup.
+
+    """
+
+    def __getitem__(self, name):
+        command_cls = super(_CommandTable, self).__getitem__(name)
+        if isinstance(command_cls, tuple):
+            (module, clsname) = command_cls
+            command_cls = getattr(importlib.import_module(module), clsname)
+            super(_CommandTable, self).__setitem__(name, command_cls)
+        return command_cls
+
+    def get(self, name, default=None):
+        if name not in self:
+            return default
+        return self[name]
+
+    def items(self):
+        return [(name, self[name]) for name in self]
+
+    def values(self):
+        return [self[name] for name in self]
+
+
+def _add_pkgs_simple_list_lens(data, pkgs, indent=''):
+    """ Get the length of each column of all the pkgs. Add that to data.
         This "knows" about simpleList and printVer. """
-    na = len(pkg.name) + 1 + len(pkg.arch) + len(indent)
-    ver = len(pkg.evr)
-    rid = len(pkg.reponame)
-    for (d, v) in (('na', na), ('ver', ver), ('rid', rid)):
-        data[d].setdefault(v, 0)
-        data[d][v] += 1
+    # counting whole columns at once keeps the loops in C:
+    nas = collections.Counter(len(pkg.name) + len(pkg.arch) for pkg in pkgs)
+    vers = collections.Counter(len(pkg.evr) for pkg in pkgs)
+    rids = collections.Counter(pkg.reponame for pkg in pkgs)
+    extra = 1 + len(indent)
+    for (d, lens) in (('na', ((na + extra, num) for (na, num) in nas.items())),
+                      ('ver', vers.items()),
+                      ('rid', ((len(rid), num) for (rid, num) in rids.items()))):
+        for (v, num) in lens:
+            data[d][v] = data[d].get(v, 0) + num
 
 
 def _list_cmd_calc_columns(output, ypl):
@@ -88,13 +132,24 @@ def _list_cmd_calc_columns(output, ypl):
     data = {'na' : {}, 'ver' : {}, 'rid' : {}}
     for lst in (ypl.installed, ypl.available, ypl.extras, ypl.autoremove,
                 ypl.updates, ypl.recent):
-        for pkg in lst:
-            _add_pkg_simple_list_lens(data, pkg)
+        _add_pkgs_simple_list_lens(data, lst)
     if len(ypl.obsoletes) > 0:
-        for (npkg, opkg) in ypl.obsoletesTuples:
-            _add_pkg_simple_list_lens(data, npkg)
-            _add_pkg_simple_list_lens(data, opkg, indent=" " * 4)
+        _add_pkgs_simple_list_lens(
+            data, [npkg for (npkg, _opkg) in ypl.obsoletesTuples])
+        _add_pkgs_simple_list_lens(
+            data, [opkg for (_npkg, opkg) in ypl.obsoletesTuples],
+            indent=" " * 4)
+    return _list_cmd_columns(output, data)
 
+
+def _list_cmd_sample_columns(output, pkgs):
+    """ Size the columns to fit the sample of packages in pkgs. """
+    data = {'na' : {}, 'ver' : {}, 'rid' : {}}
+    _add_pkgs_simple_list_lens(data, pkgs)
+    return _list_cmd_columns(output, data)
+
+
+def _list_cmd_columns(output, data):
     data = [data['na'], data['ver'], data['rid']]
     columns = output.calcColumns(data, remainder_column=1)
     return (-columns[0], -columns[1], -columns[2])
@@ -232,8 +287,11 @@ class BaseCli(dnf.Base):
         :return: non-zero if execution should stop due to an error
         :raises: Will raise :class:`Error` if there's a problem
         """
-        for po in pkgs:
-            result, errmsg = self.sigCheckPkg(po)
+        keys_imported = False
+        for (po, (result, errmsg)) in zip(pkgs, self._sig_check_pkgs(pkgs)):
+            if result == 1 and keys_imported:
+                # a key imported for one of the previous packages might help
+                result, errmsg = self.sigCheckPkg(po)
 
             if result == 0:
                 # Verified ok, or verify not req'd
@@ -249,6 +307,7 @@ class BaseCli(dnf.Base):
                 # userconfirm really doesn't... so fake it
                 fn = lambda x, y, z: self.output.userconfirm()
                 self.getKeyForPackage(po, fn)
+                keys_imported = True
 
             else:
                 # Fatal error
@@ -364,8 +423,11 @@ class BaseCli(dnf.Base):
 
     def output_packages(self, basecmd, pkgnarrow='all', patterns=(), reponame=None):
         """Output selection *pkgnarrow* of packages matching *patterns* and *repoid*."""
+        if self.conf.stream_lists and pkgnarrow in self._STREAMED_NARROWS:
+            return self._stream_packages(basecmd, pkgnarrow, patterns, reponame)
+        records = self.output.records
         try:
-            highlight = self.output.term.MODE['bold']
+            highlight = self.output.term.MODE['bold'] if records is None else ''
             ypl = self.returnPkgLists(
                 pkgnarrow, patterns, installed_available=highlight, reponame=reponame)
         except dnf.exceptions.Error as e:
@@ -376,7 +438,7 @@ class BaseCli(dnf.Base):
             local_pkgs = {}
 
             columns = None
-            if basecmd == 'list':
+            if basecmd == 'list' and records is None:
                 # Dynamically size the columns
                 columns = _list_cmd_calc_columns(self.output, ypl)
 
@@ -414,7 +476,8 @@ class BaseCli(dnf.Base):
             rip = self.output.listPkgs(ypl.installed, _('Installed Packages'), basecmd,
                                 highlight_na=update_pkgs, columns=columns,
                                 highlight_modes={'>' : clio, '<' : clin,
-                                                 '=' : clir, 'not in' : clie})
+                                                 '=' : clir, 'not in' : clie},
+                                section='installed')
             clau = self.conf.color_list_available_upgrade
             clad = self.conf.color_list_available_downgrade
             clar = self.conf.color_list_available_reinstall
@@ -422,19 +485,22 @@ class BaseCli(dnf.Base):
             rap = self.output.listPkgs(ypl.available, _('Available Packages'), basecmd,
                                 highlight_na=inst_pkgs, columns=columns,
                                 highlight_modes={'<' : clau, '>' : clad,
-                                                 '=' : clar, 'not in' : clai})
+                                                 '=' : clar, 'not in' : clai},
+                                section='available')
             raep = self.output.listPkgs(ypl.autoremove, _('Autoremove Packages'),
-                                basecmd, columns=columns)
+                                basecmd, columns=columns, section='autoremove')
             rep = self.output.listPkgs(ypl.extras, _('Extra Packages'), basecmd,
-                                columns=columns)
+                                columns=columns, section='extras')
             cul = self.conf.color_update_local
             cur = self.conf.color_update_remote
             rup = self.output.listPkgs(ypl.updates, _('Upgraded Packages'), basecmd,
                                 highlight_na=local_pkgs, columns=columns,
-                                highlight_modes={'=' : cul, 'not in' : cur})
+                                highlight_modes={'=' : cul, 'not in' : cur},
+                                section='upgrades')
 
             # XXX put this into the ListCommand at some point
-            if len(ypl.obsoletes) > 0 and basecmd == 'list':
+            if len(ypl.obsoletes) > 0 and basecmd == 'list' and \
+                records is None:
             # if we've looked up obsolete lists and it's a list request
                 rop = [0, '']
                 print(_('Obsoleting Packages'))
@@ -444,14 +510,83 @@ class BaseCli(dnf.Base):
                                                      columns=columns)
             else:
                 rop = self.output.listPkgs(ypl.obsoletes, _('Obsoleting Packages'),
-                                    basecmd, columns=columns)
+                                    basecmd, columns=columns,
+                                    section='obsoletes')
             rrap = self.output.listPkgs(ypl.recent, _('Recently Added Packages'),
-                                 basecmd, columns=columns)
+                                 basecmd, columns=columns, section='recent')
             if len(patterns) and \
                 rrap[0] and rop[0] and rup[0] and rep[0] and rap[0] and \
                 raep[0] and rip[0]:
                 raise dnf.exceptions.Error(_('No matching Packages to list'))
 
+    _STREAMED_NARROWS = ('all', 'installed', 'available')
+    #  How many packages of the first section the list columns are sized for,
+    # when streaming:
+    _STREAM_SAMPLE = 1000
+    # how many names the packages are listed for at once, when streaming:
+    _STREAM_CHUNK = 1000
+
+    def _stream_names(self, narrow, patterns):
+        """Return the sorted names of the packages the narrow could list."""
+        queries = [self.sack.query()]
+        if patterns:
+            queries = [dnf.subject.Subject(pattern, ignore_case=True).
+                       get_best_query(self.sack, with_provides=False)
+                       for pattern in patterns]
+        names = set()
+        for query in queries:
+            if narrow == 'installed':
+                query = query.installed()
+            else:
+                query = query.available()
+            names.update(pkg.name for pkg in query)
+        return sorted(names)
+
+    def _stream_packages(self, basecmd, pkgnarrow, patterns, reponame):
+        """Output the installed and then the available packages. The sorted
+        names of a section are found first, then the packages are listed for
+        a chunk of the names at a time, so only the packages of one chunk are
+        held. The column sizes are sampled from the first packages and there
+        is no highlighting."""
+        narrows = (pkgnarrow,)
+        if pkgnarrow == 'all':
+            narrows = ('installed', 'available')
+        descriptions = {'installed' : _('Installed Packages'),
+                        'available' : _('Available Packages')}
+        columns = None
+        listed = False
+        for narrow in narrows:
+            description = descriptions[narrow]
+            names = self._stream_names(narrow, patterns)
+            for start in range(0, len(names), self._STREAM_CHUNK):
+                try:
+                    ypl = self.doPackageLists(
+                        narrow, patterns, ignore_case=True, reponame=reponame,
+                        names=names[start:start + self._STREAM_CHUNK])
+                except dnf.exceptions.Error as e:
+                    return 1, [str(e)]
+                pkgs = getattr(ypl, narrow)
+                if narrow == 'available' and self.conf.showdupesfromrepos:
+                    pkgs += ypl.reinstall_available
+                del ypl
+                if not pkgs:
+                    continue
+                #  Packages sort by their names first, so the sorted chunks
+                # make up the sorted section.
+                pkgs.sort()
+                if basecmd == 'list' and columns is None and \
+                        self.output.records is None:
+                    sample = pkgs[:self._STREAM_SAMPLE]
+                    columns = _list_cmd_sample_columns(self.output, sample)
+                (code, _errs) = self.output.listPkgs(
+                    pkgs, description, basecmd, columns=columns,
+                    section=narrow)
+                description = None
+                listed = listed or code == 0
+                del pkgs
+        if len(patterns) and not listed:
+            raise dnf.exceptions.Error(_('No matching Packages to list'))
+
     def returnPkgLists(self, pkgnarrow='all', patterns=None,
                        installed_available=False, reponame=None):
         """Return a :class:`dnf.yum.misc.GenericHolder` object containing
@@ -606,6 +741,8 @@ class BaseCli(dnf.Base):
 
     def history_rollback_transaction(self, extcmd):
         """Rollback given transaction."""
+        import dnf.history
+        import dnf.yum.history
         old = self.history_get_transaction((extcmd,))
         if old is None:
             return 1, ['Failed history rollback, no transaction']
@@ -657,6 +794,7 @@ class BaseCli(dnf.Base):
 
     def history_undo_transaction(self, extcmd):
         """Undo given transaction."""
+        import dnf.history
         old = self.history_get_transaction((extcmd,))
         if old is None:
             return 1, ['Failed history undo']
@@ -688,27 +826,17 @@ class Cli(object):
     def __init__(self, base):
         self._system_cachedir = None
         self.base = base
-        self.cli_commands = {}
+        self.cli_commands = _CommandTable()
+        self._main_commands = None
         self.command = None
         self.demands = dnf.cli.demand.DemandSheet() #:cli
         self.main_setopts = {}
         self.nogpgcheck = False
         self.repo_setopts = {}
 
-        self.register_command(dnf.cli.commands.autoremove.AutoremoveCommand)
-        self.register_command(dnf.cli.commands.clean.CleanCommand)
-        self.register_command(dnf.cli.commands.distrosync.DistroSyncCommand)
-        self.register_command(dnf.cli.commands.downgrade.DowngradeCommand)
-        self.register_command(dnf.cli.commands.group.GroupCommand)
-        self.register_command(dnf.cli.commands.install.InstallCommand)
-        self.register_command(dnf.cli.commands.makecache.MakeCacheCommand)
-        self.register_command(dnf.cli.commands.reinstall.ReinstallCommand)
-        self.register_command(dnf.cli.commands.remove.RemoveCommand)
-        self.register_command(dnf.cli.commands.repolist.RepoListCommand)
-        self.register_command(dnf.cli.commands.search.SearchCommand)
-        self.register_command(dnf.cli.commands.updateinfo.UpdateInfoCommand)
-        self.register_command(dnf.cli.commands.upgrade.UpgradeCommand)
-        self.register_command(dnf.cli.commands.upgradeto.UpgradeToCommand)
+        for (module, clsname, aliases) in _LAZY_COMMANDS:
+            self._register_lazy_command(
+                'dnf.cli.commands.' + module, clsname, aliases)
         self.register_command(dnf.cli.commands.InfoCommand)
         self.register_command(dnf.cli.commands.ListCommand)
         self.register_command(dnf.cli.commands.ProvidesCommand)
@@ -787,7 +915,8 @@ class Cli(object):
         if demands.sack_activation:
             lar = self.demands.available_repos
             self.base.fill_sack(load_system_repo='auto',
-                                load_available_repos=lar)
+                                load_available_repos=lar,
+                                load_filelists=demands.filelists)
             if lar:
                 repos = list(self.base.repos.iter_enabled())
                 if repos:
@@ -979,21 +1108,17 @@ class Cli(object):
                            self.base.output)
             sys.exit(0)
 
-        # store the main commands & summaries, before plugins are loaded
-        self.optparser.add_commands(self.cli_commands, 'main')
+        # remember the main commands, before plugins are loaded
+        self._main_commands = set(self.cli_commands)
         if self.base.conf.plugins:
             self.base.plugins.load(self.base.conf.pluginpath, opts.disableplugins)
         self.base.plugins.run_init(self.base, self)
-        # store the plugin commands & summaries
-        self.optparser.add_commands(self.cli_commands,'plugin')
-
-        # build the usage info and put it into the optparser.
-        self.optparser.usage = self.optparser.get_usage()
 
         # show help if the user requests it
         # this is done here, because we first have the full
         # usage info after the plugins are loaded.
         if opts.help:
+            self._configure_usage()
             self.optparser.print_help()
             sys.exit(0)
 
@@ -1063,6 +1188,23 @@ class Cli(object):
                 raise dnf.exceptions.ConfigError(_('Command "%s" already defined') % name)
             self.cli_commands[name] = command_cls
 
+    def _register_lazy_command(self, module, clsname, aliases):
+        """Register the Command `clsname` of `module` without importing it."""
+        for name in aliases:
+            if name in self.cli_commands:
+                raise dnf.exceptions.ConfigError(_('Command "%s" already defined') % name)
+            self.cli_commands[name] = (module, clsname)
+
+    def _configure_usage(self):
+        """Build the usage info from the summaries of the main and the plugin
+        commands and put it into the optparser."""
+        main_commands = dict((name, self.cli_commands[name])
+                             for name in self._main_commands
+                             if name in self.cli_commands)
+        self.optparser.add_commands(main_commands, 'main')
+        self.optparser.add_commands(self.cli_commands, 'plugin')
+        self.optparser.usage = self.optparser.get_usage()
+
     def run(self):
         """Call the base command, and pass it the extended commands or
            arguments.
@@ -1079,4 +1221,6 @@ class Cli(object):
         return self.command.run(self.base.extcmds)
 
     def print_usage(self):
+        if self._main_commands is not None:
+            self._configure_usage()
         return self.optparser.print_usage()
@@ -30,6 +30,7 @@ import dnf.const
 import dnf.exceptions
 import dnf.i18n
 import dnf.pycomp
+import dnf.subject
 import dnf.util
 import dnf.yum.config
 import functools
@@ -133,6 +134,11 @@ def checkEnabledRepo(base, possible_local_files=[]):
     raise dnf.cli.CliError(msg)
 
 
+def needs_filelists(patterns):
+    """Test whether matching any of the *patterns* involves file paths."""
+    return any(dnf.subject.Subject(pat).filename_pattern for pat in patterns)
+
+
 def parse_spec_group_file(extcmds):
     pkg_specs, grp_specs, filenames = [], [], []
     for argument in extcmds:
@@ -247,10 +253,11 @@ class InfoCommand(Command):
         else:
             return DEFAULT_PKGNARROW, extcmds
 
-    def configure(self, _):
+    def configure(self, args):
         demands = self.cli.demands
         demands.available_repos = True
         demands.fresh_metadata = False
+        demands.filelists = needs_filelists(args)
         demands.sack_activation = True
 
     def run(self, extcmds):
@@ -311,6 +318,10 @@ class CheckUpdateCommand(Command):
     def __init__(self, cli):
         super(CheckUpdateCommand, self).__init__(cli)
 
+    def configure(self, args):
+        super(CheckUpdateCommand, self).configure(args)
+        self.cli.demands.filelists = needs_filelists(args)
+
     def doCheck(self, basecmd, extcmds):
         """Verify that conditions are met so that this command can
         run; namely that there is at least one enabled repository.
@@ -1044,7 +1055,7 @@ class HistoryCommand(Command):
 
     aliases = ('history',)
     summary = _("Display, or use, the transaction history")
-    usage = "[info|list|redo|undo|rollback|userinstalled]"
+    usage = "[compact|info|list|redo|undo|rollback|userinstalled]"
 
     def configure(self, _):
         demands = self.cli.demands
@@ -1072,6 +1083,7 @@ class HistoryCommand(Command):
         super(HistoryCommand, self).__init__(cli)
 
     def _hcmd_redo(self, extcmds):
+        import dnf.history
         try:
             extcmd, = extcmds
         except ValueError:
@@ -1176,6 +1188,27 @@ class HistoryCommand(Command):
             else:
                 print("FAILED.")
 
+    def _hcmd_compact(self, extcmds):
+        """Execute history compact command."""
+        keep = 100
+        try:
+            if extcmds:
+                keep, = extcmds
+                keep = int(keep)
+            if keep < 1:
+                raise ValueError
+        except ValueError:
+            logger.critical(_('Bad number of transactions to keep: %s'),
+                            ' '.join(extcmds))
+            return 1, ['Failed history compact']
+        if not os.access(self.base.history._db_file, os.W_OK):
+            logger.critical(_("You don't have access to the history DB."))
+            return 1, ['Failed history compact']
+
+        count = self.base.history.compact(keep)
+        print(_('Moved %d transactions to %s.') %
+              (count, self.base.history._archive_file))
+
     def _hcmd_userinstalled(self, extcmds):
         """Execute history userinstalled command."""
         if extcmds:
@@ -1183,7 +1216,7 @@ class HistoryCommand(Command):
                                       ' '.join(extcmds))
             return 1, ['Failed history userinstalled']
 
-        pkgs = tuple(self.base.iter_userinstalled())
+        pkgs = tuple(self.base.iter_userinstalled(self.base.history))
         return self.output.listPkgs(pkgs, 'Packages installed by user', 'name')
 
     def doCheck(self, basecmd, extcmds):
@@ -1194,7 +1227,8 @@ class HistoryCommand(Command):
         :param basecmd: the name of the command
         :param extcmds: the command line arguments passed to *basecmd*
         """
-        cmds = ('list', 'info', 'redo', 'undo', 'rollback', 'userinstalled')
+        cmds = ('list', 'info', 'redo', 'undo', 'rollback', 'userinstalled',
+                'compact')
         if extcmds and extcmds[0] not in cmds:
             logger.critical(_('Invalid history sub-command, use: %s.'),
                                  ", ".join(cmds))
@@ -1238,6 +1272,8 @@ class HistoryCommand(Command):
             ret = self.output.historyPackageInfoCmd(extcmds)
         elif vcmd == 'userinstalled':
             ret = self._hcmd_userinstalled(extcmds[1:])
+        elif vcmd == 'compact':
+            ret = self._hcmd_compact(extcmds[1:])
 
         if ret is None:
             return
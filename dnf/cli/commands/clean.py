@@ -54,7 +54,8 @@ def _check_args(cli, basecmd, extcmds):
 def _clean_binary_cache(repos, cachedir):
     """ Delete the binary cache files from the DNF cache.
 
-        IOW, clean up the .solv and .solvx hawkey cache files.
+        IOW, clean up the .solv and .solvx hawkey cache files, and the
+        search indexes built from them.
     """
     files = [os.path.join(cachedir, hawkey.SYSTEM_REPO_NAME + ".solv")]
     for repo in repos.iter_enabled():
@@ -63,6 +64,7 @@ def _clean_binary_cache(repos, cachedir):
         files.append(basename + "-filenames.solvx")
         files.append(basename + "-presto.solvx")
         files.append(basename + "-updateinfo.solvx")
+        files.append(basename + "-search.sqlite")
     files = [f for f in files if os.access(f, os.F_OK)]
 
     return _clean_filelist('dbcache', files)
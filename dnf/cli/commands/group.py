@@ -402,7 +402,11 @@ class GroupCommand(commands.Command):
         goal = self.base.goal
         pkgdb = self.base.yumdb
         names = goal.group_members
-        for pkg in self.base.sack.query().installed().filter(name=names):
+        remarked = self.base.sack.query().installed().filter(name=names).run()
+        for pkg in remarked:
             db_pkg = pkgdb.get_package(pkg)
             reason = db_pkg.get('reason') or 'unknown'
             db_pkg.reason = goal.group_reason(pkg, reason)
+        # keep the reasons recorded in the history current:
+        if self.base.conf.history_record:
+            self.base.history.sync_alldb_pkgs(remarked)
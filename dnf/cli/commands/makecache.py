@@ -25,6 +25,7 @@ from dnf.i18n import _
 
 import dnf.cli
 import dnf.exceptions
+import dnf.search_index
 import dnf.util
 import logging
 
@@ -85,5 +86,7 @@ class MakeCacheCommand(commands.Command):
         if timer:
             persistor.reset_last_makecache()
         self.base.fill_sack() # performs the md sync
+        for r in self.base.repos.iter_enabled():
+            dnf.search_index.repo_index(self.base, r)
         logger.info(_('Metadata cache created.'))
         return True
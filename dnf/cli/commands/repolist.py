@@ -78,6 +78,7 @@ class RepoListCommand(commands.Command):
         demands = self.cli.demands
         demands.available_repos = True
         demands.fresh_metadata = False
+        demands.filelists = False
         demands.sack_activation = True
 
     def run(self, extcmds):
@@ -97,11 +98,13 @@ class RepoListCommand(commands.Command):
         on_ehibeg = term.FG_COLOR['green'] + term.MODE['bold']
         on_dhibeg = term.FG_COLOR['red']
         on_hiend = term.MODE['normal']
+        records = self.output.records
         tot_num = 0
         cols = []
         for repo in repos:
             if len(extcmds) and not _repo_match(repo, extcmds):
                 continue
+            num = None
             (ehibeg, dhibeg, hiend) = '', '', ''
             ui_enabled = ''
             ui_endis_wid = 0
@@ -123,7 +126,7 @@ class RepoListCommand(commands.Command):
                     if not verbose:
                         ui_enabled += ": "
                         ui_endis_wid += 2
-                if verbose:
+                if verbose and records is None:
                     ui_size = _repo_size(self.base.sack, repo)
                 # We don't show status for list disabled
                 if arg != 'disabled' or verbose:
@@ -140,6 +143,11 @@ class RepoListCommand(commands.Command):
                 ui_enabled = dhibeg + _('disabled') + hiend
                 ui_endis_wid = exact_width(_('disabled'))
 
+            if records is not None:
+                records.write([('id', repo.id), ('name', repo.name),
+                               ('enabled', enabled), ('packages', num)])
+                continue
+
             if not verbose:
                 rid = repo.id
                 if enabled and repo.metalink:
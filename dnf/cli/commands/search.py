@@ -26,12 +26,16 @@ from dnf.i18n import ucd, _
 
 import dnf.i18n
 import dnf.match_counter
+import dnf.search_index
 import dnf.util
 import hawkey
 import logging
 
 logger = logging.getLogger('dnf')
 
+# above that many candidate names scanning the repo is cheaper:
+MAX_INDEXED_NAMES = 100
+
 
 class SearchCommand(commands.Command):
     """A class containing methods needed by the cli to execute the
@@ -42,6 +46,10 @@ class SearchCommand(commands.Command):
     summary = _('Search package details for the given string')
     usage = _('QUERY_STRING')
 
+    def __init__(self, cli):
+        super(SearchCommand, self).__init__(cli)
+        self._indexes = {}
+
     def _search(self, args):
         """Search for simple text tags in a package object."""
 
@@ -57,6 +65,11 @@ class SearchCommand(commands.Command):
             args.pop(0)
             search_all = True
 
+        for repo in self.base.repos.iter_enabled():
+            index = dnf.search_index.repo_index(self.base, repo)
+            if index is not None:
+                self._indexes[repo.id] = index
+
         counter = dnf.match_counter.MatchCounter()
         for arg in args:
             self._search_counted(counter, 'name', arg)
@@ -87,15 +100,38 @@ class SearchCommand(commands.Command):
         fdict = {'%s__substr' % attr : needle}
         if dnf.util.is_glob_pattern(needle):
             fdict = {'%s__glob' % attr : needle}
-        q = self.base.sack.query().filter(hawkey.ICASE, **fdict)
-        for pkg in q.run():
-            counter.add(pkg, attr, needle)
+        for q in self._search_queries(attr, needle):
+            for pkg in q.filter(hawkey.ICASE, **fdict).run():
+                counter.add(pkg, attr, needle)
         return counter
 
+    def _search_queries(self, attr, needle):
+        """Queries of all the packages that might match needle in attr.
+
+        The search indexes leave only the packages of the candidate names in
+        their repos. The other repos, and all of them for a glob, are scanned.
+
+        """
+        sack = self.base.sack
+        if dnf.util.is_glob_pattern(needle):
+            return [sack.query()]
+        scanned = sack.query()
+        queries = []
+        for (repo_id, index) in self._indexes.items():
+            names = index.names(attr, needle)
+            if names is None or len(names) > MAX_INDEXED_NAMES:
+                continue
+            scanned = scanned.filter(reponame__neq=repo_id)
+            if names:
+                queries.append(sack.query().filter(reponame=repo_id,
+                                                   name=list(names)))
+        return [scanned] + queries
+
     def configure(self, _):
         demands = self.cli.demands
         demands.available_repos = True
         demands.fresh_metadata = False
+        demands.filelists = False
         demands.sack_activation = True
 
     def doCheck(self, basecmd, extcmds):
@@ -25,6 +25,7 @@ from __future__ import print_function
 from __future__ import unicode_literals
 from collections import OrderedDict
 from dnf.cli import commands
+from dnf.cli.format import RecordWriter
 from dnf.i18n import _
 from dnf.pycomp import unicode
 from itertools import chain
@@ -47,6 +48,11 @@ class UpdateInfoCommand(commands.Command):
                   hawkey.ADVISORY_SECURITY: _('security'),
                   hawkey.ADVISORY_UNKNOWN: _('unknown')}
 
+    TYPE2NAME = {hawkey.ADVISORY_BUGFIX: 'bugfix',
+                 hawkey.ADVISORY_ENHANCEMENT: 'enhancement',
+                 hawkey.ADVISORY_SECURITY: 'security',
+                 hawkey.ADVISORY_UNKNOWN: 'unknown'}
+
     aliases = ['updateinfo']
     summary = _('Display advisories about packages')
     usage = ''
@@ -98,6 +104,7 @@ class UpdateInfoCommand(commands.Command):
     def configure(self, args):
         """Do any command-specific configuration based on command arguments."""
         super(UpdateInfoCommand, self).configure(args)
+        self.cli.demands.filelists = False
         self.cli.demands.sack_activation = True
 
     @staticmethod
@@ -188,6 +195,15 @@ class UpdateInfoCommand(commands.Command):
         for label, value in label2value.items():
             print('    %*s %s' % (width, value, label))
 
+    @classmethod
+    def summary_records(cls, apkg_adv_insts):
+        """Generate the records of the summary of advisories."""
+        typ2cnt = cls._summary(apkg_adv_insts)
+        for typ in (hawkey.ADVISORY_SECURITY, hawkey.ADVISORY_BUGFIX,
+                    hawkey.ADVISORY_ENHANCEMENT, hawkey.ADVISORY_UNKNOWN):
+            if typ2cnt[typ]:
+                yield [('type', cls.TYPE2NAME[typ]), ('count', typ2cnt[typ])]
+
     @staticmethod
     def _list(apkg_adv_insts):
         """Make the list of advisories."""
@@ -225,6 +241,14 @@ class UpdateInfoCommand(commands.Command):
             for id_, tlbl in id2tlbl.items():
                 print('%s%-*s %-*s %s' % (mark, idw, id_, tlw, tlbl, nevra))
 
+    @classmethod
+    def list_records(cls, apkg_adv_insts):
+        """Generate the records of the list of advisories."""
+        for (nevra, inst), id2type in cls._list(apkg_adv_insts):
+            for id_, typ in sorted(id2type.items(), key=itemgetter(0)):
+                yield [('id', id_), ('type', cls.TYPE2NAME[typ]),
+                       ('nevra', nevra), ('installed', inst)]
+
     def _info(self, apkg_adv_insts):
         """Make detailed information about advisories."""
         # Get mapping from identity to (title, ID, type, time, BZs, CVEs,
@@ -309,17 +333,30 @@ class UpdateInfoCommand(commands.Command):
                     print('%*s : %s' % (width, label_, line))
             print()
 
+    def info_records(self, apkg_adv_insts):
+        """Generate the records of the details about advisories."""
+        for title, (id_, typ, upd, bzs, cvs, desc, rigs, fils, ins) in \
+                self._info(apkg_adv_insts).items():
+            yield [('title', title), ('id', id_),
+                   ('type', self.TYPE2NAME[typ]), ('updated', unicode(upd)),
+                   ('bugs', sorted(ref_id for ref_id, _title in bzs)),
+                   ('cves', sorted(ref_id for ref_id, _title in cvs)),
+                   ('description', desc), ('rights', rigs),
+                   ('files', sorted(fils)), ('installed', ins)]
+
     def run(self, args):
         """Execute the command with arguments."""
 
         super(UpdateInfoCommand, self).run(args)
-        display = self.display_summary
+        display, records = self.display_summary, self.summary_records
         if args[:1] in (['summary'], []):
             args = args[1:]
         elif args[:1] == ['list']:
-            display, args = self.display_list, args[1:]
+            display, records = self.display_list, self.list_records
+            args = args[1:]
         elif args[:1] == ['info']:
-            display, args = self.display_info, args[1:]
+            display, records = self.display_info, self.info_records
+            args = args[1:]
 
         self.refresh_installed_cache()
 
@@ -338,6 +375,12 @@ class UpdateInfoCommand(commands.Command):
             mixed, apkg_adv_insts = self.available_apkg_adv_insts(args)
             description = _('available')
 
-        display(apkg_adv_insts, mixed, description)
+        fmt = self.base.conf.output_format
+        if fmt in RecordWriter.FORMATS:
+            writer = RecordWriter(fmt)
+            for record in records(apkg_adv_insts):
+                writer.write(record)
+        else:
+            display(apkg_adv_insts, mixed, description)
 
         self.clear_installed_cache()
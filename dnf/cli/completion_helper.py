@@ -20,6 +20,13 @@
 # 02110-1301  USA
 
 import dnf.cli
+import dnf.cli.commands.clean
+import dnf.cli.commands.downgrade
+import dnf.cli.commands.install
+import dnf.cli.commands.reinstall
+import dnf.cli.commands.remove
+import dnf.cli.commands.repolist
+import dnf.cli.commands.upgrade
 import re
 import sys
 
@@ -35,6 +42,7 @@ class RemoveCompletionCommand(dnf.cli.commands.remove.RemoveCommand):
         super(RemoveCompletionCommand, self).__init__(args)
 
     def configure(self, args):
+        self.cli.demands.filelists = False
         self.cli.demands.root_user = False
         self.cli.demands.sack_activation = True
 
@@ -48,6 +56,7 @@ class InstallCompletionCommand(dnf.cli.commands.install.InstallCommand):
         super(InstallCompletionCommand, self).__init__(args)
 
     def configure(self, args):
+        self.cli.demands.filelists = False
         self.cli.demands.root_user = False
         self.cli.demands.available_repos = True
         self.cli.demands.sack_activation = True
@@ -64,6 +73,7 @@ class ReinstallCompletionCommand(dnf.cli.commands.reinstall.ReinstallCommand):
         super(ReinstallCompletionCommand, self).__init__(args)
 
     def configure(self, args):
+        self.cli.demands.filelists = False
         self.cli.demands.root_user = False
         self.cli.demands.available_repos = True
         self.cli.demands.sack_activation = True
@@ -121,6 +131,7 @@ class UpgradeCompletionCommand(dnf.cli.commands.upgrade.UpgradeCommand):
         super(UpgradeCompletionCommand, self).__init__(args)
 
     def configure(self, args):
+        self.cli.demands.filelists = False
         self.cli.demands.root_user = False
         self.cli.demands.available_repos = True
         self.cli.demands.sack_activation = True
@@ -135,6 +146,7 @@ class DowngradeCompletionCommand(dnf.cli.commands.downgrade.DowngradeCommand):
         super(DowngradeCompletionCommand, self).__init__(args)
 
     def configure(self, args):
+        self.cli.demands.filelists = False
         self.cli.demands.root_user = False
         self.cli.demands.available_repos = True
         self.cli.demands.sack_activation = True
@@ -47,6 +47,7 @@ class DemandSheet(object):
     # :api...
     allow_erasing = _BoolDefault(False)
     available_repos = _BoolDefault(False)
+    filelists = _BoolDefault(True)
     resolving = _BoolDefault(False)
     root_user = _BoolDefault(False)
     sack_activation = _BoolDefault(False)
@@ -14,9 +14,14 @@
 # License and may only be used or replicated with the express permission of
 # Red Hat, Inc.
 
+from __future__ import print_function
 from __future__ import unicode_literals
+from collections import OrderedDict
+from dnf.i18n import ucd
 from dnf.pycomp import long
 
+import json
+
 def format_number(number, SI=0, space=' '):
     """Return a human-readable metric-like string representation
     of a number.
@@ -102,3 +107,36 @@ def format_time(seconds, use_hours=0):
 
 def indent_block(s):
     return '\n'.join('  ' + s for s in s.splitlines())
+
+
+class RecordWriter(object):
+    """Prints records, sequences of (key, value) pairs, for programs to read.
+
+    The 'json' format prints every record as a JSON object on its own line.
+    The 'nul' format terminates every value with a NUL character and every
+    record with a newline. Backslashes and newlines in the values are escaped
+    as '\\\\' and '\\n', nothing is aligned or wrapped.
+
+    """
+
+    FORMATS = ('json', 'nul')
+
+    def __init__(self, fmt):
+        assert fmt in self.FORMATS
+        self.fmt = fmt
+
+    @staticmethod
+    def _nul_value(value):
+        if value is None:
+            return ''
+        if isinstance(value, (list, tuple, set)):
+            value = ' '.join(ucd(v) for v in value)
+        # keep one record per line:
+        return ucd(value).replace('\\', '\\\\').replace('\n', '\\n')
+
+    def write(self, record):
+        if self.fmt == 'json':
+            print(json.dumps(OrderedDict(record)))
+        else:
+            print(''.join(self._nul_value(value) + '\0'
+                          for (_key, value) in record))
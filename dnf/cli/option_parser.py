@@ -62,8 +62,9 @@ class OptionParser(argparse.ArgumentParser):
         """Configure parts of CLI from the opts. """
 
         options_to_move = ('best', 'assumeyes', 'assumeno',
-                           'showdupesfromrepos', 'plugins', 'ip_resolve',
-                           'rpmverbosity', 'disable_excludes')
+                           'showdupesfromrepos', 'stream_lists', 'output_format',
+                           'plugins',
+                           'ip_resolve', 'rpmverbosity', 'disable_excludes')
 
         # transfer user specified options to conf
         for option_name in options_to_move:
@@ -159,6 +160,15 @@ class OptionParser(argparse.ArgumentParser):
                            action="store_true", default=None,
                            help=_("show duplicates, in repos, "
                                   "in list/search commands"))
+        self.add_argument("--stream", dest="stream_lists",
+                           action="store_true", default=None,
+                           help=_("print the package lists of list/info "
+                                  "commands as they are found"))
+        self.add_argument("--output-format", dest="output_format",
+                           choices=('text', 'json', 'nul'), default=None,
+                           help=_("print the results of list/info/updateinfo/"
+                                  "history list/repolist commands as text, "
+                                  "JSON Lines or NUL separated fields"))
         self.add_argument("-e", "--errorlevel", default=None, type=int,
                            help=_("error output level"))
         self.add_argument("--rpmverbosity", default=None,
@@ -20,7 +20,7 @@
 from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import unicode_literals
-from dnf.cli.format import format_number, format_time
+from dnf.cli.format import format_number, format_time, RecordWriter
 from dnf.i18n import _, P_, ucd, fill_exact_width, textwrap_fill, exact_width
 from dnf.pycomp import xrange, basestring, long, unicode
 from dnf.yum.rpmtrans import LoggingTransactionDisplay
@@ -32,9 +32,9 @@ import dnf.crypto
 import dnf.i18n
 import dnf.transaction
 import dnf.util
-import dnf.yum.history
 import dnf.yum.misc
 import dnf.yum.packages
+import bisect
 import hawkey
 import itertools
 import logging
@@ -105,6 +105,35 @@ class Output(object):
         self.base = base
         self.term = dnf.cli.term.Term()
         self.progress = None
+        self._records = None
+
+    @property
+    def records(self):
+        """The RecordWriter of the configured output_format, None for text."""
+        fmt = getattr(self.conf, 'output_format', 'text')
+        if fmt not in RecordWriter.FORMATS:
+            return None
+        if self._records is None or self._records.fmt != fmt:
+            self._records = RecordWriter(fmt)
+        return self._records
+
+    def pkg_record(self, pkg, outputType, section=None):
+        """Return the record of pkg for the given listPkgs() outputType."""
+        if outputType == 'name':
+            return [('name', pkg.name)]
+        record = [('section', section), ('name', pkg.name),
+                  ('epoch', pkg.epoch), ('version', pkg.version),
+                  ('release', pkg.release), ('arch', pkg.arch),
+                  ('repo', pkg.reponame)]
+        if outputType == 'info':
+            from_repo = None
+            if pkg.from_system:
+                from_repo = self.yumdb.get_package(pkg).get('from_repo')
+            record += [('size', pkg.size), ('from_repo', from_repo),
+                       ('summary', pkg.summary), ('url', pkg.url),
+                       ('license', pkg.license),
+                       ('description', pkg.description)]
+        return record
 
     def _banner(self, col_data, row):
         term_width = self.term.columns
@@ -157,14 +186,12 @@ class Output(object):
         return self.term.sub(haystack, hibeg, hiend, needles, **kwds)
 
     @staticmethod
-    def _calc_columns_spaces_helps(current, data_tups, left):
+    def _calc_columns_spaces_helps(current, lens, counts, start, left):
         """ Spaces left on the current field will help how many pkgs? """
-        ret = 0
-        for tup in data_tups:
-            if left < (tup[0] - current):
-                break
-            ret += tup[1]
-        return ret
+        end = bisect.bisect_right(lens, current + left)
+        if end <= start:
+            return 0
+        return counts[end] - counts[start]
 
     @property
     def history(self):
@@ -207,11 +234,20 @@ class Output(object):
             total_width = self.term.columns
 
         cols = len(data)
-        # Convert the data to ascending list of tuples, (field_length, pkgs)
-        pdata = data
-        data = [None] * cols # Don't modify the passed in data
+        #  Convert the data to the ascending field lengths and the running
+        # totals of their pkgs, counts[d][i] being the number of pkgs shorter
+        # than lens[d][i]. The lengths are then consumed from the start by
+        # moving pos[d], and how many pkgs some spaces help is found by
+        # bisecting instead of walking the remaining lengths.
+        lens = [None] * cols
+        counts = [None] * cols
         for d in range(0, cols):
-            data[d] = sorted(pdata[d].items())
+            items = sorted(data[d].items())
+            lens[d] = [length for (length, _num) in items]
+            counts[d] = [0]
+            for (_length, num) in items:
+                counts[d].append(counts[d][-1] + num)
+        pos = [0] * cols
 
         #  We start allocating 1 char to everything but the last column, and a
         # space between each (again, except for the last column). Because
@@ -236,8 +272,8 @@ class Output(object):
             helps = 0
             val = 0
             for d in xrange(0, cols):
-                thelps = self._calc_columns_spaces_helps(columns[d], data[d],
-                                                         total_width)
+                thelps = self._calc_columns_spaces_helps(
+                    columns[d], lens[d], counts[d], pos[d], total_width)
                 if not thelps:
                     continue
                 #  We prefer to overflow: the last column, and then earlier
@@ -253,7 +289,8 @@ class Output(object):
             #  If we found a column to expand, move up to the next level with
             # that column and start again with any remaining space.
             if helps:
-                diff = data[val].pop(0)[0] - columns[val]
+                diff = lens[val][pos[val]] - columns[val]
+                pos[val] += 1
                 if not columns[val] and (val == (cols - 1)):
                     #  If we are going from 0 => N on the last column, take 1
                     # for the space before the column.
@@ -264,7 +301,7 @@ class Output(object):
 
             overflowed_columns = 0
             for d in xrange(0, cols):
-                if not data[d]:
+                if pos[d] == len(lens[d]):
                     continue
                 overflowed_columns += 1
             if overflowed_columns:
@@ -272,7 +309,7 @@ class Output(object):
                 # equally
                 norm = total_width // overflowed_columns
                 for d in xrange(0, cols):
-                    if not data[d]:
+                    if pos[d] == len(lens[d]):
                         continue
                     columns[d] += norm
                     total_width -= norm
@@ -536,12 +573,13 @@ class Output(object):
               (c_compact, c_repo, changetype, i_compact))
 
     def listPkgs(self, lst, description, outputType, highlight_na={},
-                 columns=None, highlight_modes={}):
+                 columns=None, highlight_modes={}, section=None):
         """Prints information about the given list of packages.
 
         :param lst: a list of packages to print information about
         :param description: string describing what the list of
-           packages contains, e.g. 'Available Packages'
+           packages contains, e.g. 'Available Packages', or None to print
+           no heading
         :param outputType: The type of information to be printed.
            Current options::
 
@@ -571,6 +609,8 @@ class Output(object):
                        number
                  '>' - highlighting used when the package has a higher version
                        number
+        :param section: the name of the list in the records written
+           instead of the text, when an output_format is configured
         :return: (exit_code, [errors])
 
         exit_code is::
@@ -579,11 +619,20 @@ class Output(object):
             1 = we've errored, exit with error string
 
         """
+        records = self.records
+        if records is not None and outputType in ['list', 'info', 'name']:
+            for pkg in sorted(lst):
+                records.write(self.pkg_record(pkg, outputType, section))
+            if len(lst) == 0:
+                return 1, ['No packages to list']
+            return 0, []
+
         if outputType in ['list', 'info', 'name']:
             thingslisted = 0
             if len(lst) > 0:
                 thingslisted = 1
-                print('%s' % description)
+                if description is not None:
+                    print('%s' % description)
                 for pkg in sorted(lst):
                     key = (pkg.name, pkg.arch)
                     highlight = False
@@ -1328,21 +1377,26 @@ Transaction Summary
         if tids is None:
             return 1, ['Failed history list']
 
-        old_tids = self.history.old(tids)
+        old_tids = self.history.iter_old(tids)
+        records = self.records
+        if records is not None:
+            for old in old_tids:
+                num, uiacts = self._history_uiactions(old.trans_data)
+                records.write([('id', old.tid), ('cmdline', old.cmdline),
+                               ('loginuid', old.loginuid),
+                               ('begin', old.beg_timestamp),
+                               ('end', old.end_timestamp),
+                               ('actions', uiacts), ('altered', num),
+                               ('return_code', old.return_code)])
+            return
+
         if self.conf.history_list_view == 'users':
             uids = [1, 2]
         elif self.conf.history_list_view == 'commands':
             uids = [1]
         else:
             assert self.conf.history_list_view == 'single-user-commands'
-            uids = set()
-            done = 0
-            blanks = 0
-            for old in old_tids:
-                done += 1
-                if old.cmdline is None:
-                    blanks += 1
-                uids.add(old.loginuid)
+            uids = self.history.old_loginuids(tids)
 
         fmt = "%s | %s | %s | %s | %s"
         if len(uids) == 1:
@@ -1396,6 +1450,7 @@ Transaction Summary
             0 = we're done, exit
             1 = we've errored, exit with error string
         """
+        import dnf.yum.history
         tids = set()
         mtids = set()
         pats = []
@@ -1447,11 +1502,11 @@ Transaction Summary
         mobj = None
         if mtids:
             bmtid, emtid = mtids.pop(0)
-        for tid in self.history.old(tids):
+        for tid in self.history.iter_old(tids):
             if lastdbv is not None and tid.tid == lasttid:
                 #  If this is the last transaction, is good and it doesn't
                 # match the current rpmdb ... then mark it as bad.
-                rpmdbv = self.sack.rpmdb_version(self.yumdb)
+                rpmdbv = self.base._rpmdb_version(self.sack)
                 if lastdbv != rpmdbv:
                     tid.altered_gt_rpmdb = True
             lastdbv = None
@@ -26,11 +26,16 @@ from dnf.i18n import _
 
 import dnf.callback
 import dnf.logging
+import dnf.pycomp
 import dnf.repo
 import hawkey
+import heapq
+import itertools
 import librepo
 import logging
 import os
+import threading
+import time
 
 MAX_PERCENTAGE = 50
 APPLYDELTA = '/usr/bin/applydeltarpm'
@@ -84,10 +89,12 @@ class DeltaPayload(dnf.repo.PackagePayload):
 
 
 class DeltaInfo(object):
-    def __init__(self, query, progress):
+    def __init__(self, query, progress, stats=None):
         '''A delta lookup and rebuild context
            query -- installed packages to use when looking up deltas
            progress -- progress obj to display finished delta rebuilds
+           stats -- DeltaPersistor with the observed throughput and rebuild
+                    speed, used to estimate what is faster
         '''
         deltarpm = 0
         if os.access(APPLYDELTA, os.X_OK):
@@ -98,10 +105,22 @@ class DeltaInfo(object):
         self.deltarpm = deltarpm
         self.query = query
         self.progress = progress
+        self.stats = stats
 
-        self.queue = []
-        self.jobs = {}
         self.err = {}
+        # estimated seconds for the selected deltas and for their full RPMs:
+        self.est_delta_time = 0.0
+        self.est_full_time = 0.0
+        self.rebuild_time = 0.0
+        # rebuilds waiting for a worker, the largest first:
+        self._queue = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._closing = False
+        # finished rebuilds, reported from the main thread only:
+        self._done = dnf.pycomp.Queue()
+        self._pending = 0
+        self._workers = []
 
     def delta_factory(self, po, progress):
         '''Turn a po to Delta RPM po, if possible'''
@@ -112,60 +131,126 @@ class DeltaInfo(object):
             # already there
             return None
 
-        best = po.size * MAX_PERCENTAGE / 100
+        stats = self.stats
+        if stats is None or stats.throughput is None or \
+           stats.rebuild_rate is None:
+            # no history yet, only look at the sizes
+            best = po.size * MAX_PERCENTAGE / 100
+            best_delta = None
+            for ipo in self.query.filter(name=po.name, arch=po.arch):
+                delta = po.get_delta_from_evr(ipo.evr)
+                if delta and delta.downloadsize < best:
+                    best = delta.downloadsize
+                    best_delta = delta
+            if best_delta:
+                return DeltaPayload(self, best_delta, po, progress)
+            return None
+
+        # pick what is done sooner: the full download, or the delta download
+        # plus its share of the rebuild workers' time
+        full_time = po.downloadsize / stats.throughput
+        rebuild_time = po.downloadsize * stats.rebuild_rate / self.deltarpm
+        best = full_time
         best_delta = None
         for ipo in self.query.filter(name=po.name, arch=po.arch):
             delta = po.get_delta_from_evr(ipo.evr)
-            if delta and delta.downloadsize < best:
-                best = delta.downloadsize
+            if not delta:
+                continue
+            delta_time = delta.downloadsize / stats.throughput + rebuild_time
+            if delta_time < best:
+                best = delta_time
                 best_delta = delta
         if best_delta:
+            self.est_delta_time += best
+            self.est_full_time += full_time
             return DeltaPayload(self, best_delta, po, progress)
         return None
 
-    def job_done(self, pid, code):
+    def job_done(self, pload, code, verified):
         # handle a finished delta rebuild
-        logger.log(dnf.logging.SUBDEBUG, 'drpm: %d: return code: %d, %d', pid,
-                   code >> 8, code & 0xff)
+        logger.log(dnf.logging.SUBDEBUG,
+                   'drpm: %s: return code: %d, %d, %.2f s, %.2f s CPU',
+                   pload, code >> 8, code & 0xff,
+                   pload.rebuild_time, pload.rebuild_cpu)
 
-        pload = self.jobs.pop(pid)
+        self._pending -= 1
         pkg = pload.pkg
         if code != 0:
             unlink_f(pload.pkg.localPkg())
             self.err[pkg] = [_('Delta RPM rebuild failed')]
-        elif not pload.pkg.verifyLocalPkg():
+        elif not verified:
             self.err[pkg] = [_('Checksum of the delta-rebuilt RPM failed')]
         else:
             os.unlink(pload.localPkg())
-            self.progress.end(pload, dnf.callback.STATUS_DRPM, 'done')
+            self.rebuild_time += pload.rebuild_time
+            if self.stats is not None:
+                self.stats.record_rebuild(pload.full_size, pload.rebuild_time)
+            msg = _('done in %.1f s (%.1f s CPU)') % \
+                (pload.rebuild_time, pload.rebuild_cpu)
+            self.progress.end(pload, dnf.callback.STATUS_DRPM, msg)
 
-    def start_job(self, pload):
-        # spawn a delta rebuild job
+    def _rebuild(self, pload):
+        # run a delta rebuild job and wait for it, in a worker thread
         spawn_args = [APPLYDELTA, APPLYDELTA,
                       '-a', pload.pkg.arch,
                       pload.localPkg(), pload.pkg.localPkg()]
+        start = time.time()
         pid = os.spawnl(os.P_NOWAIT, *spawn_args)
         logger.log(dnf.logging.SUBDEBUG, 'drpm: spawned %d: %s', pid,
                    ' '.join(spawn_args[1:]))
-        self.jobs[pid] = pload
+        _, code, rusage = os.wait4(pid, 0)
+        pload.rebuild_time = time.time() - start
+        pload.rebuild_cpu = rusage.ru_utime + rusage.ru_stime
+        verified = code == 0 and pload.pkg.verifyLocalPkg()
+        return pload, code, verified
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                pload = heapq.heappop(self._queue)[-1]
+            try:
+                result = self._rebuild(pload)
+            except Exception as e:
+                # the main thread is waiting for the result, never die here
+                logger.debug('drpm: %s: %s', pload, e)
+                pload.rebuild_time = pload.rebuild_cpu = 0
+                result = (pload, -1, False)
+            self._done.put(result)
+
+    def _report_done(self):
+        while True:
+            try:
+                result = self._done.get_nowait()
+            except dnf.pycomp.queue_Empty:
+                return
+            self.job_done(*result)
 
     def enqueue(self, pload):
-        # process finished jobs, start new ones
-        while self.jobs:
-            pid, code = os.waitpid(-1, os.WNOHANG)
-            if not pid:
-                break
-            self.job_done(pid, code)
-        self.queue.append(pload)
-        while len(self.jobs) < self.deltarpm:
-            self.start_job(self.queue.pop(0))
-            if not self.queue:
-                break
+        # report finished jobs, schedule the new one
+        self._report_done()
+        with self._cond:
+            heapq.heappush(self._queue,
+                           (-pload.full_size, next(self._order), pload))
+            self._cond.notify()
+        self._pending += 1
+        if len(self._workers) < self.deltarpm:
+            worker = threading.Thread(target=self._work)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
 
     def wait(self):
         '''Wait until all jobs have finished'''
-        while self.jobs:
-            pid, code = os.wait()
-            self.job_done(pid, code)
-            if self.queue:
-                self.start_job(self.queue.pop(0))
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        while self._pending:
+            self.job_done(*self._done.get())
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        self._closing = False
@@ -49,8 +49,9 @@ class Goal(hawkey.Goal):
     def push_userinstalled(self, query, yumdb):
         msg = _('--> Finding unneeded leftover dependencies')
         logger.debug(msg)
-        for pkg in query.installed():
-            yumdb_info = yumdb.get_package(pkg)
-            reason = getattr(yumdb_info, 'reason', 'user')
+        installed = query.installed().run()
+        attrs = yumdb.get_attrs(installed, ('reason',))
+        for pkg in installed:
+            reason = attrs[pkg].get('reason', 'user')
             if reason != 'dep':
                 self.userinstalled(pkg)
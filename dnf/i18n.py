@@ -23,6 +23,7 @@ from dnf.pycomp import PY3, is_py3bytes, unicode, setlocale
 import gettext
 import locale
 import os
+import re
 import sys
 import unicodedata
 
@@ -135,8 +136,17 @@ def ucd(obj):
 # They should be used instead of build-in functions to count on different
 # widths of Unicode characters
 
+# every ASCII character is one column wide, others are looked up once:
+_NON_ASCII_RE = re.compile(r'[^\x00-\x7f]')
+_char_widths = {}
+
 def _exact_width_char(uchar):
-    return 2 if unicodedata.east_asian_width(uchar) in ('W', 'F') else 1
+    try:
+        return _char_widths[uchar]
+    except KeyError:
+        width = 2 if unicodedata.east_asian_width(uchar) in ('W', 'F') else 1
+        _char_widths[uchar] = width
+        return width
 
 
 def chop_str(msg, chop=None):
@@ -147,6 +157,9 @@ def chop_str(msg, chop=None):
 
     if chop is None:
         return exact_width(msg), msg
+    if not _NON_ASCII_RE.search(msg):
+        msg = msg[:max(chop, 0)]
+        return len(msg), msg
 
     width = 0
     chopped_msg = ""
@@ -162,7 +175,8 @@ def chop_str(msg, chop=None):
 def exact_width(msg):
     """ Calculates width of char at terminal screen
         (Asian char counts for two) """
-    return sum(_exact_width_char(c) for c in msg)
+    return len(msg) + sum(_exact_width_char(c) - 1
+                          for c in _NON_ASCII_RE.findall(msg))
 
 
 def fill_exact_width(msg, fill, chop=None, left=True, prefix='', suffix=''):
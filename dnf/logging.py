@@ -172,11 +172,21 @@ class Logging(object):
 
 
 class Timer(object):
-    def __init__(self, what):
+    def __init__(self, what, parent=None):
+        """Start timing `what`.
+
+        A stage of a `parent` Timer also reports when it started relative to
+        the parent, so overlapping stages can be told apart in the log.
+
+        """
         self.what = what
+        self.parent = parent
         self.start = time.time()
 
     def __call__(self):
         diff = time.time() - self.start
         msg = 'timer: %s: %d ms' % (self.what, diff * 1000)
+        if self.parent is not None:
+            offset = self.start - self.parent.start
+            msg += ' (from +%d ms of %s)' % (offset * 1000, self.parent.what)
         logging.getLogger("dnf").log(DDEBUG, msg)
@@ -32,6 +32,17 @@ import os
 
 logger = logging.getLogger("dnf")
 
+# checksums the local package files were verified against, by path. A file is
+# trusted without reading it again while its inode, size and mtime are kept.
+_VERIFIED = {}
+
+def _file_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime)
+
 
 class Package(hawkey.Package):
     """ Represents a package. #:api """
@@ -174,6 +185,17 @@ class Package(hawkey.Package):
         (chksum_type, chksum) = self.chksum
         return (hawkey.chksum_name(chksum_type), binascii.hexlify(chksum).decode())
 
+    def _mark_verified(self):
+        """Remember localPkg() matches the checksum, as librepo checked it.
+
+        Only to be called right after a real check of the checksum.
+
+        """
+        path = self.localPkg()
+        key = _file_key(path)
+        if key is not None:
+            _VERIFIED[path] = (key, self.returnIdSum())
+
     # yum compatibility method
     def verifyLocalPkg(self):
         if self.from_system:
@@ -181,10 +203,17 @@ class Package(hawkey.Package):
         if self.from_cmdline:
             return True # local package always verifies against itself
         (chksum_type, chksum) = self.returnIdSum()
-        real_sum = dnf.yum.misc.checksum(chksum_type, self.localPkg(),
+        path = self.localPkg()
+        key = _file_key(path)
+        if key is not None and \
+           _VERIFIED.get(path) == (key, (chksum_type, chksum)):
+            return True
+        real_sum = dnf.yum.misc.checksum(chksum_type, path,
                                          datasize=self.size)
         if real_sum != chksum:
             logger.debug('%s: %s check failed: %s vs %s' %
                          (self, chksum_type, real_sum, chksum))
             return False
+        if key is not None:
+            _VERIFIED[path] = (key, (chksum_type, chksum))
         return True
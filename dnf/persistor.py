@@ -33,6 +33,8 @@ import errno
 import json
 import logging
 import os
+import threading
+import time
 
 logger = logging.getLogger("dnf")
 
@@ -303,6 +305,47 @@ class GroupPersistor(object):
         return True
 
 
+class RpmdbPersistor(object):
+    """The last computed rpmdb version and the rpmdb cookie it belongs to.
+
+    Is installroot specific and stores to cachedir.
+
+    """
+
+    def __init__(self, cachedir):
+        self.cachedir = cachedir
+
+    @property
+    def _json_path(self):
+        return os.path.join(self.cachedir, "rpmdb_version.json")
+
+    def get_version(self, cookie):
+        """Return the version stored for `cookie`, None if there is none."""
+        if cookie is None:
+            return None
+        try:
+            with open(self._json_path, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if data.get('cookie') != cookie:
+            return None
+        return data.get('version')
+
+    def set_version(self, cookie, version):
+        if cookie is None:
+            return False
+        data = {'cookie' : cookie, 'version' : str(version)}
+        try:
+            dnf.util.ensure_dir(self.cachedir)
+            with open(self._json_path, 'w') as f:
+                json.dump(data, f)
+            return True
+        except (IOError, OSError):
+            logger.info("Failed storing the rpmdb version.")
+            return False
+
+
 class RepoPersistor(object):
     """Persistent data kept for repositories.
 
@@ -365,3 +408,179 @@ class RepoPersistor(object):
         except OSError:
             logger.info("Failed determining last makecache time.")
             return None
+
+
+class DeltaPersistor(object):
+    """Observed download throughput and delta rebuild speed.
+
+    Is arch/releasever specific and stores to cachedir. Both values are None
+    until there is a first observation.
+
+    """
+
+    # weight of a new observation in the running averages:
+    SMOOTHING = 0.3
+
+    def __init__(self, cachedir):
+        self.cachedir = cachedir
+        self.throughput = None  # bytes per second
+        self.rebuild_rate = None  # seconds per byte of the rebuilt RPM
+        self._load()
+
+    @property
+    def _json_path(self):
+        return os.path.join(self.cachedir, "drpm_stats.json")
+
+    def _load(self):
+        try:
+            with open(self._json_path, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        self.throughput = data.get('throughput')
+        self.rebuild_rate = data.get('rebuild_rate')
+
+    def _average(self, old, new):
+        if old is None:
+            return new
+        return old + self.SMOOTHING * (new - old)
+
+    def record_download(self, size, seconds):
+        if size <= 0 or seconds <= 0:
+            return
+        self.throughput = self._average(self.throughput, size / float(seconds))
+
+    def record_rebuild(self, size, seconds):
+        if size <= 0 or seconds <= 0:
+            return
+        self.rebuild_rate = self._average(self.rebuild_rate,
+                                          seconds / float(size))
+
+    def save(self):
+        data = {'throughput' : self.throughput,
+                'rebuild_rate' : self.rebuild_rate}
+        try:
+            dnf.util.ensure_dir(self.cachedir)
+            with open(self._json_path, 'w') as f:
+                json.dump(data, f)
+            return True
+        except (IOError, OSError):
+            logger.info("Failed storing delta RPM statistics.")
+            return False
+
+
+class MirrorPersistor(object):
+    """Observed throughput and failures of the individual mirrors.
+
+    Is arch/releasever specific and stores to cachedir. Can be updated from
+    several threads at once.
+
+    """
+
+    # a failure keeps the mirror at the end of the list for this long:
+    FAILURE_EXPIRY = 24 * 60 * 60
+    # forget mirrors not used for this long:
+    MAX_AGE = 30 * 24 * 60 * 60
+    # weight of a new observation in the running average:
+    SMOOTHING = 0.3
+    # the mirrors are ranked by the expected time of a transfer this big:
+    TRANSFER_SIZE = 1024 ** 2
+
+    def __init__(self, cachedir):
+        self.cachedir = cachedir
+        self._lock = threading.Lock()
+        self._mirrors = {}
+        self._load()
+
+    @property
+    def _json_path(self):
+        return os.path.join(self.cachedir, "mirror_stats.json")
+
+    def _load(self):
+        try:
+            with open(self._json_path, 'r') as f:
+                self._mirrors = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+
+    def _mirror(self, url):
+        mirror = self._mirrors.setdefault(
+            url, {'throughput' : None, 'failures' : 0, 'failed' : 0})
+        mirror['seen'] = time.time()
+        return mirror
+
+    def _cost(self, url):
+        # expected seconds of a TRANSFER_SIZE transfer, None if not measured
+        mirror = self._mirrors.get(url)
+        if mirror is None or not mirror['throughput']:
+            return None
+        return (mirror.get('latency') or 0) + \
+            self.TRANSFER_SIZE / mirror['throughput']
+
+    def _sort_key(self, now, url, untried_cost):
+        mirror = self._mirrors.get(url)
+        failures = 0
+        if mirror is not None and \
+           now - mirror['failed'] <= self.FAILURE_EXPIRY:
+            failures = mirror['failures']
+        cost = self._cost(url)
+        if cost is None:
+            # never measured, goes after the measured ones of the same cost:
+            return (failures, untried_cost, 1)
+        return (failures, cost, 0)
+
+    def order(self, urls):
+        """Sort `urls` the fastest first, the recently failing ones last.
+
+        The mirrors never measured rank as the average of the measured ones,
+        so they get tried too. Equal ones keep their relative order.
+
+        """
+        now = time.time()
+        with self._lock:
+            costs = [cost for cost in map(self._cost, urls)
+                     if cost is not None]
+            untried_cost = sum(costs) / len(costs) if costs else 0
+            return sorted(urls, key=lambda url: self._sort_key(
+                now, url, untried_cost))
+
+    def record_failure(self, url):
+        with self._lock:
+            mirror = self._mirror(url)
+            mirror['failures'] += 1
+            mirror['failed'] = mirror['seen']
+
+    def _smooth(self, mirror, what, value):
+        old = mirror.get(what)
+        if old is not None:
+            value = old + self.SMOOTHING * (value - old)
+        mirror[what] = value
+
+    def record_transfer(self, url, size, seconds, latency=None):
+        """Record a successful transfer of `size` bytes.
+
+        `latency` is the time until its first byte arrived, if known.
+
+        """
+        if size <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            mirror = self._mirror(url)
+            mirror['failures'] = 0
+            self._smooth(mirror, 'throughput', size / float(seconds))
+            if latency is not None:
+                self._smooth(mirror, 'latency', latency)
+
+    def save(self):
+        now = time.time()
+        with self._lock:
+            data = {url : mirror for (url, mirror) in self._mirrors.items()
+                    if now - mirror.get('seen', 0) < self.MAX_AGE}
+        try:
+            dnf.util.ensure_dir(self.cachedir)
+            with open(self._json_path, 'w') as f:
+                json.dump(data, f)
+            return True
+        except (IOError, OSError):
+            logger.info("Failed storing mirror statistics.")
+            return False
@@ -0,0 +1,102 @@
+# pkgstore.py
+# Content-addressed package store shared by repos and installroots.
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from dnf.i18n import _
+
+import dnf.logging
+import dnf.util
+import errno
+import logging
+import os
+import shutil
+
+logger = logging.getLogger("dnf")
+
+
+class PackageStore(object):
+    """Verified package files stored under their checksum.
+
+    The files are shared through hardlinks with the pkgdirs of the repos, so
+    the same package is only downloaded once no matter how many repos carry it
+    or how many installroots use it. Falls back to copying when the store is
+    on a different filesystem.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _place(self, src, dst):
+        # make dst a hardlink to src, or a copy of it
+        dnf.util.ensure_dir(os.path.dirname(dst))
+        tmp = '%s.%d.tmp' % (dst, os.getpid())
+        try:
+            os.link(src, tmp)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.copy2(src, tmp)
+        os.rename(tmp, dst)
+
+    def stored_path(self, pkg):
+        (chksum_type, chksum) = pkg.returnIdSum()
+        return os.path.join(self.path, chksum_type, chksum[:2], chksum)
+
+    def fetch(self, pkg):
+        """Put the stored copy of `pkg` to its localPkg(), if there is one.
+
+        Returns True if the package needs no download.
+
+        """
+        stored = self.stored_path(pkg)
+        if not os.path.exists(stored):
+            return False
+        try:
+            self._place(stored, pkg.localPkg())
+        except (IOError, OSError) as e:
+            logger.warning(_('Cannot use %s from the package store: %s'),
+                           pkg, e)
+            return False
+        # the stored file could have been changed since:
+        if not pkg.verifyLocalPkg():
+            logger.warning(_('Damaged %s in the package store, removing it.'),
+                           pkg)
+            for path in (pkg.localPkg(), stored):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            return False
+        logger.log(dnf.logging.DDEBUG, 'pkgstore: using %s for %s',
+                   stored, pkg)
+        return True
+
+    def store(self, pkg):
+        """Add the downloaded `pkg` to the store, if it is verified."""
+        stored = self.stored_path(pkg)
+        if os.path.exists(stored) or not pkg.verifyLocalPkg():
+            return
+        try:
+            self._place(pkg.localPkg(), stored)
+        except (IOError, OSError) as e:
+            logger.warning(_('Cannot add %s to the package store: %s'),
+                           pkg, e)
@@ -35,6 +35,7 @@ if PY3:
 
     # functions renamed in py3
     Queue = queue.Queue
+    queue_Empty = queue.Empty
     basestring = unicode = str
     filterfalse = itertools.filterfalse
     long = int
@@ -62,6 +63,10 @@ if PY3:
     def email_mime(body):
         return email.mime.text.MIMEText(body)
 
+    # raise with an explicit traceback
+    def reraise(tp, value, tb):
+        raise value.with_traceback(tb)
+
 else:
     # functions renamed in py3
     from __builtin__ import unicode, basestring, long, xrange, raw_input
@@ -70,6 +75,7 @@ else:
     import urllib
     import urlparse
 
+    queue_Empty = Queue.Empty
     Queue = Queue.Queue
     filterfalse = itertools.ifilterfalse
     base64_decodebytes = base64.decodestring
@@ -91,3 +97,6 @@ else:
         f.write(content.encode('utf-8'))
     def email_mime(body):
         return email.mime.text.MIMEText(body.encode('utf-8'))
+
+    # raise with an explicit traceback, the py2 syntax is invalid in py3
+    exec('def reraise(tp, value, tb):\n    raise tp, value, tb\n')
@@ -33,6 +33,7 @@ import dnf.util
 import dnf.yum.config
 import dnf.yum.misc
 import functools
+import itertools
 import hawkey
 import logging
 import librepo
@@ -40,6 +41,7 @@ import operator
 import os
 import shutil
 import string
+import threading
 import time
 import types
 
@@ -47,6 +49,8 @@ _METADATA_RELATIVE_DIR = "repodata"
 _METALINK_FILENAME = "metalink.xml"
 _MIRRORLIST_FILENAME = "mirrorlist"
 _RECOGNIZED_CHKSUMS = ['sha512', 'sha256']
+# repos can sync concurrently but they share the progress meter:
+_MD_PROGRESS_LOCK = threading.RLock()
 
 logger = logging.getLogger("dnf")
 
@@ -93,6 +97,7 @@ class _DownloadErrors(object):
         self._recoverable = {}
         self.fatal = None
         self.skipped = set()
+        self.download_time = 0
 
     @property
     def irrecoverable(self):
@@ -121,12 +126,21 @@ def download_payloads(payloads, drpm):
     drpm.err.clear()
     targets = [pload.librepo_target() for pload in payloads]
     errs = _DownloadErrors()
+    start = time.time()
     try:
         librepo.download_packages(targets, failfast=True)
     except librepo.LibrepoException as e:
         errs.fatal = e.args[1] or '<unspecified librepo error>'
+    errs.download_time = time.time() - start
     drpm.wait()
 
+    for tgt in targets:
+        payload = tgt.cbdata
+        if tgt.err is None and payload.download_time:
+            payload.pkg.repo._record_mirror_transfer(
+                getattr(tgt, 'effective_url', None), payload.download_size,
+                payload.download_time, payload.latency)
+
     # process downloading errors
     errs.recoverable = drpm.err.copy()
     for tgt in targets:
@@ -292,6 +306,10 @@ class PackagePayload(dnf.callback.Payload):
     def __init__(self, pkg, progress):
         super(PackagePayload, self).__init__(progress)
         self.pkg = pkg
+        self.download_time = None
+        # seconds until the first byte arrived:
+        self.latency = None
+        self._start = None
 
     @dnf.util.log_method_call(functools.partial(logger.log, dnf.logging.SUBDEBUG))
     def _end_cb(self, cbdata, lr_status, msg):
@@ -303,14 +321,21 @@ class PackagePayload(dnf.callback.Payload):
             return
         elif lr_status == librepo.TRANSFER_ALREADYEXISTS:
             status = dnf.callback.STATUS_ALREADY_EXISTS
+        if status == dnf.callback.STATUS_OK and self._start is not None:
+            self.download_time = time.time() - self._start
 
         self.progress.end(self, status, msg)
 
     @dnf.util.log_method_call(functools.partial(logger.log, dnf.logging.SUBDEBUG))
     def _mirrorfail_cb(self, cbdata, err, url):
+        self.pkg.repo._record_mirror_failure(url)
         self.progress.end(self, dnf.callback.STATUS_MIRROR, err)
 
     def _progress_cb(self, cbdata, total, done):
+        if self._start is None:
+            self._start = time.time()
+        elif done and self.latency is None:
+            self.latency = time.time() - self._start
         self.progress.progress(self, done)
 
     @property
@@ -346,10 +371,22 @@ class RPMPayload(PackagePayload):
     def __str__(self):
         return os.path.basename(self.pkg.location)
 
+    def _checksum_type(self):
+        ctype = self.pkg.returnIdSum()[0]
+        return getattr(librepo, ctype.upper(), librepo.CHECKSUM_UNKNOWN)
+
+    def _end_cb(self, cbdata, lr_status, msg):
+        super(RPMPayload, self)._end_cb(cbdata, lr_status, msg)
+        if msg is not None and lr_status != librepo.TRANSFER_ALREADYEXISTS:
+            return
+        if self._checksum_type() != librepo.CHECKSUM_UNKNOWN:
+            # librepo checked the checksum, no need to read the file again
+            self.pkg._mark_verified()
+
     def _target_params(self):
         pkg = self.pkg
         ctype, csum = pkg.returnIdSum()
-        ctype_code = getattr(librepo, ctype.upper(), librepo.CHECKSUM_UNKNOWN)
+        ctype_code = self._checksum_type()
         if ctype_code == librepo.CHECKSUM_UNKNOWN:
             logger.warn(_("unsupported checksum type: %s"), ctype)
 
@@ -380,7 +417,8 @@ class MDPayload(dnf.callback.Payload):
 
     def _progress_cb(self, cbdata, total, done):
         self._download_size = total
-        self.progress.progress(self, done)
+        with _MD_PROGRESS_LOCK:
+            self.progress.progress(self, done)
 
     def _fastestmirror_cb(self, cbdata, stage, data):
         if stage == librepo.FMSTAGE_DETECTION:
@@ -392,7 +430,8 @@ class MDPayload(dnf.callback.Payload):
             msg = 'error: %s\n' % data if data else 'done.\n'
         else:
             return
-        self.progress.message(msg)
+        with _MD_PROGRESS_LOCK:
+            self.progress.message(msg)
 
     def _mirror_failure_cb(self, cbdata, msg, url, metadata):
         msg = 'error: %s (%s).' % (msg, url)
@@ -415,11 +454,13 @@ class MDPayload(dnf.callback.Payload):
     def start(self, text):
         self._text = text
         self._download_size = 0
-        self.progress.start(1, 1)
+        with _MD_PROGRESS_LOCK:
+            self.progress.start(1, 1)
 
     def end(self):
         self._download_size = 0
-        self.progress.end(self, None, None)
+        with _MD_PROGRESS_LOCK:
+            self.progress.end(self, None, None)
 
 
 # use the local cache even if it's expired. download if there's no cache.
@@ -447,6 +488,7 @@ class Repo(dnf.yum.config.RepoConf):
         self.sync_strategy = self.DEFAULT_SYNC
         self.substitutions = dnf.conf.substitutions.Substitutions()
         self.max_mirror_tries = 0 # try them all
+        self.mirror_stats = None
         self._handle = None
         self.hawkey_repo = self._init_hawkey_repo()
 
@@ -569,6 +611,33 @@ class Repo(dnf.yum.config.RepoConf):
             self._md_pload.end()
         return Metadata(result, handle)
 
+    def _handle_load_incremental(self, handle):
+        """Download only the metadata files changed since the cached copy.
+
+        The unchanged files are taken from the cache, found by the checksums
+        in the fresh repomd.xml.
+
+        """
+        yumdlist = handle.yumdlist
+        handle.yumdlist = []  # only repomd.xml
+        if handle.progresscb:
+            self._md_pload.start(self.name)
+        result = handle.perform()
+        changed = [what for what in yumdlist
+                   if what in result.yum_repomd and
+                   not self._reuse_md_file(what, result.yum_repomd[what],
+                                           handle.destdir)]
+        reused = sorted(set(yumdlist) - set(changed))
+        if reused:
+            logger.debug('repo: %s: reusing cached %s', self.id,
+                         ', '.join(reused))
+        if changed:
+            handle.yumdlist = changed
+            handle.update = True
+            handle.perform(result)
+        if handle.progresscb:
+            self._md_pload.end()
+
     def _handle_load_with_pubring(self, handle):
         with dnf.crypto.pubring_dir(self.pubring_dir):
             return self._handle_load_core(handle)
@@ -589,15 +658,22 @@ class Repo(dnf.yum.config.RepoConf):
         # setup mirror URLs
         mirrorlist = self.metalink or self.mirrorlist
         if mirrorlist:
-            h.hmfcb = self._md_pload._mirror_failure_cb
+            h.hmfcb = self._md_mirror_failure_cb
+            known = self._known_mirrors()
             if mirror_setup:
                 h.setopt(librepo.LRO_MIRRORLIST, mirrorlist)
-                h.setopt(librepo.LRO_FASTESTMIRROR, self.fastestmirror)
-                h.setopt(librepo.LRO_FASTESTMIRRORCACHE,
-                         os.path.join(self.basecachedir, 'fastestmirror.cache'))
+                if known and self.mirror_stats is not None:
+                    #  the mirrors that served best go first, ahead of the
+                    # fresh list, instead of pinging them all:
+                    h.setopt(librepo.LRO_URLS, known)
+                else:
+                    h.setopt(librepo.LRO_FASTESTMIRROR, self.fastestmirror)
+                    h.setopt(librepo.LRO_FASTESTMIRRORCACHE,
+                             os.path.join(self.basecachedir,
+                                          'fastestmirror.cache'))
             else:
                 # use already resolved mirror list
-                h.setopt(librepo.LRO_URLS, self.metadata.mirrors)
+                h.setopt(librepo.LRO_URLS, known)
         elif self.baseurl:
             h.setopt(librepo.LRO_URLS, self.baseurl)
         else:
@@ -637,6 +713,56 @@ class Repo(dnf.yum.config.RepoConf):
 
         return h
 
+    def _known_mirrors(self):
+        """The mirrors of the metadata we have, the best known first."""
+        mirrors = self.metadata.mirrors if self.metadata else []
+        if self.mirror_stats is not None:
+            mirrors = self.mirror_stats.order(mirrors)
+        return mirrors
+
+    def _md_mirror_failure_cb(self, cbdata, msg, url, metadata):
+        self._md_pload._mirror_failure_cb(cbdata, msg, url, metadata)
+        self._record_mirror_failure(url)
+
+    def _mirror_of(self, url):
+        # the mirror the url points into, or None
+        if url is None:
+            return None
+        mirrors = self.metadata.mirrors if self.metadata else []
+        for mirror in itertools.chain(mirrors, self.baseurl):
+            if url.startswith(mirror):
+                return mirror
+        return None
+
+    def _record_mirror_failure(self, url):
+        mirror = self._mirror_of(url)
+        if self.mirror_stats is not None and mirror is not None:
+            self.mirror_stats.record_failure(mirror)
+
+    def _record_mirror_transfer(self, url, size, seconds, latency=None):
+        mirror = self._mirror_of(url)
+        if self.mirror_stats is not None and mirror is not None:
+            self.mirror_stats.record_transfer(mirror, size, seconds, latency)
+
+    def _reuse_md_file(self, what, record, destdir):
+        # put the cached file in place if it matches the fresh repomd record
+        cached = self.metadata.repomd_dct.get(what)
+        path = self.metadata.repo_dct.get(what)
+        if not isinstance(cached, dict) or path is None or \
+           cached.get('checksum') != record.get('checksum'):
+            return False
+        target = os.path.join(destdir, record['location_href'])
+        try:
+            dnf.util.ensure_dir(os.path.dirname(target))
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copy2(path, target)
+        except (IOError, OSError) as e:
+            logger.debug('repo: %s: cannot reuse %s: %s', self.id, path, e)
+            return False
+        return True
+
     def _init_hawkey_repo(self):
         hrepo = hawkey.Repo(self.id)
         hrepo.cost = self.cost
@@ -756,7 +882,9 @@ class Repo(dnf.yum.config.RepoConf):
         Note that destdir is None, and the handle is cached.
         """
         if not self._handle:
-            self._handle = self._handle_new_remote(None)
+            # no need to resolve the mirrors again once we have the metadata
+            mirror_setup = not (self.metadata and self.metadata.mirrors)
+            self._handle = self._handle_new_remote(None, mirror_setup)
         return self._handle
 
     def load(self):
@@ -791,7 +919,10 @@ class Repo(dnf.yum.config.RepoConf):
                 handle = self._handle_new_remote(tmpdir)
                 msg = 'repo: downloading from remote: %s, %s'
                 logger.log(dnf.logging.DDEBUG, msg, self.id, handle)
-                self._handle_load(handle)
+                if self.metadata and not self.repo_gpgcheck:
+                    self._handle_load_incremental(handle)
+                else:
+                    self._handle_load(handle)
                 # override old md with the new ones:
                 self._replace_metadata(handle)
 
@@ -21,9 +21,13 @@ from . import transaction
 from dnf.pycomp import is_py3bytes
 import dnf.const
 import dnf.exceptions
+import os
 import rpm
 import sys
 
+# files the rpmdb keeps the headers in, with the different backends:
+_RPMDB_FILES = ('Packages', 'Packages.db', 'rpmdb.sqlite')
+
 
 def detect_releasever(installroot):
     """Calculate the release version for the system. :api"""
@@ -48,6 +52,35 @@ def detect_releasever(installroot):
         return releasever
     return None
 
+def _stat_cookie(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return '%d:%d:%d' % (st.st_ino, st.st_size, int(st.st_mtime * 1000000))
+
+def rpmdb_cookie(installroot, yumdb=None):
+    """Return a string that changes whenever the rpmdb does.
+
+    With `yumdb`, it changes whenever the yumdb does too. None if the rpmdb
+    files can not be found.
+
+    """
+    dbpath = rpm.expandMacro('%{_dbpath}')
+    for fn in _RPMDB_FILES:
+        path = os.path.join(installroot, dbpath.lstrip('/'), fn)
+        cookie = _stat_cookie(path)
+        if cookie is None:
+            continue
+        cookie = '%s:%s' % (fn, cookie)
+        if fn == 'rpmdb.sqlite':
+            # the latest changes can be in the write-ahead log only:
+            cookie += ' wal:%s' % _stat_cookie(path + '-wal')
+        if yumdb is not None:
+            cookie += ' yumdb:%s' % yumdb.cookie()
+        return cookie
+    return None
+
 def header(path):
     """Return RPM header of the file."""
     ts = transaction.initReadOnlyTransaction()
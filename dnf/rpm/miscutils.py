@@ -21,6 +21,7 @@ import gzip
 import os
 import sys
 import locale
+import multiprocessing
 import signal
 
 from .error import RpmUtilsError
@@ -88,6 +89,53 @@ def checkSig(ts, package):
     ts.setVSFlags(currentflags) # put things back like they were before
     return value
 
+# fewer packages than this are checked in the calling process:
+_PARALLEL_SIG_CHECKS_MIN = 8
+# transaction set of a checkSigs() worker process:
+_worker_ts = None
+
+def _init_sig_worker(root):
+    global _worker_ts
+    _worker_ts = transaction.initReadOnlyTransaction(root)
+
+def _check_sig_worker(package):
+    return checkSig(_worker_ts, package)
+
+def checkSigs(root, packages):
+    """Like checkSig() for each of the packages, run in a pool of processes.
+
+    Each process uses its own transaction set of the given root, there are
+    no more processes than packages or CPUs. A few packages are checked
+    serially, starting the processes would take longer. Returns the results
+    in the order of packages.
+
+    """
+    try:
+        cpus = multiprocessing.cpu_count()
+    except NotImplementedError:
+        cpus = 1
+    processes = min(len(packages), cpus)
+    if len(packages) < _PARALLEL_SIG_CHECKS_MIN or processes < 2:
+        ts = transaction.initReadOnlyTransaction(root)
+        try:
+            return [checkSig(ts, package) for package in packages]
+        finally:
+            ts.close()
+
+    pool = multiprocessing.Pool(processes=processes,
+                                initializer=_init_sig_worker,
+                                initargs=(root,))
+    try:
+        results = pool.map(_check_sig_worker, packages)
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+    return results
+
 def getSigInfo(hdr):
     """checks signature from an hdr hand back signature information and/or
        an error code"""
@@ -57,6 +57,36 @@ class SackVersion(object):
 class Sack(hawkey.Sack):
     def __init__(self, *args, **kwargs):
         super(Sack, self).__init__(*args, **kwargs)
+        # pkg_spec resolutions of dnf.subject.Subject, valid until a change:
+        self._subject_cache = {}
+
+    def add_cmdline_package(self, *args, **kwargs):
+        self._subject_cache.clear()
+        return super(Sack, self).add_cmdline_package(*args, **kwargs)
+
+    def add_excludes(self, *args, **kwargs):
+        self._subject_cache.clear()
+        return super(Sack, self).add_excludes(*args, **kwargs)
+
+    def add_includes(self, *args, **kwargs):
+        self._subject_cache.clear()
+        return super(Sack, self).add_includes(*args, **kwargs)
+
+    def disable_repo(self, *args, **kwargs):
+        self._subject_cache.clear()
+        return super(Sack, self).disable_repo(*args, **kwargs)
+
+    def enable_repo(self, *args, **kwargs):
+        self._subject_cache.clear()
+        return super(Sack, self).enable_repo(*args, **kwargs)
+
+    def load_repo(self, *args, **kwargs):
+        self._subject_cache.clear()
+        return super(Sack, self).load_repo(*args, **kwargs)
+
+    def load_system_repo(self, *args, **kwargs):
+        self._subject_cache.clear()
+        return super(Sack, self).load_system_repo(*args, **kwargs)
 
     def configure(self, installonly=None, installonly_limit=0):
         if installonly:
@@ -70,11 +100,12 @@ class Sack(hawkey.Sack):
     def rpmdb_version(self, yumdb):
         pkgs = self.query().installed().run()
         main = SackVersion()
+        attrs = yumdb.get_attrs(pkgs, ('checksum_type', 'checksum_data'))
         for pkg in pkgs:
-            ydbi = yumdb.get_package(pkg)
+            ydbi = attrs[pkg]
             csum = None
             if 'checksum_type' in ydbi and 'checksum_data' in ydbi:
-                csum = (ydbi.checksum_type, ydbi.checksum_data)
+                csum = (ydbi['checksum_type'], ydbi['checksum_data'])
             main.update(pkg, csum)
         return main
 
@@ -0,0 +1,239 @@
+# search_index.py
+# Inverted index of the package attributes looked at by 'dnf search'.
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from dnf.i18n import ucd
+from dnf.yum.sqlutils import sqlite, executeSQL, executeSQLMany
+
+import dnf.sack
+import hashlib
+import hawkey
+import logging
+import os
+
+logger = logging.getLogger("dnf")
+
+FIELDS = ('name', 'summary', 'description', 'url')
+# the length of the substrings of the words the index maps to the words:
+GRAM = 3
+# changes with the layout of the index, to replace the old ones:
+FORMAT = '2'
+# how many words are looked up in a single statement:
+_WORDS_CHUNK = 500
+
+
+def _words(text):
+    if not text:
+        return set()
+    return set(ucd(text).lower().split())
+
+
+def _grams(word):
+    return set(word[i:i + GRAM] for i in range(len(word) - GRAM + 1))
+
+
+def index_path(cachedir, repo):
+    return os.path.join(cachedir, repo.id + '-search.sqlite')
+
+
+def repo_cookie(repo):
+    """Identify the metadata revision of `repo`.
+
+    Returns None if the repo has no metadata to index.
+
+    """
+    if repo.metadata is None or not repo.metadata.repomd_fn:
+        return None
+    chksum = hashlib.sha256(FORMAT.encode('utf-8'))
+    try:
+        with open(repo.metadata.repomd_fn, 'rb') as repomd:
+            chksum.update(repomd.read())
+    except (IOError, OSError):
+        return None
+    return chksum.hexdigest()
+
+
+def _repo_packages(base, repo):
+    """All the packages of `repo`, read into a sack of their own.
+
+    Nothing is excluded from this sack, so the index does not depend on the
+    excludes of the configuration or of the plugins. The matches are checked
+    against the sack of the base.
+
+    """
+    sack = dnf.sack.build_sack(base)
+    hrepo = repo._init_hawkey_repo()
+    hrepo.repomd_fn = repo.repomd_fn
+    hrepo.primary_fn = repo.primary_fn
+    hrepo.filelists_fn = repo.filelists_fn
+    sack.load_repo(hrepo, build_cache=False, load_filelists=False)
+    return sack.query().run()
+
+
+def repo_index(base, repo):
+    """Return the up to date SearchIndex of `repo`, building it if needed.
+
+    Returns None if there can be no index for the repo.
+
+    """
+    cookie = repo_cookie(repo)
+    if cookie is None:
+        return None
+    index = SearchIndex(index_path(base.conf.cachedir, repo))
+    if index.cookie() == cookie:
+        return index
+    try:
+        index.build(_repo_packages(base, repo), cookie)
+    except (IOError, OSError, sqlite.Error, hawkey.Exception) as e:
+        logger.debug('search index: cannot build %s: %s', index.path, e)
+        return None
+    return index
+
+
+class SearchIndex(object):
+    """The words of the searched attributes, mapped to the names of the
+    packages of one repo having them, and the substrings of GRAM characters
+    of the words, mapped to the words.
+
+    A needle without whitespace can only be found within a single word. The
+    words having it are among the words having all its substrings of GRAM
+    characters, and the packages that can match it are known from the words
+    alone. Deciding the actual match is left to the sack.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._names = None
+
+    def _cursor(self):
+        if self._conn is None:
+            self._conn = sqlite.connect(self.path)
+        return self._conn.cursor()
+
+    def build(self, pkgs, cookie):
+        names = sorted(set(pkg.name for pkg in pkgs))
+        name_ids = dict((name, i) for (i, name) in enumerate(names))
+        words = {}
+        for pkg in pkgs:
+            name_id = name_ids[pkg.name]
+            for field in FIELDS:
+                for word in _words(getattr(pkg, field)):
+                    words.setdefault((field, word), set()).add(name_id)
+        grams = {}
+        for (word_id, (field, word)) in enumerate(words):
+            for gram in _grams(word):
+                grams.setdefault((field, gram), []).append(word_id)
+
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        conn = sqlite.connect(tmp)
+        try:
+            cur = conn.cursor()
+            executeSQL(cur, """CREATE TABLE meta
+                               (key TEXT PRIMARY KEY, value TEXT)""")
+            executeSQL(cur, """CREATE TABLE names
+                               (id INTEGER PRIMARY KEY, name TEXT)""")
+            executeSQL(cur, """CREATE TABLE words
+                               (id INTEGER PRIMARY KEY, word TEXT, ids TEXT)""")
+            executeSQL(cur, """CREATE TABLE grams
+                               (field TEXT, gram TEXT, word_ids TEXT,
+                                PRIMARY KEY (field, gram))""")
+            executeSQL(cur, "INSERT INTO meta VALUES ('cookie', ?)", (cookie,))
+            executeSQLMany(cur, "INSERT INTO names VALUES (?, ?)",
+                           enumerate(names))
+            executeSQLMany(cur, "INSERT INTO words VALUES (?, ?, ?)",
+                           ((word_id, word, ' '.join(map(str, ids)))
+                            for (word_id, ((_field, word), ids))
+                            in enumerate(words.items())))
+            executeSQLMany(cur, "INSERT INTO grams VALUES (?, ?, ?)",
+                           ((field, gram, ' '.join(map(str, word_ids)))
+                            for ((field, gram), word_ids) in grams.items()))
+            conn.commit()
+        finally:
+            conn.close()
+        self.close()
+        os.rename(tmp, self.path)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self._names = None
+
+    def cookie(self):
+        """The cookie the index was built for, None if there is no index."""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            cur = self._cursor()
+            executeSQL(cur, "SELECT value FROM meta WHERE key = 'cookie'")
+            row = cur.fetchone()
+        except sqlite.Error:
+            return None
+        return row[0] if row else None
+
+    def _piece_ids(self, cur, field, piece):
+        # the ids of the names having a word in field containing piece
+        word_ids = None
+        for gram in _grams(piece):
+            executeSQL(cur, """SELECT word_ids FROM grams
+                               WHERE field = ? AND gram = ?""", (field, gram))
+            row = cur.fetchone()
+            gram_ids = set(row[0].split()) if row else set()
+            word_ids = gram_ids if word_ids is None else word_ids & gram_ids
+            if not word_ids:
+                return set()
+
+        ids = set()
+        word_ids = sorted(word_ids)
+        for start in range(0, len(word_ids), _WORDS_CHUNK):
+            chunk = word_ids[start:start + _WORDS_CHUNK]
+            executeSQL(cur, "SELECT word, ids FROM words WHERE id IN (%s)"
+                       % ', '.join(['?'] * len(chunk)), chunk)
+            for (word, word_name_ids) in cur:
+                if piece in word:
+                    ids.update(word_name_ids.split())
+        return ids
+
+    def names(self, field, needle):
+        """Names of the packages whose `field` might contain `needle`.
+
+        Returns None if the index can not tell, that is when no word of the
+        needle has GRAM characters.
+
+        """
+        pieces = [piece for piece in ucd(needle).lower().split()
+                  if len(piece) >= GRAM]
+        if not pieces:
+            return None
+        cur = self._cursor()
+        ids = None
+        for piece in pieces:
+            piece_ids = self._piece_ids(cur, field, piece)
+            ids = piece_ids if ids is None else ids & piece_ids
+            if not ids:
+                return set()
+
+        if self._names is None:
+            executeSQL(cur, "SELECT name FROM names ORDER BY id")
+            self._names = [row[0] for row in cur]
+        return set(self._names[int(i)] for i in ids)
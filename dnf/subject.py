@@ -27,6 +27,58 @@ import dnf.selector
 import hawkey
 import re
 
+
+def _memoized(sack, key, resolve):
+    # the pkg_spec resolutions are kept by the sack until it changes
+    cache = getattr(sack, '_subject_cache', None)
+    if cache is None:
+        return resolve()
+    try:
+        return cache[key]
+    except KeyError:
+        ret = cache[key] = resolve()
+        return ret
+
+
+def resolve_specs(sack, specs, ignore_case=False, with_provides=True,
+                  forms=None):
+    """Return the best query of each of the `specs`, like get_best_query().
+
+    The packages of all the specs that resolve to a plain package name are
+    found in a single query over the sack.
+
+    """
+    queries = [None] * len(specs)
+    by_name = {}
+    for (i, spec) in enumerate(specs):
+        subj = Subject(spec, ignore_case)
+        if not subj.filename_pattern and not ignore_case:
+            nevra = subj._nevra_possibility(sack, allow_globs=True,
+                                            icase=False, form=forms)
+            if nevra and _is_plain_name(nevra):
+                by_name.setdefault(nevra.name, []).append(i)
+                continue
+        queries[i] = subj.get_best_query(sack, with_provides, forms)
+
+    if by_name:
+        pkgs = dict((name, []) for name in by_name)
+        for pkg in sack.query().filter(name=list(by_name)):
+            pkgs[pkg.name].append(pkg)
+        for (name, indexes) in by_name.items():
+            if pkgs[name]:
+                query = sack.query().filter(pkg=pkgs[name])
+            else:
+                query = sack.query().filter(empty=True)
+            for i in indexes:
+                queries[i] = query
+    return queries
+
+
+def _is_plain_name(nevra):
+    return (not is_glob_pattern(nevra.name) and not nevra.epoch and
+            not nevra.version and not nevra.release and not nevra.arch)
+
+
 class Subject(object):
     # :api
 
@@ -69,6 +121,26 @@ class Subject(object):
             sltr.set(arch=nevra.arch)
         return sltr
 
+    def _memo_key(self, kind, kwargs):
+        key = [kind, self.pattern]
+        for (name, value) in sorted(kwargs.items()):
+            if isinstance(value, list):
+                value = tuple(value)
+            key.append((name, value))
+        return tuple(key)
+
+    def _nevra_possibility(self, sack, **kwargs):
+        if not kwargs.get('form'):
+            kwargs.pop('form', None)
+        resolve = lambda: first(self.subj.nevra_possibilities_real(sack,
+                                                                   **kwargs))
+        return _memoized(sack, self._memo_key('nevra', kwargs), resolve)
+
+    def _reldep_possibility(self, sack, **kwargs):
+        resolve = lambda: first(self.subj.reldep_possibilities_real(sack,
+                                                                    **kwargs))
+        return _memoized(sack, self._memo_key('reldep', kwargs), resolve)
+
     @property
     def _query_flags(self):
         flags = []
@@ -85,7 +157,7 @@ class Subject(object):
         return self.subj.pattern
 
     def is_arch_specified(self, sack):
-        nevra = first(self.subj.nevra_possibilities_real(sack, allow_globs=True))
+        nevra = self._nevra_possibility(sack, allow_globs=True)
         if nevra and nevra.arch:
             return is_glob_pattern(nevra.arch)
         return False
@@ -96,17 +168,13 @@ class Subject(object):
         if self.filename_pattern:
             return sack.query().filter_autoglob(file=pat)
 
-        kwargs = {'allow_globs' : True,
-                  'icase'	: self.icase}
-        if forms:
-            kwargs['form'] = forms
-        nevra = first(self.subj.nevra_possibilities_real(sack, **kwargs))
+        nevra = self._nevra_possibility(sack, allow_globs=True,
+                                        icase=self.icase, form=forms)
         if nevra:
             return self._nevra_to_filters(sack.query(), nevra)
 
         if with_provides:
-            reldeps = self.subj.reldep_possibilities_real(sack, icase=self.icase)
-            reldep = first(reldeps)
+            reldep = self._reldep_possibility(sack, icase=self.icase)
             if reldep:
                 return sack.query().filter(provides=reldep)
         return sack.query().filter(empty=True)
@@ -118,16 +186,14 @@ class Subject(object):
         if self.filename_pattern:
             key = "file__glob" if is_glob_pattern(self.pattern) else "file"
             return sltr.set(**{key: self.pattern})
-        if forms:
-            kwargs['form'] = forms
-        nevra = first(self.subj.nevra_possibilities_real(sack, **kwargs))
+        nevra = self._nevra_possibility(sack, form=forms, **kwargs)
         if nevra:
             return self._nevra_to_selector(sltr, nevra)
 
         if is_glob_pattern(self.pattern):
             return sltr.set(provides__glob=self.pattern)
 
-        reldep = first(self.subj.reldep_possibilities_real(sack))
+        reldep = self._reldep_possibility(sack)
         if reldep:
             dep = str(reldep)
             return sltr.set(provides=dep)
@@ -135,8 +201,7 @@ class Subject(object):
 
     def get_best_selectors(self, sack, forms=None):
         if not self.filename_pattern and is_glob_pattern(self.pattern):
-            nevras = self.subj.nevra_possibilities_real(sack, allow_globs=True)
-            nevra = first(nevras)
+            nevra = self._nevra_possibility(sack, allow_globs=True)
             if nevra and nevra.name:
                 sltrs = []
                 pkgs = self._nevra_to_filters(sack.query(), nevra)
@@ -33,7 +33,9 @@ import os
 import pwd
 import shutil
 import subprocess
+import sys
 import tempfile
+import threading
 import time
 
 """DNF Utilities.
@@ -169,6 +171,65 @@ def on_ac_power():
     except OSError:
         return None
 
+def parallel_imap(fn, iterable, max_workers):
+    """Like map(), but run `fn` in up to `max_workers` threads.
+
+    The results are yielded in the order of `iterable`, each as soon as it is
+    ready while the following calls keep running. If a call raised, the
+    exception is reraised in its place once all the running calls finish.
+
+    """
+    items = list(iterable)
+    max_workers = min(max_workers, len(items))
+    if max_workers <= 1:
+        for item in items:
+            yield fn(item)
+        return
+
+    results = [None] * len(items)
+    errors = [None] * len(items)
+    done = [threading.Event() for _ in items]
+    todo = dnf.pycomp.Queue()
+    for index in range(len(items)):
+        todo.put(index)
+
+    def worker():
+        while True:
+            try:
+                index = todo.get_nowait()
+            except dnf.pycomp.queue_Empty:
+                return
+            try:
+                results[index] = fn(items[index])
+            except BaseException:
+                errors[index] = sys.exc_info()
+            finally:
+                done[index].set()
+
+    threads = [threading.Thread(target=worker) for _ in range(max_workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    failed = None
+    try:
+        for index in range(len(items)):
+            done[index].wait()
+            if errors[index] is not None:
+                failed = errors[index]
+                break
+            yield results[index]
+    finally:
+        # do not start anything new if we are finishing early:
+        while not todo.empty():
+            try:
+                todo.get_nowait()
+            except dnf.pycomp.queue_Empty:
+                break
+        for thread in threads:
+            thread.join()
+    if failed is not None:
+        dnf.pycomp.reraise(*failed)
+
 def partition(pred, iterable):
     """Use a predicate to partition entries into false entries and true entries.
 
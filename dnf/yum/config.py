@@ -702,6 +702,7 @@ class YumConf(BaseConfig):
     pluginpath = ListOption([dnf.const.PLUGINPATH]) # :api
     pluginconfpath = ListOption([dnf.const.PLUGINCONFPATH])  # :api
     persistdir = Option(dnf.const.PERSISTDIR) # :api
+    yumdb_backend = SelectionOption('files', ('files', 'sqlite'))
 
     def __init__(self):
         super(YumConf, self).__init__()
@@ -737,6 +738,7 @@ class YumConf(BaseConfig):
     cachedir = Option(dnf.const.SYSTEM_CACHEDIR) # :api
 
     keepcache = BoolOption(False)
+    pkgstore = Option()
     logdir = Option('/var/log') # :api
     reposdir = ListOption(['/etc/yum/repos.d', '/etc/yum.repos.d']) # :api
 
@@ -768,6 +770,8 @@ class YumConf(BaseConfig):
     localpkg_gpgcheck = BoolOption(False)
     obsoletes = BoolOption(True)
     showdupesfromrepos = BoolOption(False)
+    stream_lists = BoolOption(False)
+    output_format = SelectionOption('text', ('text', 'json', 'nul'))
     enabled = BoolOption(True)
     enablegroups = BoolOption(True)
 
@@ -781,6 +785,7 @@ class YumConf(BaseConfig):
 
     metadata_expire = SecondsOption(60 * 60 * 48)    # 48 hours
     metadata_timer_sync = SecondsOption(60 * 60 * 3) #  3 hours
+    max_parallel_md_syncs = IntOption(4, range_min=1)
     disable_excludes = ListOption()
     multilib_policy = SelectionOption('best', ('best', 'all')) # :api
     best = BoolOption(False) # :api
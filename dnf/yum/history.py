@@ -23,7 +23,7 @@ import time
 import os, os.path
 import glob
 
-from .sqlutils import sqlite, executeSQL, sql_esc_glob
+from .sqlutils import sqlite, executeSQL, executeSQLMany, sql_esc_glob
 from . import misc as misc
 import dnf.arch
 import dnf.exceptions
@@ -41,9 +41,12 @@ PATTERNS_MAX = 8
 #  We have another value here because name is indexed and sqlite is _much_
 # faster even at large numbers of patterns.
 PATTERNS_INDEXED_MAX = 128
+#  Addon data of the transactions that synced the yumdb data of all the
+# installed pkgs: the yumdb cookie() they match.
+YUMDB_COOKIE_ADDON = 'yumdb-cookie'
 
 def _setupHistorySearchSQL(patterns=None, ignore_case=False):
-    """Setup need_full and patterns for _yieldSQLDataList, also see if
+    """Setup need_full and patterns for _sqlDataListQuery, also see if
        we can get away with just using searchNames(). """
 
     if patterns is None:
@@ -505,6 +508,7 @@ class YumMergedHistoryTransaction(YumHistoryTransaction):
         return pkgtup2pkg, pkgstate2pkg
     @staticmethod
     def _conv_pkg_state(pkg, state):
+        import dnf.history
         npkg = YumHistoryPackageState(pkg.name, pkg.arch,
                                       pkg.epoch,pkg.version,pkg.release, state,
                                       history=pkg._history)
@@ -738,6 +742,9 @@ class YumHistory(object):
 
     def __init__(self, db_path, yumdb, root='/', releasever=None):
         self._conn = None
+        self._archive = None
+        # (pkgtup, checksum) -> pkgtupid, of the current DB file:
+        self._pid_cache = {}
 
         self.conf = misc.GenericHolder()
         if not os.path.normpath(db_path).startswith(root):
@@ -812,38 +819,66 @@ class YumHistory(object):
                 self.conf.readable = False
                 return None
 
-            #  Note that this is required due to changing the history DB in the
-            # callback for removed txmbrs ... which happens inside the chroot,
-            # as against all our other access which is outside the chroot. So
-            # we need sqlite to not open the journal.
-            #  In theory this sucks, as history could be shared. In reality
-            # it's deep yum stuff and there should only be one yum.
-            executeSQL(self._conn.cursor(), "PRAGMA locking_mode = EXCLUSIVE")
+            #  The history DB is changed in the callback for removed txmbrs,
+            # which happens inside the chroot, so the journal must not be
+            # reopened then. In the WAL mode the -wal and -shm files stay open
+            # for the lifetime of the connection, and readers like 'dnf
+            # history list' never wait for the writer nor block it.
+            #  Without write access we can only read, leave the mode alone.
+            if self.conf.writable:
+                try:
+                    executeSQL(self._conn.cursor(),
+                               "PRAGMA journal_mode = WAL")
+                except (sqlite.OperationalError, sqlite.DatabaseError):
+                    pass
 
         return self._conn.cursor()
     def _commit(self):
         return self._conn.commit()
     def _rollback(self):
+        # the pkgtupids created in the transaction are gone now:
+        self._pid_cache = {}
         return self._conn.rollback()
 
     def close(self):
         if self._conn is not None:
             self._conn.close()
             self._conn = None
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+
+    @property
+    def _archive_file(self):
+        """ The DB the old transactions are moved to by compact(). """
+        return self._db_file[:-len('.sqlite')] + '-archive.sqlite'
+
+    def _get_archive(self):
+        """ Returns the history in the archive DB, None if there is none. """
+        if self._archive is None and os.path.exists(self._archive_file):
+            self._archive = _ArchiveHistory(self._archive_file, self.yumdb,
+                                            self.releasever)
+        return self._archive
 
     def _pkgtup2pid(self, pkgtup, checksum=None, create=True):
+        key = (tuple(pkgtup), checksum)
+        if key in self._pid_cache:
+            return self._pid_cache[key]
+
         cur = self._get_cursor()
         executeSQL(cur, """SELECT pkgtupid, checksum FROM pkgtups
                            WHERE name=? AND arch=? AND
                                  epoch=? AND version=? AND release=?""", pkgtup)
         for sql_pkgtupid, sql_checksum in cur:
             if checksum is None and sql_checksum is None:
+                self._pid_cache[key] = sql_pkgtupid
                 return sql_pkgtupid
             if checksum is None:
                 continue
             if sql_checksum is None:
                 continue
             if checksum == sql_checksum:
+                self._pid_cache[key] = sql_pkgtupid
                 return sql_pkgtupid
 
         if not create:
@@ -862,6 +897,7 @@ class YumHistory(object):
                              """INSERT INTO pkgtups
                                 (name, arch, epoch, version, release)
                                 VALUES (?, ?, ?, ?, ?)""", (n,a,e,v,r))
+        self._pid_cache[key] = cur.lastrowid
         return cur.lastrowid
     def _apkg2pid(self, po, create=True):
         csum = po.returnIdSum()
@@ -989,6 +1025,9 @@ class YumHistory(object):
         cur = self._get_cursor()
         if cur is None:
             return
+        #  Add the indexes of the readers here, they must not write to the DB
+        # nor need its write access.
+        self._update_db_file_5()
         res = executeSQL(cur,
                          """INSERT INTO trans_beg
                             (timestamp, rpmdb_version, loginuid)
@@ -997,18 +1036,29 @@ class YumHistory(object):
                                                     misc.getloginuid()))
         self._tid = cur.lastrowid
 
-        for pkg in using_pkgs:
-            pid = self._ipkg2pid(pkg)
-            self.trans_with_pid(pid)
+        executeSQLMany(cur,
+                       """INSERT INTO trans_with_pkgs
+                          (tid, pkgtupid)
+                          VALUES (?, ?)""",
+                       [(self._tid, self._ipkg2pid(pkg)) for pkg in using_pkgs])
 
+        data = []
         for tsi in tsis:
             for (pkg, state) in tsi.history_iterator():
-                pid   = self.pkg2pid(pkg)
-                self.trans_data_pid_beg(pid, state)
-
-        for pkg in skip_packages:
-            pid   = self.pkg2pid(pkg)
-            self.trans_skip_pid(pid)
+                assert state is not None
+                data.append((self._tid, self.pkg2pid(pkg), state))
+        executeSQLMany(cur,
+                       """INSERT INTO trans_data_pkgs
+                          (tid, pkgtupid, state)
+                          VALUES (?, ?, ?)""", data)
+
+        if skip_packages and self._update_db_file_2():
+            executeSQLMany(cur,
+                           """INSERT INTO trans_skip_pkgs
+                              (tid, pkgtupid)
+                              VALUES (?, ?)""",
+                           [(self._tid, self.pkg2pid(pkg))
+                            for pkg in skip_packages])
 
         for problem in rpmdb_problems:
             self._trans_rpmdb_problem(problem)
@@ -1022,11 +1072,10 @@ class YumHistory(object):
         cur = self._get_cursor()
         if cur is None:
             return
-        for error in errors:
-            error = ucd(error)
-            executeSQL(cur,
+        executeSQLMany(cur,
                        """INSERT INTO trans_error
-                          (tid, msg) VALUES (?, ?)""", (self._tid, error))
+                          (tid, msg) VALUES (?, ?)""",
+                       [(self._tid, ucd(error)) for error in errors])
         self._commit()
 
     def log_scriptlet_output(self, msg):
@@ -1036,11 +1085,10 @@ class YumHistory(object):
         cur = self._get_cursor()
         if cur is None:
             return # Should never happen, due to above
-        for error in msg.splitlines():
-            error = ucd(error)
-            executeSQL(cur,
+        executeSQLMany(cur,
                        """INSERT INTO trans_script_stdout
-                          (tid, line) VALUES (?, ?)""", (self._tid, error))
+                          (tid, line) VALUES (?, ?)""",
+                       [(self._tid, ucd(line)) for line in msg.splitlines()])
         self._commit()
 
     def _load_errors(self, tid):
@@ -1170,18 +1218,22 @@ class YumHistory(object):
         if sort:
             sql = " ".join((sql, "ORDER BY name ASC, epoch ASC, state DESC"))
         executeSQL(cur, sql, (tid,))
-        ret = []
-        for row in cur:
-            obj = YumHistoryPackageState(row[0],row[1],row[2],row[3],row[4],
-                                         row[7], row[5], history=self)
-            obj.done     = row[6] == 'TRUE'
-            obj.state_installed = None
-            if obj.state in dnf.history.INSTALLING_STATES:
-                obj.state_installed = True
-            if obj.state in dnf.history.REMOVING_STATES:
-                obj.state_installed = False
-            ret.append(obj)
+        ret = [self._data_pkg(row) for row in cur]
+        archive = self._get_archive()
+        if not ret and archive is not None:
+            return archive._old_data_pkgs(tid, sort)
         return ret
+    def _data_pkg(self, row):
+        import dnf.history
+        obj = YumHistoryPackageState(row[0],row[1],row[2],row[3],row[4],
+                                     row[7], row[5], history=self)
+        obj.done     = row[6] == 'TRUE'
+        obj.state_installed = None
+        if obj.state in dnf.history.INSTALLING_STATES:
+            obj.state_installed = True
+        if obj.state in dnf.history.REMOVING_STATES:
+            obj.state_installed = False
+        return obj
     def _old_skip_pkgs(self, tid):
         cur = self._get_cursor()
         if cur is None or not self._update_db_file_2():
@@ -1268,6 +1320,8 @@ class YumHistory(object):
         if tids and len(tids) <= PATTERNS_INDEXED_MAX:
             params = tids = list(set(tids))
             sql += " WHERE tid IN (%s)" % ", ".join(['?'] * len(tids))
+        elif tids:
+            tids = set(tids)
         #  This relies on the fact that the PRIMARY KEY in sqlite will always
         # increase with each transaction. In theory we can use:
         # ORDER BY beg_ts DESC ... except sometimes people do installs with a
@@ -1304,25 +1358,131 @@ class YumHistory(object):
             tid2obj[row[0]].end_rpmdbversion = row[2]
             tid2obj[row[0]].return_code      = row[3]
 
+        archive = self._get_archive()
+        if archive is not None and (limit is None or len(ret) < limit):
+            # the archive only has transactions older than these:
+            missing = [tid for tid in tids if int(tid) not in tid2obj]
+            if not tids or missing:
+                rest = None if limit is None else limit - len(ret)
+                ret.extend(archive.old(missing, rest,
+                                       complete_transactions_only))
+
         # Go through backwards, and see if the rpmdb versions match
         las = None
         for obj in reversed(ret):
-            cur_rv = obj.beg_rpmdbversion
-            las_rv = None
-            if las is not None:
-                las_rv = las.end_rpmdbversion
-            if las_rv is None or cur_rv is None or (las.tid + 1) != obj.tid:
-                pass
-            elif las_rv != cur_rv:
-                obj.altered_lt_rpmdb = True
-                las.altered_gt_rpmdb = True
-            else:
-                obj.altered_lt_rpmdb = False
-                las.altered_gt_rpmdb = False
+            self._mark_altered(las, obj)
             las = obj
 
         return ret
 
+    @staticmethod
+    def _mark_altered(las, obj):
+        """ See if the rpmdb changed between the transaction las and the
+            following transaction obj. """
+        cur_rv = obj.beg_rpmdbversion
+        las_rv = None
+        if las is not None:
+            las_rv = las.end_rpmdbversion
+        if las_rv is None or cur_rv is None or (las.tid + 1) != obj.tid:
+            pass
+        elif las_rv != cur_rv:
+            obj.altered_lt_rpmdb = True
+            las.altered_gt_rpmdb = True
+        else:
+            obj.altered_lt_rpmdb = False
+            las.altered_gt_rpmdb = False
+
+    def old_loginuids(self, tids=[]):
+        """ Return the set of the users that did the transactions. """
+        cur = self._get_cursor()
+        if cur is None:
+            return set()
+        tids = set(int(tid) for tid in tids)
+        sql = "SELECT DISTINCT tid, loginuid FROM trans_beg"
+        params = None
+        if tids and len(tids) <= PATTERNS_INDEXED_MAX:
+            params = list(tids)
+            sql += " WHERE tid IN (%s)" % ", ".join(['?'] * len(tids))
+        executeSQL(cur, sql, params)
+        ret = set(row[1] for row in cur if not tids or row[0] in tids)
+        archive = self._get_archive()
+        if archive is not None:
+            ret.update(archive.old_loginuids(tids))
+        return ret
+
+    def iter_old(self, tids=[], limit=None):
+        """ Yield the transactions, newest first, like old() does, but
+            straight from the cursor. Their trans_data and cmdline come from
+            the same pass, so listing them needs no more queries. Only one
+            transaction is held back, to compare its rpmdb version with the
+            one before it. """
+        newer = None
+        for obj in self._iter_old_unmarked(tids, limit):
+            if newer is not None:
+                self._mark_altered(obj, newer)
+                yield newer
+            newer = obj
+        if newer is not None:
+            yield newer
+
+    def _iter_old_unmarked(self, tids, limit):
+        cur = self._get_cursor()
+        if cur is None:
+            return
+        tids = set(int(tid) for tid in tids)
+
+        cmdline_sql = "NULL"
+        if self._update_db_file_2():
+            cmdline_sql = """(SELECT cmdline FROM trans_cmdline
+                              WHERE trans_cmdline.tid = trans_beg.tid
+                              LIMIT 1)"""
+        sql = """SELECT tid,
+                        trans_beg.timestamp AS beg_ts,
+                        trans_beg.rpmdb_version AS beg_rv,
+                        trans_end.timestamp AS end_ts,
+                        trans_end.rpmdb_version AS end_rv,
+                        loginuid, return_code, %s
+                 FROM trans_beg LEFT JOIN trans_end USING(tid)""" % cmdline_sql
+        data_sql = """SELECT name, arch, epoch, version, release,
+                             checksum, done, state, tid
+                      FROM trans_data_pkgs JOIN pkgtups USING(pkgtupid)"""
+        params = None
+        if tids and len(tids) <= PATTERNS_INDEXED_MAX:
+            params = list(tids)
+            where = " WHERE tid IN (%s)" % ", ".join(['?'] * len(tids))
+            sql += where
+            data_sql += where
+        sql += " ORDER BY tid DESC"
+        data_sql += " ORDER BY tid DESC"
+        executeSQL(cur, sql, params)
+        data_cur = self._get_cursor()
+        executeSQL(data_cur, data_sql, params)
+        data_row = data_cur.fetchone()
+
+        count = 0
+        for row in cur:
+            if tids and row[0] not in tids:
+                continue
+            if limit is not None and count >= limit:
+                break
+            count += 1
+            obj = YumHistoryTransaction(self, row[:7])
+            obj._have_loaded_CMD = True
+            obj._loaded_CMD = row[7]
+            data = []
+            while data_row is not None and data_row[8] >= obj.tid:
+                if data_row[8] == obj.tid:
+                    data.append(self._data_pkg(data_row))
+                data_row = data_cur.fetchone()
+            obj._loaded_TD = sorted(data)
+            yield obj
+
+        archive = self._get_archive()
+        if archive is not None and (limit is None or count < limit):
+            rest = None if limit is None else limit - count
+            for obj in archive._iter_old_unmarked(tids, rest):
+                yield obj
+
     def last(self, complete_transactions_only=True):
         """ This is the last full transaction. So any incomplete transactions
             do not count, by default. """
@@ -1341,8 +1501,11 @@ class YumHistory(object):
         if pid is None:
             return None
 
+        #  The latest value of the key wins, like when compact() drops the
+        # duplicates.
         sql = """SELECT %(db)sdb_val FROM pkg_%(db)sdb
-                  WHERE pkgtupid=? and %(db)sdb_key=? """ % {'db' : db}
+                  WHERE pkgtupid=? and %(db)sdb_key=?
+                  ORDER BY rowid DESC""" % {'db' : db}
         executeSQL(cur, sql, (pid, attr))
         for row in cur:
             return row[0]
@@ -1420,6 +1583,44 @@ class YumHistory(object):
         self._commit()
         return True
 
+    def sync_alldb_pkgs(self, ipkgs):
+        """ Sync. all the data for rpmdb/yumdb for these installed pkgs, in a
+            single DB transaction. Pkgs unknown to the history are skipped. """
+        cur = self._get_cursor()
+        if cur is None or not self._update_db_file_3():
+            return False
+
+        pids = []
+        for ipkg in ipkgs:
+            pid = self.pkg2pid(ipkg, create=False)
+            if pid is not None:
+                pids.append((ipkg, pid))
+        yumdb_attrs = self.yumdb.get_attrs(
+            [ipkg for (ipkg, pid) in pids],
+            _YumHistPackageYumDB._valid_yumdb_keys)
+
+        rpm_rows = []
+        yum_rows = []
+        for (ipkg, pid) in pids:
+            for attr in YumHistoryPackage._valid_rpmdb_keys:
+                val = getattr(ipkg, attr, None)
+                if val is not None:
+                    rpm_rows.append((pid, attr, ucd(val)))
+            for (attr, val) in yumdb_attrs[ipkg].items():
+                yum_rows.append((pid, attr, ucd(val)))
+
+        pid_rows = [(pid,) for (ipkg, pid) in pids]
+        executeSQLMany(cur, "DELETE FROM pkg_rpmdb WHERE pkgtupid=?", pid_rows)
+        executeSQLMany(cur, "DELETE FROM pkg_yumdb WHERE pkgtupid=?", pid_rows)
+        executeSQLMany(cur, """INSERT INTO pkg_rpmdb
+                               (pkgtupid, rpmdb_key, rpmdb_val)
+                               VALUES (?, ?, ?)""", rpm_rows)
+        executeSQLMany(cur, """INSERT INTO pkg_yumdb
+                               (pkgtupid, yumdb_key, yumdb_val)
+                               VALUES (?, ?, ?)""", yum_rows)
+        self._commit()
+        return True
+
     def _pkg_stats(self):
         """ Some stats about packages in the DB. """
 
@@ -1434,25 +1635,249 @@ class YumHistory(object):
         if cur is None or not self._update_db_file_3():
             return False
 
-        data = (('nevrac', "COUNT(*)",                      "pkgtups"),
-                ('na',     "COUNT(DISTINCT(name || arch))", "pkgtups"),
-                ('nevra',"COUNT(DISTINCT(name||version||epoch||release||arch))",
+        #  The distinct columns are all covered by an index, so each count is
+        # a single pass over the index without building a temporary b-tree.
+        data = (('nevrac', "pkgtupid", "pkgtups"),
+                ('na',     "DISTINCT name, arch", "pkgtups"),
+                ('nevra',  "DISTINCT name, arch, epoch, version, release",
                  "pkgtups"),
-                ('nevr',   "COUNT(DISTINCT(name||version||epoch||release))",
-                 "pkgtups"),
-                ('rpmdb',  "COUNT(DISTINCT(pkgtupid))", "pkg_rpmdb"),
-                ('yumdb',  "COUNT(DISTINCT(pkgtupid))", "pkg_yumdb"))
+                ('nevr',   "DISTINCT name, epoch, version, release", "pkgtups"),
+                ('rpmdb',  "DISTINCT pkgtupid", "pkg_rpmdb"),
+                ('yumdb',  "DISTINCT pkgtupid", "pkg_yumdb"))
 
         for key, bsql, esql in data:
-            executeSQL(cur, "SELECT %s FROM %s" % (bsql, esql))
+            executeSQL(cur, "SELECT COUNT(*) FROM (SELECT %s FROM %s)" %
+                       (bsql, esql))
             for row in cur:
                 ret[key] = row[0]
+
+        if not os.path.exists(self._archive_file):
+            return ret
+        #  compact() leaves all the pkgtups in the live DB, but moves the
+        # rpm/yum DB data of the archived packages.
+        executeSQL(cur, "ATTACH DATABASE ? AS archive", (self._archive_file,))
+        try:
+            for key in ('rpmdb', 'yumdb'):
+                executeSQL(cur, """SELECT COUNT(*) FROM
+                                   (SELECT pkgtupid FROM main.pkg_%(k)s UNION
+                                    SELECT pkgtupid FROM archive.pkg_%(k)s)"""
+                           % {'k' : key})
+                ret[key] = cur.fetchone()[0]
+        finally:
+            executeSQL(cur, "DETACH DATABASE archive")
         return ret
 
-    def _yieldSQLDataList(self, patterns, fields, ignore_case):
-        """Yields all the package data for the given params. """
+    def mark_yumdb_synced(self):
+        """ Record with the running transaction the cookie of the yumdb, once
+            the yumdb data of all the installed pkgs are synced. """
+        return self.write_addon_data(YUMDB_COOKIE_ADDON, self.yumdb.cookie())
+
+    def yumdb_synced(self, rpmdb_version):
+        """ Whether the yumdb data synced at the end of the last transaction
+            still match the yumdb and the rpmdb. They do not once the rpmdb
+            or the yumdb were changed outside of a recorded transaction, like
+            by dnf mark, rpm or the runs with history_record=False. """
+        last = self.last()
+        if last is None or last.end_rpmdbversion != str(rpmdb_version):
+            return False
+        cookie = self.return_addon_data(last.tid, YUMDB_COOKIE_ADDON)
+        return cookie is not None and cookie == self.yumdb.cookie()
+
+    def get_yumdb_attrs(self, pkgs, attrs):
+        """ Like get_attrs() of the yumdb, but answered from the yumdb data
+            synced into the history at the end of the transactions. The pkgs
+            the history knows nothing about are read from the yumdb. The data
+            are only valid when yumdb_synced() says so. """
+        ret = {}
+        missing = pkgs
+        cur = self._get_cursor()
+        if cur is not None and self._update_db_file_3():
+            attrs = tuple(attrs)
+            #  All the synced pkgtups, with the wanted values they have. The
+            # latest pkgtupid of a NEVRA wins.
+            executeSQL(cur, """SELECT p.pkgtupid, name, arch, epoch, version,
+                                      release, yumdb_key, yumdb_val
+                               FROM pkgtups AS p JOIN
+                                    (SELECT DISTINCT pkgtupid FROM pkg_yumdb)
+                                    AS s ON s.pkgtupid = p.pkgtupid
+                               LEFT JOIN pkg_yumdb AS y
+                                    ON y.pkgtupid = p.pkgtupid AND
+                                       y.yumdb_key IN (%s)
+                               ORDER BY p.pkgtupid""" %
+                       ", ".join(['?'] * len(attrs)), attrs)
+            synced = {}
+            last_pid = None
+            for row in cur:
+                if row[0] != last_pid:
+                    last_pid = row[0]
+                    values = synced[tuple(row[1:6])] = {}
+                if row[6] is not None:
+                    values[row[6]] = row[7]
+            missing = []
+            for pkg in pkgs:
+                values = synced.get(pkg.pkgtup)
+                if values is None:
+                    missing.append(pkg)
+                else:
+                    ret[pkg] = values
+        ret.update(self.yumdb.get_attrs(missing, attrs))
+        return ret
 
+    #  Tables holding rows of the transactions, in the order they are moved
+    # to the archive by compact().
+    _tid_tables = ('trans_beg', 'trans_end', 'trans_cmdline', 'trans_error',
+                   'trans_script_stdout', 'trans_with_pkgs', 'trans_data_pkgs',
+                   'trans_skip_pkgs', 'trans_rpmdb_problems')
+
+    #  The INTEGER PRIMARY KEYs of these tables are handed out again once the
+    # rows left the live DB, the archive numbers the rows anew:
+    # {table: (key, other columns)}.
+    _renumbered_tables = {'trans_error' : ('mid', 'tid, msg'),
+                          'trans_script_stdout' : ('lid', 'tid, line')}
+
+    _compact_pids_sql = """
+        SELECT pkgtupid FROM %(db)s.trans_with_pkgs WHERE %(where)s
+        UNION SELECT pkgtupid FROM %(db)s.trans_data_pkgs WHERE %(where)s
+        UNION SELECT pkgtupid FROM %(db)s.trans_skip_pkgs WHERE %(where)s
+        UNION SELECT pkgtupid FROM %(db)s.trans_prob_pkgs WHERE rpid IN
+            (SELECT rpid FROM %(db)s.trans_rpmdb_problems WHERE %(where)s)"""
+
+    def _create_archive(self):
+        """ Create the archive DB with the same tables as the live one. """
+        cur = self._get_cursor()
+        executeSQL(cur, """SELECT sql FROM sqlite_master
+                           WHERE sql NOT NULL AND name NOT LIKE 'sqlite_%'
+                           ORDER BY type = 'table' DESC""")
+        ops = [row[0] for row in cur]
+        fo = os.open(self._archive_file, os.O_CREAT, 0o600)
+        os.close(fo)
+        conn = sqlite.connect(self._archive_file)
+        try:
+            for op in ops:
+                conn.execute(op)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _compact_problems(self, cur, params):
+        """ Copy the rpmdb problems of the moved transactions to the attached
+            archive, with new rpids, and drop their packages from main. """
+        executeSQL(cur, """SELECT rpid, tid, problem, msg
+                           FROM main.trans_rpmdb_problems
+                           WHERE tid < ? ORDER BY rpid""", params)
+        for (rpid, tid, problem, msg) in cur.fetchall():
+            executeSQL(cur, """INSERT INTO archive.trans_rpmdb_problems
+                               (tid, problem, msg) VALUES (?, ?, ?)""",
+                       (tid, problem, msg))
+            executeSQL(cur, """INSERT INTO archive.trans_prob_pkgs
+                               (rpid, pkgtupid, main)
+                               SELECT ?, pkgtupid, main
+                               FROM main.trans_prob_pkgs WHERE rpid = ?""",
+                       (cur.lastrowid, rpid))
+        executeSQL(cur, """DELETE FROM main.trans_prob_pkgs
+                           WHERE rpid IN
+                           (SELECT rpid FROM main.trans_rpmdb_problems
+                            WHERE tid < ?)""", params)
+
+    def compact(self, keep):
+        """ Move all but the last keep transactions to the archive DB, where
+            old(), iter_old() and search() still find them, and shrink the
+            live DB. Returns the number of transactions moved. """
+        assert keep > 0
         cur = self._get_cursor()
+        if cur is None or not self._update_db_file_4():
+            return 0
+        executeSQL(cur, """SELECT tid FROM trans_beg
+                           ORDER BY tid DESC LIMIT 1 OFFSET ?""", (keep - 1,))
+        row = cur.fetchone()
+        if row is None:
+            return 0
+        params = (row[0],)
+        executeSQL(cur, "SELECT COUNT(*) FROM trans_beg WHERE tid < ?", params)
+        count = cur.fetchone()[0]
+        if not count:
+            return 0
+
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+        if not os.path.exists(self._archive_file):
+            self._create_archive()
+        self._commit()
+        executeSQL(cur, "ATTACH DATABASE ? AS archive", (self._archive_file,))
+        try:
+            moved = "tid < ?"
+            moved_pids = self._compact_pids_sql % {'db' : 'main',
+                                                   'where' : moved}
+            executeSQL(cur, """INSERT OR IGNORE INTO archive.pkgtups
+                               SELECT * FROM main.pkgtups
+                               WHERE pkgtupid IN (%s)""" % moved_pids,
+                       params * 4)
+            for db in ('rpm', 'yum'):
+                # the live values replace what an earlier compact archived:
+                sql_vars = {'db' : db, 'pids' : moved_pids}
+                executeSQL(cur, """DELETE FROM archive.pkg_%(db)sdb
+                                   WHERE rowid IN
+                                   (SELECT a.rowid
+                                    FROM archive.pkg_%(db)sdb AS a
+                                    JOIN main.pkg_%(db)sdb AS m
+                                    ON a.pkgtupid = m.pkgtupid AND
+                                       a.%(db)sdb_key = m.%(db)sdb_key
+                                    WHERE m.pkgtupid IN (%(pids)s))"""
+                           % sql_vars, params * 4)
+                executeSQL(cur, """INSERT INTO archive.pkg_%(db)sdb
+                                   SELECT * FROM main.pkg_%(db)sdb
+                                   WHERE pkgtupid IN (%(pids)s)
+                                   ORDER BY rowid""" % sql_vars, params * 4)
+            self._compact_problems(cur, params)
+            for table in self._tid_tables:
+                if table in self._renumbered_tables:
+                    (key, columns) = self._renumbered_tables[table]
+                    executeSQL(cur, """INSERT INTO archive.%(t)s (%(c)s)
+                                       SELECT %(c)s FROM main.%(t)s
+                                       WHERE tid < ? ORDER BY %(k)s"""
+                               % {'t' : table, 'c' : columns, 'k' : key},
+                               params)
+                elif table != 'trans_rpmdb_problems':
+                    executeSQL(cur, """INSERT INTO archive.%(t)s
+                                       SELECT * FROM main.%(t)s WHERE tid < ?"""
+                               % {'t' : table}, params)
+                executeSQL(cur, "DELETE FROM main.%s WHERE tid < ?" % table,
+                           params)
+
+            #  The rpm/yum DB data only matter for the packages of the
+            # remaining transactions, and each key is kept just once.
+            live_pids = self._compact_pids_sql % {'db' : 'main',
+                                                  'where' : '1'}
+            for db in ('rpm', 'yum'):
+                executeSQL(cur, """DELETE FROM main.pkg_%(db)sdb
+                                   WHERE pkgtupid NOT IN (%(pids)s)"""
+                           % {'db' : db, 'pids' : live_pids})
+                for name in ('main', 'archive'):
+                    executeSQL(cur, """DELETE FROM %(name)s.pkg_%(db)sdb
+                                       WHERE rowid NOT IN
+                                       (SELECT MAX(rowid)
+                                        FROM %(name)s.pkg_%(db)sdb
+                                        GROUP BY pkgtupid, %(db)sdb_key)"""
+                               % {'db' : db, 'name' : name})
+            self._commit()
+        except (sqlite.OperationalError, sqlite.DatabaseError):
+            self._rollback()
+            raise
+        finally:
+            executeSQL(cur, "DETACH DATABASE archive")
+
+        executeSQL(cur, "VACUUM")
+        executeSQL(cur, "PRAGMA wal_checkpoint(TRUNCATE)")
+        return count
+
+    def _sqlDataListQuery(self, patterns, fields, ignore_case, names=False):
+        """Returns the query and its params selecting the package data for
+           the given params. """
+
+        if names:
+            patterns = [(pattern, '=') for pattern in patterns]
+
         qsql = _FULL_PARSE_QUERY_BEG
 
         pat_sqls = []
@@ -1467,9 +1892,7 @@ class YumHistory(object):
         assert pat_sqls
 
         qsql += " OR ".join(pat_sqls)
-        executeSQL(cur, qsql, pat_data)
-        for x in cur:
-            yield x
+        return (qsql, pat_data)
 
     def search(self, patterns, ignore_case=True):
         """ Search for history transactions which contain specified
@@ -1483,12 +1906,9 @@ class YumHistory(object):
         data = _setupHistorySearchSQL(patterns, ignore_case)
         (need_full, npatterns, fields, names) = data
 
-        ret = []
-        pkgtupids = set()
-
+        chunks = []
         if npatterns:
-            for row in self._yieldSQLDataList(npatterns, fields, ignore_case):
-                pkgtupids.add(row[0])
+            chunks.append((npatterns, fields, names))
         else:
             # Too many patterns, *sigh*
             pat_max = PATTERNS_MAX
@@ -1498,24 +1918,22 @@ class YumHistory(object):
                 data = _setupHistorySearchSQL(npatterns, ignore_case)
                 (need_full, nps, fields, names) = data
                 assert nps
-                for row in self._yieldSQLDataList(nps, fields, ignore_case):
-                    pkgtupids.add(row[0])
+                chunks.append((nps, fields, names))
 
-        sql =  """SELECT tid FROM trans_data_pkgs WHERE pkgtupid IN """
-        sql += "(%s)" % ",".join(['?'] * len(pkgtupids))
-        params = list(pkgtupids)
+        #  Let sqlite join the matching packages with the transactions through
+        # the pkgtupid index, instead of filtering all the rows in python.
         tids = set()
-        if len(params) > PATTERNS_INDEXED_MAX:
-            executeSQL(cur, """SELECT tid FROM trans_data_pkgs""")
+        for (nps, fields, names) in chunks:
+            (qsql, params) = self._sqlDataListQuery(nps, fields, ignore_case,
+                                                    names)
+            sql = """SELECT DISTINCT tid FROM trans_data_pkgs
+                     WHERE pkgtupid IN (SELECT pkgtupid FROM (%s))""" % qsql
+            executeSQL(cur, sql, params)
             for row in cur:
-                if row[0] in params:
-                    tids.add(row[0])
-            return tids
-        if not params:
-            return tids
-        executeSQL(cur, sql, params)
-        for row in cur:
-            tids.add(row[0])
+                tids.add(row[0])
+        archive = self._get_archive()
+        if archive is not None:
+            tids.update(archive.search(patterns, ignore_case))
         return tids
 
     _update_ops_3 = ['''\
@@ -1535,6 +1953,71 @@ class YumHistory(object):
  CREATE INDEX i_pkgkey_yumdb ON pkg_yumdb (pkgtupid, yumdb_key);
 ''']
 
+    _update_ops_4 = ['''\
+ CREATE INDEX IF NOT EXISTS i_trans_data_pkgtupid
+     ON trans_data_pkgs (pkgtupid);
+''', '''\
+ CREATE INDEX IF NOT EXISTS i_pkgtup_name_nocase
+     ON pkgtups (name COLLATE NOCASE);
+''', '''\
+ CREATE INDEX IF NOT EXISTS i_trans_data_tid ON trans_data_pkgs (tid);
+''', '''\
+ CREATE INDEX IF NOT EXISTS i_trans_cmdline_tid ON trans_cmdline (tid);
+''']
+
+    _update_ops_5 = ['''\
+ CREATE INDEX IF NOT EXISTS i_pkgtup_nevr
+     ON pkgtups (name, epoch, version, release);
+''']
+
+    def _update_db_file_5(self):
+        """ Update to version 5 of history, index for _pkg_stats(). Done
+            by beg(). """
+        if not self._update_db_file_4():
+            return False
+
+        if hasattr(self, '_cached_updated_5'):
+            return self._cached_updated_5
+
+        cur = self._get_cursor()
+        if cur is None:
+            return False
+
+        executeSQL(cur, "PRAGMA index_info(i_pkgtup_nevr)")
+        #  If we get anything, the index is there.
+        for ob in cur:
+            break
+        else:
+            for op in self._update_ops_5:
+                cur.execute(op)
+            self._commit()
+        self._cached_updated_5 = True
+        return True
+
+    def _update_db_file_4(self):
+        """ Update to version 4 of history, indexes for search() and
+            iter_old(). Done by beg() and compact(). """
+        if not self._update_db_file_3():
+            return False
+
+        if hasattr(self, '_cached_updated_4'):
+            return self._cached_updated_4
+
+        cur = self._get_cursor()
+        if cur is None:
+            return False
+
+        executeSQL(cur, "PRAGMA index_info(i_trans_cmdline_tid)")
+        #  If we get anything, the indexes are there.
+        for ob in cur:
+            break
+        else:
+            for op in self._update_ops_4:
+                cur.execute(op)
+            self._commit()
+        self._cached_updated_4 = True
+        return True
+
 # pylint: disable-msg=E0203
     def _update_db_file_3(self):
         """ Update to version 3 of history, rpmdb/yumdb data. """
@@ -1657,12 +2140,15 @@ class YumHistory(object):
                                     'history',
                                     self._db_date,
                                     'sqlite')
+        self.close()
         if self._db_file == _db_file:
             os.rename(_db_file, _db_file + '.old')
-            # Just in case ... move the journal file too.
-            if os.path.exists(_db_file + '-journal'):
-                os.rename(_db_file  + '-journal', _db_file + '-journal.old')
+            # Just in case ... move the journal files too.
+            for suffix in ('-journal', '-wal', '-shm'):
+                if os.path.exists(_db_file + suffix):
+                    os.rename(_db_file + suffix, _db_file + suffix + '.old')
         self._db_file = _db_file
+        self._pid_cache = {}
 
         if self.conf.writable and not os.path.exists(self._db_file):
             # make them default to 0600 - sysadmin can change it later
@@ -1722,8 +2208,32 @@ class YumHistory(object):
             cur.execute(op)
         for op in self._update_ops_3:
             cur.execute(op)
+        for op in self._update_ops_4:
+            cur.execute(op)
+        for op in self._update_ops_5:
+            cur.execute(op)
         self._commit()
 
+class _ArchiveHistory(YumHistory):
+    """ The transactions moved out of the live history DB by compact(). """
+
+    def __init__(self, db_file, yumdb, releasever=None):
+        self._conn = None
+        self._pid_cache = {}
+        self._archive = None
+
+        self.conf = misc.GenericHolder()
+        self.conf.db_path = os.path.dirname(db_file)
+        self.conf.writable = os.access(db_file, os.W_OK)
+        self.conf.readable = True
+        self.yumdb = yumdb
+        self.releasever = releasever
+        self._db_file = db_file
+
+    def _get_archive(self):
+        return None
+
+
 _FULL_PARSE_QUERY_BEG = """
 SELECT pkgtupid,name,epoch,version,release,arch,
   name || "." || arch AS sql_nameArch,
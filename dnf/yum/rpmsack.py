@@ -15,7 +15,9 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 from . import misc
+from .sqlutils import sqlite, executeSQL
 import dnf.pycomp
+import dnf.util
 import glob
 import os
 import rpm
@@ -59,9 +61,51 @@ def _iopen(*args):
         return None, e
     return ret, None
 
+def _listdir(path):
+    """ The file names in path, empty if it can not be listed. """
+    try:
+        return frozenset(os.listdir(path))
+    except (IOError, OSError):
+        return frozenset()
+
+def _stat_cookie(path):
+    """ A string that changes whenever the file does, 'none' if it is
+        missing. """
+    st = misc.stat_f(path, ignore_EACCES=True)
+    if st is None:
+        return 'none'
+    return '%d:%d:%d' % (st.st_ino, st.st_size, int(st.st_mtime * 1000000))
+
+def _drop_stale_cache(db):
+    """ Empty the attr cache of db if its data changed since it was filled,
+        by another process too. """
+    cookie = db.cookie()
+    if cookie != db._cache_cookie:
+        db._attr_cache.clear()
+        db._cache_cookie = cookie
+
+def _touch_changed(conf):
+    """ Bump the CHANGED_STAMP of the AdditionalPkgDB with conf. """
+    try:
+        dnf.util.touch(os.path.join(conf.db_path,
+                                    AdditionalPkgDB.CHANGED_STAMP))
+    except (IOError, OSError):
+        pass
+
 def _sanitize(path):
     return path.replace('/', '').replace('~', '')
 
+def _pkg_key(pkgtup, pkgid):
+    """ The name of the package's yumdb dir, the package key in sqlite. """
+    (n, a, e, v,r) = pkgtup
+    n = _sanitize(n)
+    str_pkgid = pkgid
+    if pkgid is None:
+        str_pkgid = '<nopkgid>'
+    elif dnf.pycomp.is_py2str_py3bytes(pkgid):
+        str_pkgid = pkgid.decode()
+    return '%s-%s-%s-%s-%s' % (str_pkgid, n, v, r, a)
+
 class AdditionalPkgDB(object):
     """ Accesses additional package data rpmdb is unable to store.
 
@@ -71,11 +115,16 @@ class AdditionalPkgDB(object):
     # pkgs stored in name[0]/pkgid-name-ver-rel-arch dirs
     # dirs have files per piece of info we're keeping, e.g. repoid, install
     # reason, status, etc.
+    # <persistdir>/yumdb/.changed is touched on every change
+
+    CHANGED_STAMP = '.changed'
 
     def __init__(self, db_path):
         self.conf = misc.GenericHolder()
         self.conf.db_path = db_path
         self.conf.writable = False
+        # write_attrs() touches the CHANGED_STAMP once for all its writes:
+        self.conf.batch = False
 
         self._packages = {} # pkgid = dir
         if not os.path.exists(self.conf.db_path):
@@ -89,19 +138,22 @@ class AdditionalPkgDB(object):
             if os.access(self.conf.db_path, os.W_OK):
                 self.conf.writable = True
         self.yumdb_cache = {'attr' : {}}
+        # values read in bulk, None for the unset ones, by package dir, valid
+        # while cookie() returns _cache_cookie:
+        self._attr_cache = {}
+        self._cache_cookie = None
+
+    def cookie(self):
+        """Return a string that changes whenever the stored data does."""
+        return _stat_cookie(os.path.join(self.conf.db_path,
+                                         self.CHANGED_STAMP))
 
     def _get_dir_name(self, pkgtup, pkgid):
         if pkgid in self._packages:
             return self._packages[pkgid]
-        (n, a, e, v,r) = pkgtup
-        n = _sanitize(n)
-        str_pkgid = pkgid
-        if pkgid is None:
-            str_pkgid = '<nopkgid>'
-        elif dnf.pycomp.is_py2str_py3bytes(pkgid):
-            str_pkgid = pkgid.decode()
-        thisdir = '%s/%s/%s-%s-%s-%s-%s' % (self.conf.db_path,
-                                            n[0], str_pkgid, n, v, r, a)
+        n = _sanitize(pkgtup[0])
+        thisdir = '%s/%s/%s' % (self.conf.db_path, n[0],
+                                _pkg_key(pkgtup, pkgid))
         self._packages[pkgid] = thisdir
         return thisdir
 
@@ -114,8 +166,86 @@ class AdditionalPkgDB(object):
         else:
             raise ValueError("Missing arguments.")
 
-        return RPMDBAdditionalDataPackage(self.conf, thisdir,
-                                          yumdb_cache=self.yumdb_cache)
+        _drop_stale_cache(self)
+        return self._package(thisdir)
+
+    def _package(self, thisdir):
+        return RPMDBAdditionalDataPackage(
+            self.conf, thisdir, yumdb_cache=self.yumdb_cache,
+            attr_cache=self._attr_cache.setdefault(thisdir, {}))
+
+    def get_attrs(self, pkgs, attrs):
+        """Return {po: {attr: value}} with the set attrs of all the pkgs.
+
+        Every directory is listed once and only the files found are read. The
+        values are cached until the cookie() changes.
+
+        """
+        _drop_stale_cache(self)
+        ret = {}
+        listed = {}
+        for po in pkgs:
+            pkgdb = self._package(self._get_dir_name(po.pkgtup, po.pkgid))
+            cached = pkgdb._attr_cache
+            todo = [attr for attr in attrs if attr not in cached]
+            if todo:
+                present = self._list_pkgdir(pkgdb._mydir, listed)
+                for attr in todo:
+                    if _sanitize(attr) in present:
+                        cached[attr] = pkgdb.get(attr)
+                    else:
+                        cached[attr] = None
+            ret[po] = {attr : cached[attr] for attr in attrs
+                       if cached[attr] is not None}
+        return ret
+
+    @staticmethod
+    def _list_pkgdir(pkgdir, listed):
+        """ The file names in pkgdir, its parent is listed once into the
+            listed dict to skip the packages without a directory. """
+        parent, name = os.path.split(pkgdir)
+        if parent not in listed:
+            listed[parent] = _listdir(parent)
+        if name not in listed[parent]:
+            return frozenset()
+        return _listdir(pkgdir)
+
+    def read_attrs(self, pkgs, attr):
+        """Return the values of attr for all pkgs, None where not set."""
+        values = self.get_attrs(pkgs, (attr,))
+        return [values[po].get(attr) for po in pkgs]
+
+    def write_attrs(self, items):
+        """Set the attributes given as (po, attr, value) triples."""
+        _drop_stale_cache(self)
+        self.conf.batch = True
+        try:
+            for (po, attr, value) in items:
+                pkgdir = self._get_dir_name(po.pkgtup, po.pkgid)
+                setattr(self._package(pkgdir), attr, value)
+        finally:
+            self.conf.batch = False
+            _touch_changed(self.conf)
+        # the cache has our own changes:
+        self._cache_cookie = self.cookie()
+
+    def close(self):
+        """Nothing to release, every access opens and closes its file."""
+        pass
+
+    def iter_tree(self):
+        """Yield (package key, attr, value) of everything stored."""
+        for pkgdir in glob.glob(self.conf.db_path + '/*/*'):
+            key = os.path.basename(pkgdir)
+            for fn in glob.glob(pkgdir + '/*'):
+                attr = os.path.basename(fn)
+                if attr.endswith('.tmp'):
+                    continue
+                fo, e = _iopen(fn)
+                if fo is None:
+                    continue
+                with fo:
+                    yield key, attr, fo.read()
 
 class RPMDBAdditionalDataPackage(object):
 
@@ -126,9 +256,11 @@ class RPMDBAdditionalDataPackage(object):
                                 'from_repo_timestamp', 'releasever',
                                 'command_line'])
 
-    def __init__(self, conf, pkgdir, yumdb_cache=None):
+    def __init__(self, conf, pkgdir, yumdb_cache=None, attr_cache=None):
         self._conf = conf
         self._mydir = pkgdir
+        # shared with AdditionalPkgDB.get_attrs(), kept up to date on writes:
+        self._attr_cache = {} if attr_cache is None else attr_cache
 
         self._read_cached_data = {}
 
@@ -207,6 +339,11 @@ class RPMDBAdditionalDataPackage(object):
         """ Given an attribute, return the filename. """
         return os.path.normpath(self._mydir + '/' + attr)
 
+    def _changed(self):
+        """ Let AdditionalPkgDB.cookie() know about a change. """
+        if not self._conf.batch:
+            _touch_changed(self._conf)
+
     def _write(self, attr, value):
         # check for self._conf.writable before going on?
         if not os.path.exists(self._mydir):
@@ -222,6 +359,8 @@ class RPMDBAdditionalDataPackage(object):
 
         # Auto hardlink some of the attrs...
         if self._link_yumdb_cache(fn, value):
+            self._attr_cache[attr] = value
+            self._changed()
             return
 
         # Default write()+rename()... hardlink -c can still help.
@@ -237,7 +376,9 @@ class RPMDBAdditionalDataPackage(object):
         fo.close()
         del fo
         os.rename(fn +  '.tmp', fn) # even works on ext4 now!:o
+        self._changed()
 
+        self._attr_cache[attr] = value
         self._auto_cache(attr, value, fn)
 
     def _read(self, attr):
@@ -245,6 +386,10 @@ class RPMDBAdditionalDataPackage(object):
 
         if attr in self._read_cached_data:
             return self._read_cached_data[attr]
+        if attr in self._attr_cache:
+            if self._attr_cache[attr] is None:
+                raise AttributeError("%s has no attribute %s" % (self, attr))
+            return self._attr_cache[attr]
         fn = self._attr2fn(attr)
 
         if attr.endswith('.tmp'):
@@ -280,12 +425,14 @@ class RPMDBAdditionalDataPackage(object):
         fn = self._attr2fn(attr)
         if attr in self._read_cached_data:
             del self._read_cached_data[attr]
+        self._attr_cache[attr] = None
         self._unlink_yumdb_cache(fn)
         if os.path.exists(fn):
             try:
                 os.unlink(fn)
             except (IOError, OSError):
                 raise AttributeError("Cannot delete attribute %s on %s " % (attr, self))
+            self._changed()
 
     def __getattr__(self, attr):
         return self._read(attr)
@@ -336,3 +483,209 @@ class RPMDBAdditionalDataPackage(object):
         except AttributeError:
             return default
         return res
+
+
+class SqliteAdditionalPkgDB(object):
+    """ AdditionalPkgDB stored in a single sqlite file.
+
+        Keeps the package keys of the directory tree, so the tree can be
+        migrated with one pass.
+    """
+
+    # package keys per query, below the limit of sqlite variables:
+    KEYS_CHUNK = 500
+
+    def __init__(self, db_file, tree_path=None):
+        self.db_file = db_file
+        db_dir = os.path.dirname(db_file) or '.'
+        if not os.path.exists(db_dir):
+            try:
+                _makedirs_no_umask(db_dir)
+            except (IOError, OSError) as e:
+                pass
+        self.writable = os.access(db_dir, os.W_OK)
+        self._conn = None
+        # values read in bulk, None for the unset ones, by package key, valid
+        # while cookie() returns _cache_cookie:
+        self._attr_cache = {}
+        self._cache_cookie = None
+
+        exists = os.path.exists(db_file)
+        if not exists and not self.writable:
+            return
+        try:
+            self._conn = sqlite.connect(db_file)
+        except (sqlite.OperationalError, sqlite.DatabaseError):
+            return
+        if exists:
+            return
+        cur = self._conn.cursor()
+        executeSQL(cur, """CREATE TABLE yumdb (
+                             pkgkey TEXT NOT NULL, attr TEXT NOT NULL,
+                             value TEXT NOT NULL,
+                             PRIMARY KEY (pkgkey, attr))""")
+        if tree_path is not None and os.path.isdir(tree_path):
+            self._migrate(AdditionalPkgDB(tree_path))
+        self._conn.commit()
+
+    def cookie(self):
+        """Return a string that changes whenever the stored data does."""
+        return _stat_cookie(self.db_file)
+
+    def _migrate(self, tree_db):
+        # one-shot import of the yumdb directory tree
+        cur = self._conn.cursor()
+        cur.executemany("INSERT OR REPLACE INTO yumdb VALUES (?, ?, ?)",
+                        tree_db.iter_tree())
+
+    def _execute(self, sql, params=()):
+        if self._conn is None:
+            return None
+        cur = self._conn.cursor()
+        executeSQL(cur, sql, params)
+        return cur
+
+    def _read(self, key, attr):
+        cur = self._execute("SELECT value FROM yumdb WHERE pkgkey=? AND attr=?",
+                            (key, attr))
+        row = cur and cur.fetchone()
+        return None if row is None else row[0]
+
+    def _attrs(self, key):
+        cur = self._execute("SELECT attr FROM yumdb WHERE pkgkey=?", (key,))
+        return [row[0] for row in cur or ()]
+
+    def _write_many(self, rows):
+        if self._conn is None or not self.writable:
+            raise AttributeError("Cannot write to %s" % self.db_file)
+        try:
+            self._conn.cursor().executemany(
+                "INSERT OR REPLACE INTO yumdb VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+        except (sqlite.OperationalError, sqlite.DatabaseError):
+            self._conn.rollback()
+            raise AttributeError("Cannot write to %s" % self.db_file)
+
+    def _delete(self, key, attr=None):
+        if self._conn is None or not self.writable:
+            raise AttributeError("Cannot write to %s" % self.db_file)
+        if attr is None:
+            self._execute("DELETE FROM yumdb WHERE pkgkey=?", (key,))
+        else:
+            self._execute("DELETE FROM yumdb WHERE pkgkey=? AND attr=?",
+                          (key, attr))
+        self._conn.commit()
+
+    def get_package(self, po=None, pkgtup=None, pkgid=None):
+        """Return an SqliteAdditionalDataPackage Object for this package"""
+        if po:
+            key = _pkg_key(po.pkgtup, po.pkgid)
+        elif pkgtup and pkgid:
+            key = _pkg_key(pkgtup, pkgid)
+        else:
+            raise ValueError("Missing arguments.")
+        _drop_stale_cache(self)
+        return SqliteAdditionalDataPackage(
+            self, key, self._attr_cache.setdefault(key, {}))
+
+    def get_attrs(self, pkgs, attrs):
+        """Return {po: {attr: value}} with the set attrs of all the pkgs.
+
+        Reads the missing values of the pkgs with a query per KEYS_CHUNK of
+        them and caches them until the cookie() changes.
+
+        """
+        _drop_stale_cache(self)
+        keys = [(po, _pkg_key(po.pkgtup, po.pkgid)) for po in pkgs]
+        todo = set()
+        missing = set()
+        for (_, key) in keys:
+            cached = self._attr_cache.setdefault(key, {})
+            absent = [attr for attr in attrs if attr not in cached]
+            if absent:
+                todo.update(absent)
+                missing.add(key)
+        for key in missing:
+            cached = self._attr_cache[key]
+            for attr in todo:
+                cached.setdefault(attr, None)
+        missing = sorted(missing)
+        attr_marks = ', '.join('?' * len(todo))
+        for start in range(0, len(missing), self.KEYS_CHUNK):
+            chunk = missing[start:start + self.KEYS_CHUNK]
+            cur = self._execute("SELECT pkgkey, attr, value FROM yumdb "
+                                "WHERE attr IN (%s) AND pkgkey IN (%s)" %
+                                (attr_marks, ', '.join('?' * len(chunk))),
+                                tuple(todo) + tuple(chunk))
+            for (key, attr, value) in cur or ():
+                self._attr_cache[key][attr] = value
+        ret = {}
+        for (po, key) in keys:
+            cached = self._attr_cache[key]
+            ret[po] = {attr : cached[attr] for attr in attrs
+                       if cached[attr] is not None}
+        return ret
+
+    def read_attrs(self, pkgs, attr):
+        """Return the values of attr for all pkgs, None where not set."""
+        values = self.get_attrs(pkgs, (attr,))
+        return [values[po].get(attr) for po in pkgs]
+
+    def write_attrs(self, items):
+        """Set the attributes given as (po, attr, value) triples."""
+        rows = [(_pkg_key(po.pkgtup, po.pkgid), _sanitize(attr), value)
+                for (po, attr, value) in items]
+        _drop_stale_cache(self)
+        self._write_many(rows)
+        for (key, attr, value) in rows:
+            self._attr_cache.setdefault(key, {})[attr] = value
+        # the cache has our own changes:
+        self._cache_cookie = self.cookie()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class SqliteAdditionalDataPackage(RPMDBAdditionalDataPackage):
+
+    def __init__(self, db, key, attr_cache):
+        self._db = db
+        self._key = key
+        self._read_cached_data = {}
+        self._attr_cache = attr_cache
+
+    def _write(self, attr, value):
+        attr = _sanitize(attr)
+        self._read_cached_data.pop(attr, None)
+        self._db._write_many([(self._key, attr, value)])
+        self._attr_cache[attr] = value
+
+    def _read(self, attr):
+        attr = _sanitize(attr)
+        if attr in self._read_cached_data:
+            return self._read_cached_data[attr]
+        if attr in self._attr_cache:
+            value = self._attr_cache[attr]
+        else:
+            value = self._db._read(self._key, attr)
+        if value is None:
+            raise AttributeError("%s has no attribute %s" % (self, attr))
+        self._read_cached_data[attr] = value
+        return value
+
+    def _delete(self, attr):
+        attr = _sanitize(attr)
+        self._read_cached_data.pop(attr, None)
+        self._db._delete(self._key, attr)
+        self._attr_cache[attr] = None
+
+    def __iter__(self, show_hidden=False):
+        return iter(self._db._attrs(self._key))
+
+    def clean(self):
+        self._read_cached_data = {}
+        self._db._delete(self._key)
+        for attr in self._attr_cache:
+            self._attr_cache[attr] = None
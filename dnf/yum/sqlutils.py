@@ -173,6 +173,20 @@ if sqlite.version_info[0] > 1:
 else:
     executeSQL = executeSQLPyFormat
 
+def executeSQLMany(cursor, query, params_seq):
+    """
+    Execute the query once for every item of params_seq, in one call where
+    the sqlite module supports it.
+
+    @param cursor: A sqlite cursor
+    @param query: The query to execute
+    @param params_seq: A sequence of lists of parameters to the query
+    """
+    if executeSQL is executeSQLQmark:
+        return cursor.executemany(query, params_seq)
+    for params in params_seq:
+        executeSQL(cursor, query, params)
+
 
 def sql_esc(pattern):
     """ Apply SQLite escaping, if needed. Returns pattern and esc. """
@@ -17,6 +17,7 @@
 
 from __future__ import absolute_import
 from tests import support
+from tests.support import mock
 from dnf.comps import CompsQuery
 
 import dnf.cli.commands.group as group
@@ -70,6 +71,17 @@ class GroupCommandTest(support.TestCase):
         self.assertTrue(demands.allow_erasing)
         self.assertFalse(demands.freshest_metadata)
 
+    def test_run_transaction_history_record(self):
+        base = self.cmd.base
+        base.history = mock.Mock()
+        self.cmd._remark = True
+        self.cmd.run_transaction()
+        self.assertFalse(base.history.sync_alldb_pkgs.called)
+
+        base.conf.history_record = True
+        self.cmd.run_transaction()
+        self.assertEqual(base.history.sync_alldb_pkgs.call_count, 1)
+
 
 class CompsQueryTest(support.TestCase):
 
@@ -43,6 +43,48 @@ class SearchCountedTest(support.TestCase):
         self.cmd._search_counted(counter, 'summary', '*invit*')
         self.assertEqual(len(counter), 1)
 
+class SearchQueriesTest(support.TestCase):
+    def setUp(self):
+        base = support.MockBase("main")
+        self.sack = base.sack
+        self.cmd = search.SearchCommand(base.mock_cli())
+        self.index = mock.Mock()
+        self.cmd._indexes = {'main' : self.index}
+
+    def searched(self, needle):
+        queries = self.cmd._search_queries('summary', needle)
+        return [set(query.run()) for query in queries]
+
+    def test_glob(self):
+        self.assertEqual(self.searched('*invit*'), [set(self.sack.query())])
+        self.assertFalse(self.index.names.called)
+
+    def test_index(self):
+        self.index.names.return_value = set(['pepper'])
+        (scanned, indexed) = self.searched('pepper')
+        self.index.names.assert_called_once_with('summary', 'pepper')
+        self.assertEqual(scanned,
+                         set(self.sack.query().filter(reponame__neq='main')))
+        self.assertEqual(indexed, set(self.sack.query().filter(
+            reponame='main', name='pepper')))
+
+    def test_index_nothing(self):
+        self.index.names.return_value = set()
+        self.assertEqual(self.searched('nothing'), [set(
+            self.sack.query().filter(reponame__neq='main'))])
+
+    def test_index_fallback(self):
+        self.index.names.return_value = None
+        self.assertEqual(self.searched('o'), [set(self.sack.query())])
+
+    def test_index_too_many(self):
+        names = set('name%d' % i for i in range(search.MAX_INDEXED_NAMES))
+        self.index.names.return_value = names
+        self.assertLength(self.searched('name'), 2)
+        names.add('pepper')
+        self.assertEqual(self.searched('name'), [set(self.sack.query())])
+
+
 class SearchTest(support.TestCase):
     def setUp(self):
         self.base = support.MockBase("search")
@@ -31,6 +31,7 @@ import dnf.persistor
 import dnf.pycomp
 import dnf.repo
 import dnf.sack
+import dnf.yum.history
 import dnf.yum.rpmsack
 import hawkey
 import hawkey.test
@@ -305,6 +306,9 @@ class MockPackage(object):
     def __str__(self):
         return self.str
 
+    def _mark_verified(self):
+        pass
+
     def localPkg(self):
         return os.path.join(self.repo.pkgdir, os.path.basename(self.location))
 
@@ -336,13 +340,47 @@ class MockBase(_BaseStubMixin, dnf.Base):
 def mock_sack(*extra_repos):
     return MockBase(*extra_repos).sack
 
+class MockYumDBPackage(mock.Mock):
+    """Package data of `MockYumDB`, get() only sees the attributes set."""
+
+    def __init__(self, *args, **kwargs):
+        self.__dict__['_set_attrs'] = {}
+        super(MockYumDBPackage, self).__init__(*args, **kwargs)
+
+    def __setattr__(self, attr, value):
+        if not attr.startswith('_'):
+            self._set_attrs[attr] = value
+        super(MockYumDBPackage, self).__setattr__(attr, value)
+
+    def __delattr__(self, attr):
+        self._set_attrs.pop(attr, None)
+        super(MockYumDBPackage, self).__delattr__(attr)
+
+    def get(self, attr, default=None):
+        return self._set_attrs.get(attr, default)
+
 class MockYumDB(mock.Mock):
     def __init__(self):
         super(mock.Mock, self).__init__()
         self.db = {}
 
     def get_package(self, pkg):
-        return self.db.setdefault(str(pkg), mock.Mock())
+        return self.db.setdefault(str(pkg), MockYumDBPackage())
+
+    def get_attrs(self, pkgs, attrs):
+        ret = {}
+        for pkg in pkgs:
+            get = self.get_package(pkg).get
+            ret[pkg] = {attr : get(attr) for attr in attrs
+                        if get(attr) is not None}
+        return ret
+
+    def write_attrs(self, items):
+        for (pkg, attr, value) in items:
+            setattr(self.get_package(pkg), attr, value)
+
+    def cookie(self):
+        return str(sorted(self.db))
 
     def assertLength(self, length):
         assert len(self.db) == length
@@ -421,6 +459,7 @@ class FakeConf(object):
         self.multilib_policy = 'best'
         self.obsoletes = True
         self.persistdir = '/should-not-exist-bad-test/persist'
+        self.pkgstore = None
         self.plugins = False
         self.showdupesfromrepos = False
         self.tsflags = []
@@ -54,6 +54,21 @@ class BaseTest(support.TestCase):
         reg = re.compile('/var/tmp/dnf-[a-zA-Z0-9_-]+/[a-zA-Z0-9_]+/x')
         self.assertIsNotNone(reg.match(base.conf.cachedir))
 
+    @mock.patch('dnf.Base._store_persistent_data')
+    @mock.patch('dnf.Base.closeRpmDB')
+    def test_close_yumdb(self, _close_rpmdb, _store):
+        base = dnf.Base()
+        base.conf.keepcache = True
+        base.close()
+        self.assertFalse(hasattr(base, '_yumdb'))
+
+        base = dnf.Base()
+        base.conf.keepcache = True
+        yumdb = base._yumdb = mock.Mock()
+        base.close()
+        yumdb.close.assert_called_once_with()
+        self.assertFalse(hasattr(base, '_yumdb'))
+
     def test_reset(self):
         base = support.MockBase('main')
         base.reset(sack=True, repos=False)
@@ -116,6 +131,41 @@ class BaseTest(support.TestCase):
 
         self.assertRaises(StopIteration, next, iterator)
 
+    def test_iter_userinstalled_history(self):
+        """Test iter_userinstalled with the data recorded in the history."""
+        base = dnf.Base()
+        base._sack = support.mock_sack('main')
+        base._yumdb = support.MockYumDB()
+        pkg, = base.sack.query().installed().filter(name='pepper')
+        history = mock.Mock()
+        history.yumdb_synced.return_value = True
+        history.get_yumdb_attrs = lambda pkgs, attrs: {
+            p: {'reason': 'user'} if p == pkg else {} for p in pkgs}
+
+        with mock.patch.object(base, '_rpmdb_version', return_value='v'):
+            iterator = base.iter_userinstalled(history)
+
+        history.yumdb_synced.assert_called_once_with('v')
+        self.assertEqual(next(iterator), pkg)
+        self.assertRaises(StopIteration, next, iterator)
+
+    def test_iter_userinstalled_history_stale(self):
+        """Test iter_userinstalled when the history data are out of date."""
+        base = dnf.Base()
+        base._sack = support.mock_sack('main')
+        base._yumdb = support.MockYumDB()
+        pkg, = base.sack.query().installed().filter(name='pepper')
+        base.yumdb.get_package(pkg).get = {'reason': 'dep'}.get
+        history = mock.Mock()
+        history.yumdb_synced.return_value = False
+        history.get_yumdb_attrs = lambda pkgs, attrs: {
+            p: {'reason': 'user'} for p in pkgs}
+
+        with mock.patch.object(base, '_rpmdb_version', return_value='v'):
+            iterator = base.iter_userinstalled(history)
+
+        self.assertRaises(StopIteration, next, iterator)
+
     def test_translate_comps_pkg_types(self):
         base = dnf.Base()
         num = base._translate_comps_pkg_types(('mandatory', 'optional'))
@@ -132,6 +182,17 @@ class MockBaseTest(TestCase):
         self.assertIsInstance(pkg, dnf.package.Package)
         self.assertEqual(pkg.name, 'tour')
 
+    def test_sig_check_pkgs(self):
+        self.base.repos['main'].gpgcheck = True
+        pkgs = list(self.base.sack.query().available().filter(name='pepper'))
+        with mock.patch('dnf.rpm.miscutils.checkSigs',
+                        return_value=[0, 4]) as check_sigs:
+            results = self.base._sig_check_pkgs(pkgs)
+        check_sigs.assert_called_once_with(
+            '/', [pkg.localPkg() for pkg in pkgs])
+        self.assertEqual(results[0], (0, ''))
+        self.assertEqual(results[1][0], 2)
+
 class BuildTransactionTest(support.TestCase):
     def test_resolve(self):
         base = support.MockBase("updates")
@@ -89,6 +89,49 @@ class BaseCliTest(support.ResultTestCase):
         self.assertEqual(logger.mock_calls, [
             mock.call.info('No match for available package: %s', pkg)] * 2)
 
+    @mock.patch('dnf.cli.cli._', dnf.pycomp.NullTranslations().ugettext)
+    def test_output_packages_stream(self, _):
+        self._base.conf.stream_lists = True
+        self._base.output.listPkgs = mock.Mock(return_value=(0, []))
+        self._base.output_packages('list', 'all', ['pepper'])
+
+        calls = self._base.output.listPkgs.call_args_list
+        self.assertEqual([call[0][1] for call in calls],
+                         ['Installed Packages', 'Available Packages'])
+        self.assertCountEqual(map(str, calls[0][0][0]),
+                              ['pepper-20-0.x86_64'])
+        self.assertCountEqual(map(str, calls[1][0][0]),
+                              ['pepper-20-0.src', 'pepper-20-1.x86_64'])
+
+    @mock.patch('dnf.cli.cli._', dnf.pycomp.NullTranslations().ugettext)
+    def test_output_packages_stream_chunks(self, _):
+        self._base.conf.stream_lists = True
+        self._base._STREAM_CHUNK = 2
+        self._base.output.listPkgs = mock.Mock(return_value=(0, []))
+        self._base.output_packages('info', 'all', [])
+
+        calls = self._base.output.listPkgs.call_args_list
+        self.assertGreater(len(calls), 2)
+        for narrow in ('installed', 'available'):
+            ncalls = [call for call in calls
+                      if call[1]['section'] == narrow]
+            headings = [call[0][1] for call in ncalls]
+            self.assertIsNotNone(headings[0])
+            self.assertEqual(headings[1:], [None] * (len(headings) - 1))
+            streamed = [pkg for call in ncalls for pkg in call[0][0]]
+            for call in ncalls:
+                self.assertLessEqual(len(set(pkg.name for pkg in call[0][0])),
+                                     2)
+            expected = getattr(self._base.doPackageLists(narrow), narrow)
+            self.assertEqual(streamed, sorted(expected))
+
+    def test_output_packages_records(self, _):
+        self._base.conf.output_format = 'nul'
+        with mock.patch('dnf.cli.format.print', create=True) as print_:
+            self._base.output_packages('list', 'installed', ['pepper'])
+        print_.assert_called_once_with(
+            'installed\0pepper\0' '0\0' '20\0' '0\0x86_64\0@System\0')
+
     def test_transaction_id_or_offset_bad(self, _):
         """Test transaction_id_or_offset with a bad input."""
         self.assertRaises(ValueError,
@@ -127,6 +170,12 @@ class CliTest(TestCase):
         update = self.cli.cli_commands['update']
         self.assertIs(upgrade, update)
 
+    def test_lazy_commands(self, _):
+        for (_module, clsname, aliases) in dnf.cli.cli._LAZY_COMMANDS:
+            command_cls = self.cli.cli_commands[aliases[0]]
+            self.assertEqual(command_cls.__name__, clsname)
+            self.assertCountEqual(command_cls.aliases, aliases)
+
     def test_simple(self, _):
         self.assertFalse(self.base.conf.assumeyes)
         self.cli.configure(['update', '-y'])
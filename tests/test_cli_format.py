@@ -17,6 +17,7 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 from dnf.cli.format import format_time, format_number
+from tests.support import mock
 
 import dnf.cli.format
 import tests.support
@@ -44,3 +45,29 @@ class FormatTest(tests.support.TestCase):
         s = 'big\nbrown\nbag'
         out = dnf.cli.format.indent_block(s)
         self.assertEqual(out, '  big\n  brown\n  bag')
+
+
+class RecordWriterTest(tests.support.TestCase):
+    def setUp(self):
+        patcher = mock.patch('dnf.cli.format.print', create=True)
+        self.print_ = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_json(self):
+        writer = dnf.cli.format.RecordWriter('json')
+        writer.write([('name', 'pepper'), ('epoch', 0), ('repo', None)])
+        self.print_.assert_called_once_with(
+            '{"name": "pepper", "epoch": 0, "repo": null}')
+
+    def test_nul(self):
+        writer = dnf.cli.format.RecordWriter('nul')
+        writer.write([('name', 'pepper'), ('files', ['a', 'b']),
+                      ('repo', None)])
+        self.print_.assert_called_once_with('pepper\0a b\0\0')
+
+    def test_nul_escape(self):
+        writer = dnf.cli.format.RecordWriter('nul')
+        writer.write([('name', 'pepper'),
+                      ('description', 'Hot.\n\nSee C:\\pepper.')])
+        self.print_.assert_called_once_with(
+            'pepper\0Hot.\\n\\nSee C:\\\\pepper.\0')
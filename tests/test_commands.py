@@ -74,6 +74,20 @@ class CommandTest(support.TestCase):
         self.assertEqual(ext, ['cracker', 'filling'])
 
 
+class ListCommandTest(support.TestCase):
+    def setUp(self):
+        base = support.BaseCliStub()
+        self.cmd = dnf.cli.commands.ListCommand(base.mock_cli())
+
+    def test_configure(self):
+        self.cmd.configure(['installed', 'pepper'])
+        self.assertFalse(self.cmd.cli.demands.filelists)
+
+    def test_configure_filename(self):
+        self.cmd.configure(['/usr/bin/pepper'])
+        self.assertTrue(self.cmd.cli.demands.filelists)
+
+
 class InstallCommandTest(support.ResultTestCase):
 
     """Tests of ``dnf.cli.commands.install.InstallCommand`` class."""
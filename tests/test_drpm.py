@@ -21,6 +21,8 @@ from tests import support, mock
 from dnf.yum.misc import unlink_f
 from dnf.util import Bunch
 
+import dnf.callback
+import dnf.drpm
 import dnf.exceptions
 import os
 import shutil
@@ -33,7 +35,7 @@ class DrpmTest(support.TestCase):
         cachedir = tempfile.mkdtemp()
         self.addCleanup(shutil.rmtree, cachedir)
         self.base = support.MockBase()
-        self.base.conf.cachedir = support.USER_RUNDIR
+        self.base.conf.cachedir = cachedir
 
         # load the testing repo
         repo = self.base.add_test_dir_repo('drpm', cachedir)
@@ -90,3 +92,77 @@ class DrpmTest(support.TestCase):
             self.assertEquals(self.download(), ['tour-5-1.noarch.rpm'])
         with mock.patch('dnf.drpm.MAX_PERCENTAGE', 200):
             self.assertEquals(self.download(), ['drpms/tour-5-1.noarch.drpm'])
+
+
+class DeltaInfoTest(support.TestCase):
+    def setUp(self):
+        self.progress = mock.Mock()
+        with mock.patch('dnf.drpm.APPLYDELTA', '/bin/true'):
+            self.delta_info = dnf.drpm.DeltaInfo(None, self.progress)
+        self.pkgdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pkgdir)
+
+    def delta_factory(self, stats, delta_size, full_size):
+        pkg = mock.Mock(downloadsize=full_size, size=full_size)
+        pkg.repo.deltarpm = True
+        pkg.localPkg.return_value = support.NONEXISTENT_FILE
+        pkg.get_delta_from_evr.return_value = mock.Mock(downloadsize=delta_size)
+        self.delta_info.query = mock.Mock()
+        self.delta_info.query.filter.return_value = [mock.Mock(evr='1-0')]
+        self.delta_info.deltarpm = 1
+        self.delta_info.stats = stats
+        return self.delta_info.delta_factory(pkg, self.progress)
+
+    def test_delta_factory_cost(self):
+        # 1 MB/s, rebuilding takes 1 s per MB
+        stats = Bunch(throughput=2.0 ** 20, rebuild_rate=2.0 ** -20)
+        self.assertIsNone(self.delta_factory(stats, 2 ** 19, 2 ** 20))
+        self.assertEqual(self.delta_info.est_full_time, 0)
+        # 0.1 MB/s, the delta saves more than the rebuild costs
+        stats.throughput = 2.0 ** 20 / 10
+        self.assertIsNotNone(self.delta_factory(stats, 2 ** 19, 2 ** 20))
+        self.assertAlmostEqual(self.delta_info.est_delta_time, 6)
+        self.assertAlmostEqual(self.delta_info.est_full_time, 10)
+
+    def test_delta_factory_no_history(self):
+        stats = Bunch(throughput=2.0 ** 20, rebuild_rate=None)
+        self.assertIsNotNone(self.delta_factory(stats, 2 ** 18, 2 ** 20))
+        self.assertIsNone(self.delta_factory(stats, 2 ** 20, 2 ** 20))
+
+    def payload(self, name, size):
+        delta_fn = os.path.join(self.pkgdir, '%s.drpm' % name)
+        open(delta_fn, 'w').close()
+        pkg = mock.Mock(arch='noarch', downloadsize=size)
+        pkg.repo.pkgdir = self.pkgdir
+        pkg.localPkg.return_value = os.path.join(self.pkgdir, '%s.rpm' % name)
+        pkg.verifyLocalPkg.return_value = True
+        delta = mock.Mock(location=delta_fn)
+        return dnf.drpm.DeltaPayload(self.delta_info, delta, pkg, self.progress)
+
+    @mock.patch('dnf.drpm.APPLYDELTA', '/bin/true')
+    def test_rebuild(self):
+        pload = self.payload('tour', 10)
+        self.delta_info.enqueue(pload)
+        self.delta_info.wait()
+
+        self.assertEmpty(self.delta_info.err)
+        self.assertPathDoesNotExist(pload.localPkg())
+        self.assertGreaterEqual(pload.rebuild_time, 0)
+        self.progress.end.assert_called_once_with(
+            pload, dnf.callback.STATUS_DRPM, mock.ANY)
+
+    def test_largest_first(self):
+        rebuilt = []
+        def rebuild(pload):
+            rebuilt.append(str(pload))
+            pload.rebuild_time = pload.rebuild_cpu = 0
+            return pload, 0, True
+
+        # no workers get started, run the worker loop here:
+        self.delta_info.deltarpm = 0
+        for (name, size) in (('small', 1), ('large', 100), ('medium', 10)):
+            self.delta_info.enqueue(self.payload(name, size))
+        self.delta_info._closing = True
+        with mock.patch.object(self.delta_info, '_rebuild', rebuild):
+            self.delta_info._work()
+        self.assertEqual(rebuilt, ['large.drpm', 'medium.drpm', 'small.drpm'])
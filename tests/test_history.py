@@ -22,7 +22,13 @@ from tests.support import TestCase
 from tests.support import mock
 
 import dnf.history
+import dnf.util
 import dnf.yum.history
+import dnf.yum.misc
+import os
+import subprocess
+import sys
+import tempfile
 
 class TestedHistory(dnf.yum.history.YumHistory):
     @mock.patch("os.path.exists", return_value=True)
@@ -633,3 +639,334 @@ class ComparisionTests(TestCase):
         b2 = dnf.yum.history.YumHistoryRpmdbProblem(None, 5, 9, None)
         self.assertGreater(a2, b2)
         self.assertLess(b2, a2)
+
+
+class FreshImportTest(TestCase):
+
+    """dnf.yum.history must not rely on dnf.history being imported."""
+
+    CODE = """
+import dnf.cli.main
+import dnf.yum.history
+import sys
+assert 'dnf.history' not in sys.modules
+row = ('pepper', 'x86_64', '0', '20', '0', None, 'TRUE', 'Install')
+hpkg = dnf.yum.history.YumHistory._data_pkg(None, row)
+assert hpkg.state_installed
+npkg = dnf.yum.history.YumMergedHistoryTransaction._conv_pkg_state(
+    hpkg, "Erase")
+assert npkg.state_installed is False
+"""
+
+    def test_data_pkg(self):
+        topdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        path = [topdir] + os.environ.get('PYTHONPATH', '').split(os.pathsep)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(path))
+        proc = subprocess.Popen([sys.executable, '-c', self.CODE], env=env,
+                                stderr=subprocess.PIPE)
+        (_out, err) = proc.communicate()
+        self.assertEqual(proc.returncode, 0, err)
+
+
+class HistoryDBTest(TestCase):
+
+    """Tests of YumHistory against a real history DB."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='dnf-history-test-')
+        self.addCleanup(dnf.util.rm_rf, self.tmpdir)
+        self.yumdb = mock.MagicMock()
+        self.history = dnf.yum.history.YumHistory(self.tmpdir, self.yumdb)
+        self.addCleanup(self.history.close)
+
+    def _beg(self, name, state='Install'):
+        hpkg = dnf.yum.history.YumHistoryPackage(name, 'noarch', '0', '1', '1')
+        tsi = mock.Mock()
+        tsi.history_iterator.return_value = [(hpkg, state)]
+        self.history.beg('%s-beg' % name, [], [tsi],
+                         cmdline='install %s' % name)
+        return hpkg
+
+    def _transaction(self, name, state='Install'):
+        hpkg = self._beg(name, state)
+        self.history.end('%s-end' % name, 0)
+        return hpkg
+
+    def _tids(self, transactions):
+        return [trans.tid for trans in transactions]
+
+
+class CompactTest(HistoryDBTest):
+    def setUp(self):
+        super(CompactTest, self).setUp()
+        self.hpkgs = [self._transaction('pkg%d' % num) for num in range(1, 6)]
+
+    def test_compact(self):
+        self.assertEqual(self.history.compact(2), 3)
+        self.assertTrue(os.path.exists(self.history._archive_file))
+        cur = self.history._get_cursor()
+        cur.execute("SELECT tid FROM trans_beg")
+        self.assertCountEqual([row[0] for row in cur], [4, 5])
+        self.assertEqual(self.history.compact(2), 0)
+
+    def test_archive_fallback(self):
+        self.history.compact(2)
+        self.assertEqual(self._tids(self.history.old()), [5, 4, 3, 2, 1])
+        self.assertEqual(self._tids(self.history.old([1, 4])), [4, 1])
+        self.assertEqual(self._tids(self.history.old(limit=3)), [5, 4, 3])
+        self.assertEqual(self._tids(self.history.iter_old()), [5, 4, 3, 2, 1])
+        self.assertEqual(self._tids(self.history.iter_old([2])), [2])
+        self.assertEqual(self.history.search(['pkg1', 'pkg5']), {1, 5})
+
+        old = self.history.old([1])[0]
+        self.assertEqual(old.end_rpmdbversion, 'pkg1-end')
+        self.assertEqual([hpkg.name for hpkg in old.trans_data], ['pkg1'])
+        self.assertEqual(old.cmdline, 'install pkg1')
+
+    def test_last(self):
+        self._beg('pkg6')
+        self.history.compact(1)
+        self.assertEqual(self.history.last().tid, 5)
+        self.assertEqual(self.history.last(False).tid, 6)
+
+    def test_duplicate_keys(self):
+        self.history._save_anydb_key(self.hpkgs[0], 'yum', 'reason', 'dep')
+        self.history._save_anydb_key(self.hpkgs[0], 'yum', 'reason', 'user')
+        self.history._commit()
+        self.assertEqual(self.history._load_yumdb_key(self.hpkgs[0], 'reason'),
+                         'user')
+
+        self.history.compact(2)
+        archive = self.history._get_archive()
+        self.assertEqual(archive._load_yumdb_key(self.hpkgs[0], 'reason'),
+                         'user')
+        cur = archive._get_cursor()
+        cur.execute("SELECT COUNT(*) FROM pkg_yumdb")
+        self.assertEqual(cur.fetchone()[0], 1)
+
+    def test_changed_keys(self):
+        hpkg = self.hpkgs[0]
+        self.history._save_anydb_key(hpkg, 'yum', 'reason', 'dep')
+        self.history._commit()
+        self._transaction('pkg1', 'Reinstall')
+        self.history.compact(2)
+        # still live in main, so the archive has to take the new value:
+        self.history._save_anydb_key(hpkg, 'yum', 'reason', 'user')
+        self.history._commit()
+        self._transaction('pkg7')
+        self.history.compact(1)
+
+        archive = self.history._get_archive()
+        self.assertEqual(archive._load_yumdb_key(hpkg, 'reason'), 'user')
+
+    def test_pkg_stats(self):
+        for hpkg in (self.hpkgs[0], self.hpkgs[4]):
+            self.history._save_anydb_key(hpkg, 'yum', 'reason', 'user')
+            self.history._save_anydb_key(hpkg, 'rpm', 'buildhost', 'localhost')
+        self.history._commit()
+        stats = self.history._pkg_stats()
+
+        self.history.compact(2)
+        self.assertEqual(self.history._pkg_stats(), stats)
+        self.assertEqual(stats['nevrac'], 5)
+        self.assertEqual(stats['yumdb'], 2)
+        self.assertEqual(stats['rpmdb'], 2)
+
+
+class CompactTwiceTest(HistoryDBTest):
+    def _failed(self, name):
+        hpkg = self._hpkg(name)
+        problem = mock.Mock(problem='conflicts', pkg=hpkg,
+                            conflicts=[self._hpkg('%s-conflict' % name)])
+        problem.__str__ = mock.Mock(return_value='%s conflicts' % name)
+        tsi = mock.Mock()
+        tsi.history_iterator.return_value = [(hpkg, 'Install')]
+        self.history.beg('%s-beg' % name, [], [tsi], rpmdb_problems=[problem])
+        self.history.log_scriptlet_output('%s output' % name)
+        self.history.end('%s-end' % name, 1, errors=['%s failed' % name])
+
+    @staticmethod
+    def _hpkg(name):
+        return dnf.yum.history.YumHistoryPackage(name, 'noarch', '0', '1', '1')
+
+    def test_reused_keys(self):
+        # the live rows get the ids of the ones moved by the first compact:
+        self._failed('pkg1')
+        self._transaction('pkg2')
+        self.assertEqual(self.history.compact(1), 1)
+        self._failed('pkg3')
+        self._transaction('pkg4')
+        self.assertEqual(self.history.compact(1), 2)
+
+        for (tid, name) in ((1, 'pkg1'), (3, 'pkg3')):
+            trans = self.history.old([tid])[0]
+            self.assertEqual(trans.errors, ['%s failed' % name])
+            self.assertEqual(trans.output, ['%s output' % name])
+            (problem,) = trans.rpmdb_problems
+            self.assertEqual(problem.text, '%s conflicts' % name)
+            self.assertEqual([(hpkg.name, hpkg.main)
+                              for hpkg in problem.packages],
+                             [(name, True), ('%s-conflict' % name, False)])
+        self.assertEqual(self.history.old([2])[0].errors, [])
+
+
+class SearchTest(HistoryDBTest):
+    def setUp(self):
+        super(SearchTest, self).setUp()
+        self._transaction('pepper')
+        self._transaction('tour')
+        self._beg('lotus')
+
+    def test_search(self):
+        self.assertEqual(self.history.search(['pepper']), {1})
+        self.assertEqual(self.history.search(['PEP*', 'lotus']), {1, 3})
+        self.assertEqual(self.history.search(['tour-1-1.noarch']), {2})
+        self.assertEqual(self.history.search(['tour.noarch'], False), {2})
+        self.assertEqual(self.history.search(['TOUR'], False), set())
+        self.assertEqual(self.history.search(['rose']), set())
+
+    def test_search_many(self):
+        patterns = ['missing-%d.x86_64' % num
+                    for num in range(dnf.yum.history.PATTERNS_MAX)]
+        self.assertEqual(self.history.search(patterns + ['tour.noarch']), {2})
+
+
+class IterOldTest(HistoryDBTest):
+    def setUp(self):
+        super(IterOldTest, self).setUp()
+        self._transaction('pepper')
+        self._transaction('tour')
+        self._beg('lotus')
+
+    def test_iter_old(self):
+        self.assertEqual(self._tids(self.history.iter_old()), [3, 2, 1])
+        self.assertEqual(self._tids(self.history.iter_old(limit=2)), [3, 2])
+        self.assertEqual(self._tids(self.history.iter_old([1, 3])), [3, 1])
+
+        for (new, old) in zip(self.history.iter_old(), self.history.old()):
+            self.assertEqual(new.tid, old.tid)
+            self.assertEqual(new.end_rpmdbversion, old.end_rpmdbversion)
+            self.assertEqual(new.return_code, old.return_code)
+            self.assertEqual(new.cmdline, old.cmdline)
+            self.assertEqual(new.trans_data, old.trans_data)
+            self.assertEqual(new.altered_lt_rpmdb, old.altered_lt_rpmdb)
+            self.assertEqual(new.altered_gt_rpmdb, old.altered_gt_rpmdb)
+
+    def test_old_loginuids(self):
+        loginuid = dnf.yum.misc.getloginuid()
+        self.assertEqual(self.history.old_loginuids(), {loginuid})
+        self.assertEqual(self.history.old_loginuids([2]), {loginuid})
+
+    def test_readers_do_not_migrate(self):
+        cur = self.history._get_cursor()
+        for op in ('DROP INDEX i_trans_cmdline_tid', 'DROP INDEX i_pkgtup_nevr'):
+            cur.execute(op)
+        self.history._commit()
+        history = dnf.yum.history.YumHistory(self.tmpdir, mock.Mock())
+        self.addCleanup(history.close)
+
+        def indexes():
+            cur = history._get_cursor()
+            cur.execute("""SELECT name FROM sqlite_master
+                           WHERE type = 'index'""")
+            return set(row[0] for row in cur)
+
+        self.assertEqual(self._tids(history.iter_old()), [3, 2, 1])
+        self.assertEqual(history.search(['tour']), {2})
+        history.old_loginuids()
+        history._pkg_stats()
+        self.assertNotIn('i_trans_cmdline_tid', indexes())
+        self.assertNotIn('i_pkgtup_nevr', indexes())
+
+        history.beg('rose-beg', [], [])
+        self.assertIn('i_trans_cmdline_tid', indexes())
+        self.assertIn('i_pkgtup_nevr', indexes())
+
+
+class InstalledPackage(object):
+    from_system = True
+    buildhost = 'localhost'
+
+    def __init__(self, name):
+        self.name = name
+        self.pkgtup = (name, 'noarch', '0', '1', '1')
+
+
+class WriteTest(HistoryDBTest):
+    def test_wal(self):
+        cur = self.history._get_cursor()
+        cur.execute("PRAGMA journal_mode")
+        self.assertEqual(cur.fetchone()[0], 'wal')
+
+    def test_round_trip(self):
+        tsis = []
+        for (name, state) in (('pepper', 'Install'), ('tour', 'Erase')):
+            hpkg = dnf.yum.history.YumHistoryPackage(name, 'noarch', '0', '1',
+                                                     '1')
+            tsis.append(mock.Mock())
+            tsis[-1].history_iterator.return_value = [(hpkg, state)]
+        skipped = dnf.yum.history.YumHistoryPackage('lotus', 'noarch', '0',
+                                                    '1', '1')
+        self.history.beg('beg', [InstalledPackage('dnf')], tsis, [skipped],
+                         cmdline='install pepper')
+        self.history.log_scriptlet_output('first\nsecond')
+        self.history.end('end', 1, ['failed', 'badly'])
+
+        (old,) = self.history.old()
+        self.assertEqual((old.beg_rpmdbversion, old.end_rpmdbversion),
+                         ('beg', 'end'))
+        self.assertEqual(old.return_code, 1)
+        self.assertEqual(old.cmdline, 'install pepper')
+        self.assertEqual([(hpkg.name, hpkg.state) for hpkg in old.trans_data],
+                         [('pepper', 'Install'), ('tour', 'Erase')])
+        self.assertEqual([hpkg.name for hpkg in old.trans_with], ['dnf'])
+        self.assertEqual([hpkg.name for hpkg in old.trans_skip], ['lotus'])
+        self.assertEqual(old.output, ['first', 'second'])
+        self.assertEqual(old.errors, ['failed', 'badly'])
+
+    def test_sync_alldb_pkgs(self):
+        self._transaction('pepper')
+        pepper = InstalledPackage('pepper')
+        unknown = InstalledPackage('rose')
+        self.yumdb.get_attrs.return_value = {pepper : {'reason' : 'user'}}
+        self.assertTrue(self.history.sync_alldb_pkgs([pepper, unknown]))
+        self.yumdb.get_attrs.assert_called_once_with(
+            [pepper], dnf.yum.history._YumHistPackageYumDB._valid_yumdb_keys)
+
+        (hpkg,) = self.history.old()[0].trans_data
+        self.assertEqual(hpkg.yumdb_info.reason, 'user')
+        self.assertEqual(self.history._load_rpmdb_key(hpkg, 'buildhost'),
+                         'localhost')
+        self.assertIsNone(self.history._load_rpmdb_key(hpkg, 'vendor'))
+
+    def test_yumdb_synced(self):
+        self.yumdb.cookie.return_value = '1'
+        self._beg('pepper')
+        self.assertTrue(self.history.mark_yumdb_synced())
+        self.history.end('pepper-end', 0)
+        self.assertTrue(self.history.yumdb_synced('pepper-end'))
+        # the rpmdb changed
+        self.assertFalse(self.history.yumdb_synced('rpm-end'))
+        # the yumdb changed
+        self.yumdb.cookie.return_value = '2'
+        self.assertFalse(self.history.yumdb_synced('pepper-end'))
+
+    def test_yumdb_synced_unmarked(self):
+        self.yumdb.cookie.return_value = '1'
+        self.assertFalse(self.history.yumdb_synced('pepper-end'))
+        self._transaction('pepper')
+        self.assertFalse(self.history.yumdb_synced('pepper-end'))
+
+    def test_create_db_file(self):
+        self._transaction('pepper')
+        db_file = self.history._db_file
+        self.history.close()
+        # left behind by a crash:
+        for suffix in ('-wal', '-shm'):
+            open(db_file + suffix, 'w').close()
+
+        self.history._create_db_file()
+        self.assertEqual(self.history._db_file, db_file)
+        for suffix in ('', '-wal', '-shm'):
+            self.assertFile(db_file + suffix + '.old')
+        self.assertEqual(self.history.old(), [])
@@ -143,6 +143,14 @@ class TestFormatedOutput(TestCase):
 
     def test_exact_width(self):
         self.assertEqual(dnf.i18n.exact_width("重uř"), 4)
+        self.assertEqual(dnf.i18n.exact_width("message"), 7)
+        self.assertEqual(dnf.i18n.exact_width(""), 0)
+
+    def test_chop_str(self):
+        self.assertEqual(dnf.i18n.chop_str("message", 4), (4, "mess"))
+        self.assertEqual(dnf.i18n.chop_str("message", 0), (0, ""))
+        self.assertEqual(dnf.i18n.chop_str("重uř", 1), (0, ""))
+        self.assertEqual(dnf.i18n.chop_str("重uř", 3), (3, "重u"))
 
     def test_textwrap_fill(self):
         msg = "12345 67890"
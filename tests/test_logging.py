@@ -22,6 +22,7 @@ from tests.support import mock
 
 import dnf.const
 import dnf.logging
+import dnf.pycomp
 import logging
 import collections
 import operator
@@ -149,3 +150,15 @@ class TestLogging(support.TestCase):
                            self.logdir)
         # no new handlers
         self.assertEqual(cnt, len(logger.handlers))
+
+
+class TestTimer(support.TestCase):
+    @mock.patch('time.time', side_effect=(10.0, 10.5, 11.0))
+    def test_stage(self, _time):
+        stream = dnf.pycomp.StringIO()
+        parent = dnf.logging.Timer('sack setup')
+        stage = dnf.logging.Timer('sack load: main', parent)
+        with support.wiretap_logs('dnf', dnf.logging.DDEBUG, stream):
+            stage()
+        self.assertEqual(stream.getvalue(), 'timer: sack load: main: 500 ms '
+                         '(from +500 ms of sack setup)\n')
@@ -0,0 +1,55 @@
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from tests import support
+from tests.support import mock
+
+import dnf.rpm.miscutils
+
+MISCUTILS = 'dnf.rpm.miscutils.'
+
+class CheckSigsTest(support.TestCase):
+    @mock.patch(MISCUTILS + 'multiprocessing.cpu_count', return_value=4)
+    @mock.patch(MISCUTILS + 'multiprocessing.Pool')
+    @mock.patch(MISCUTILS + 'transaction.initReadOnlyTransaction')
+    @mock.patch(MISCUTILS + 'checkSig', side_effect=lambda ts, path: len(path))
+    def test_serial(self, check_sig, init_ts, pool, _cpu_count):
+        paths = ['/a.rpm', '/bb.rpm']
+        self.assertEqual(dnf.rpm.miscutils.checkSigs('/', paths), [6, 7])
+        self.assertFalse(pool.called)
+        init_ts.assert_called_once_with('/')
+        init_ts.return_value.close.assert_called_once_with()
+
+    @mock.patch(MISCUTILS + 'multiprocessing.cpu_count', return_value=4)
+    @mock.patch(MISCUTILS + 'multiprocessing.Pool')
+    def test_processes(self, pool, _cpu_count):
+        paths = ['/%d.rpm' % num for num in range(20)]
+        pool.return_value.map.return_value = [0] * len(paths)
+        self.assertEqual(dnf.rpm.miscutils.checkSigs('/', paths),
+                         [0] * len(paths))
+        self.assertEqual(pool.call_args[1]['processes'], 4)
+        pool.return_value.close.assert_called_once_with()
+        pool.return_value.join.assert_called_once_with()
+
+    @mock.patch(MISCUTILS + 'multiprocessing.cpu_count', return_value=64)
+    @mock.patch(MISCUTILS + 'multiprocessing.Pool')
+    def test_processes_packages(self, pool, _cpu_count):
+        paths = ['/%d.rpm' % num for num in range(10)]
+        dnf.rpm.miscutils.checkSigs('/', paths)
+        self.assertEqual(pool.call_args[1]['processes'], 10)
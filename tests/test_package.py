@@ -22,8 +22,12 @@ from tests import support
 from tests.support import mock
 
 import binascii
+import dnf.util
 import hawkey
+import os
 import rpm
+import shutil
+import tempfile
 
 TOUR_MD5 = binascii.unhexlify("68e9ded8ea25137c964a638f12e9987c")
 TOUR_SHA256 = binascii.unhexlify("ce77c1e5694b037b6687cf0ab812ca60431ec0b65116abbb7b82684f0b092d62")
@@ -85,6 +89,35 @@ class PackageTest(support.TestCase):
             self.pkg.chksum = (hawkey.CHKSUM_MD5, TOUR_WRONG_MD5)
             self.assertFalse(self.pkg.verifyLocalPkg())
 
+    def test_verify_cached(self):
+        with mock.patch.object(self.pkg, 'localPkg',
+                               return_value=support.TOUR_44_PKG_PATH):
+            self.pkg.chksum = (hawkey.CHKSUM_MD5, TOUR_MD5)
+            self.pkg.size = TOUR_SIZE
+            self.assertTrue(self.pkg.verifyLocalPkg())
+            with mock.patch('dnf.yum.misc.checksum') as checksum:
+                self.assertTrue(self.pkg.verifyLocalPkg())
+                self.assertFalse(checksum.called)
+                self.pkg.chksum = (hawkey.CHKSUM_MD5, TOUR_WRONG_MD5)
+                self.pkg.verifyLocalPkg()
+                self.assertTrue(checksum.called)
+
+    def test_verify_tampered(self):
+        tmpdir = tempfile.mkdtemp(prefix='dnf-package-test-')
+        self.addCleanup(dnf.util.rm_rf, tmpdir)
+        path = os.path.join(tmpdir, 'tour-4-4.noarch.rpm')
+        shutil.copy2(support.TOUR_44_PKG_PATH, path)
+        with mock.patch.object(self.pkg, 'localPkg', return_value=path):
+            self.pkg.chksum = (hawkey.CHKSUM_MD5, TOUR_MD5)
+            self.pkg.size = TOUR_SIZE
+            self.pkg._mark_verified()
+            self.assertTrue(self.pkg.verifyLocalPkg())
+            with open(path, 'r+b') as f:
+                f.seek(100)
+                f.write(b'tampered')
+            os.utime(path, (0, 0))
+            self.assertFalse(self.pkg.verifyLocalPkg())
+
     def test_return_id_sum(self):
         self.pkg.chksum = (hawkey.CHKSUM_MD5, TOUR_MD5)
         self.assertEqual(self.pkg.returnIdSum(),
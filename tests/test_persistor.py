@@ -37,6 +37,37 @@ class ClonableDictTest(tests.support.TestCase):
         self.assertNotEqual(g, g_c)
 
 
+class DeltaPersistorTest(tests.support.TestCase):
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp(prefix="dnf-deltaprst-test")
+        self.prst = dnf.persistor.DeltaPersistor(self.cachedir)
+
+    def tearDown(self):
+        dnf.util.rm_rf(self.cachedir)
+
+    def test_default(self):
+        self.assertIsNone(self.prst.throughput)
+        self.assertIsNone(self.prst.rebuild_rate)
+
+    def test_record(self):
+        prst = self.prst
+        prst.record_download(1000, 2)
+        self.assertEqual(prst.throughput, 500)
+        prst.record_download(1000, 0)
+        self.assertEqual(prst.throughput, 500)
+        prst.record_download(1000, 1)
+        self.assertAlmostEqual(prst.throughput, 500 + prst.SMOOTHING * 500)
+
+    def test_saving(self):
+        self.prst.record_download(1000, 2)
+        self.prst.record_rebuild(1000, 4)
+        self.assertTrue(self.prst.save())
+
+        prst = dnf.persistor.DeltaPersistor(self.cachedir)
+        self.assertEqual(prst.throughput, 500)
+        self.assertEqual(prst.rebuild_rate, 0.004)
+
+
 class GroupPersistorTest(tests.support.TestCase):
     def setUp(self):
         self.persistdir = tempfile.mkdtemp(prefix="dnf-groupprst-test.0.0.5")
@@ -108,6 +139,68 @@ class GroupDiffTest(tests.support.TestCase):
         self.assertEqual(removed, {'the': {'show': set([1])}, 'stop': set([3])})
 
 
+class MirrorPersistorTest(tests.support.TestCase):
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp(prefix="dnf-mirrorprst-test")
+        self.prst = dnf.persistor.MirrorPersistor(self.cachedir)
+
+    def tearDown(self):
+        dnf.util.rm_rf(self.cachedir)
+
+    def test_order(self):
+        prst = self.prst
+        urls = ['http://failing', 'http://slow', 'http://new', 'http://fast']
+        self.assertEqual(prst.order(urls), urls)
+
+        prst.record_failure('http://failing')
+        prst.record_transfer('http://slow', 1000, 10)
+        prst.record_transfer('http://fast', 1000, 1)
+        # the new one ranks as the average, to get its chance:
+        self.assertEqual(prst.order(urls), ['http://fast', 'http://new',
+                                            'http://slow', 'http://failing'])
+
+    def test_latency(self):
+        prst = self.prst
+        urls = ['http://far', 'http://near']
+        prst.record_transfer('http://far', 10 * 1024 ** 2, 1, latency=0.5)
+        prst.record_transfer('http://near', 10 * 1024 ** 2, 1, latency=0.05)
+        self.assertEqual(prst.order(urls), ['http://near', 'http://far'])
+
+    def test_recovery(self):
+        prst = self.prst
+        prst.record_failure('http://flaky')
+        prst.record_transfer('http://flaky', 1000, 1)
+        self.assertEqual(prst.order(['http://new', 'http://flaky']),
+                         ['http://flaky', 'http://new'])
+
+    def test_saving(self):
+        self.prst.record_failure('http://failing')
+        self.prst.record_transfer('http://fast', 1000, 1)
+        self.assertTrue(self.prst.save())
+
+        prst = dnf.persistor.MirrorPersistor(self.cachedir)
+        self.assertEqual(prst.order(['http://failing', 'http://fast']),
+                         ['http://fast', 'http://failing'])
+
+
+class RpmdbPersistorTest(tests.support.TestCase):
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp(prefix="dnf-rpmdbprst-test")
+        self.prst = dnf.persistor.RpmdbPersistor(self.cachedir)
+
+    def tearDown(self):
+        dnf.util.rm_rf(self.cachedir)
+
+    def test_version(self):
+        self.assertIsNone(self.prst.get_version('Packages:1:2:3'))
+        self.assertTrue(self.prst.set_version('Packages:1:2:3', '7:cafe'))
+
+        prst = dnf.persistor.RpmdbPersistor(self.cachedir)
+        self.assertEqual(prst.get_version('Packages:1:2:3'), '7:cafe')
+        self.assertIsNone(prst.get_version('Packages:1:2:4'))
+        self.assertIsNone(prst.get_version(None))
+
+
 class RepoPersistorTest(tests.support.TestCase):
     def setUp(self):
         self.persistdir = tempfile.mkdtemp(prefix="dnf-repoprst-test-")
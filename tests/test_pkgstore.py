@@ -0,0 +1,93 @@
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from tests import support
+from tests.support import mock
+
+import dnf.pkgstore
+import dnf.util
+import os
+import tempfile
+
+CHKSUM = '0123abcd'
+
+
+class PackageStoreTest(support.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='dnf-pkgstore-test-')
+        self.addCleanup(dnf.util.rm_rf, self.tmpdir)
+        self.store = dnf.pkgstore.PackageStore(
+            os.path.join(self.tmpdir, 'store'))
+
+    def package(self, repo):
+        pkg = mock.Mock()
+        pkg.returnIdSum.return_value = ('sha256', CHKSUM)
+        pkg.localPkg.return_value = os.path.join(self.tmpdir, repo,
+                                                 'tour-5-1.noarch.rpm')
+        pkg.verifyLocalPkg.side_effect = lambda: self.content(pkg) == 'tour'
+        return pkg
+
+    def content(self, pkg):
+        with open(pkg.localPkg()) as f:
+            return f.read()
+
+    def download(self, pkg, content='tour'):
+        dnf.util.ensure_dir(os.path.dirname(pkg.localPkg()))
+        with open(pkg.localPkg(), 'w') as f:
+            f.write(content)
+
+    def test_stored_path(self):
+        path = self.store.stored_path(self.package('r'))
+        self.assertEqual(path, os.path.join(self.tmpdir, 'store', 'sha256',
+                                            '01', CHKSUM))
+
+    def test_store_fetch(self):
+        pkg = self.package('r')
+        self.assertFalse(self.store.fetch(pkg))
+
+        self.download(pkg)
+        self.store.store(pkg)
+        self.assertFile(self.store.stored_path(pkg))
+
+        # the same package in a different repo:
+        other = self.package('s')
+        self.assertTrue(self.store.fetch(other))
+        stored = os.stat(self.store.stored_path(pkg))
+        self.assertEqual(os.stat(other.localPkg()).st_ino, stored.st_ino)
+
+    def test_store_unverified(self):
+        pkg = self.package('r')
+        self.download(pkg, 'broken')
+        self.store.store(pkg)
+        self.assertFalse(os.path.exists(self.store.stored_path(pkg)))
+
+    def test_fetch_tampered(self):
+        pkg = self.package('r')
+        self.download(pkg)
+        self.store.store(pkg)
+        stored = self.store.stored_path(pkg)
+        os.unlink(pkg.localPkg())
+        with open(stored, 'a') as f:
+            f.write('evil')
+
+        other = self.package('s')
+        self.assertFalse(self.store.fetch(other))
+        self.assertTrue(other.verifyLocalPkg.called)
+        self.assertFalse(os.path.exists(other.localPkg()))
+        self.assertFalse(os.path.exists(stored))
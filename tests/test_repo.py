@@ -210,6 +210,24 @@ class RepoTest(RepoTestMixin, support.TestCase):
         self.assertTrue(os.path.isfile(repomd))
         self.assertTrue(repo.metadata.fresh)
 
+    def test_load_incremental(self):
+        repo = self.repo
+        self.assertTrue(repo.load())
+        repo.md_expire_cache()
+
+        reused = []
+        reuse_md_file = repo._reuse_md_file
+        def reuse(what, record, destdir):
+            if reuse_md_file(what, record, destdir):
+                reused.append(what)
+                return True
+            return False
+        with mock.patch.object(repo, '_reuse_md_file', reuse):
+            self.assertTrue(repo.load())
+        self.assertIn('primary', reused)
+        self.assertTrue(repo.metadata.fresh)
+        self.assertFile(repo.metadata.primary_fn)
+
     def test_load_badconf(self):
         self.repo.baseurl = []
         self.assertRaises(dnf.exceptions.RepoError, self.repo.load)
@@ -310,6 +328,52 @@ class RepoTest(RepoTestMixin, support.TestCase):
         h = repo._handle_new_pkg_download()
         self.assertIsNone(h.mirrorlist)
 
+    def test_handle_mirror_stats(self):
+        repo = self.repo
+        repo.mirrorlist = 'http://anything'
+        repo.metadata = mock.Mock()
+        repo.metadata.mirrors = ['http://slow', 'http://fast']
+        repo.mirror_stats = mock.Mock()
+        repo.mirror_stats.order.return_value = ['http://fast', 'http://slow']
+        opts = {}
+        with mock.patch('librepo.Handle.setopt', opts.__setitem__):
+            repo.get_handle()
+        self.assertEqual(opts[librepo.LRO_URLS], ['http://fast', 'http://slow'])
+        self.assertNotIn(librepo.LRO_MIRRORLIST, opts)
+
+        repo._record_mirror_failure('http://slow/Packages/tour.rpm')
+        repo.mirror_stats.record_failure.assert_called_once_with('http://slow')
+
+    def test_handle_mirror_stats_metadata(self):
+        repo = self.repo
+        repo.mirrorlist = 'http://anything'
+        repo.metadata = mock.Mock()
+        repo.metadata.mirrors = ['http://slow', 'http://fast']
+        repo.mirror_stats = mock.Mock()
+        repo.mirror_stats.order.return_value = ['http://fast', 'http://slow']
+        opts = {}
+        with mock.patch('librepo.Handle.setopt', opts.__setitem__):
+            repo._handle_new_remote('/bag')
+        # the known mirrors first, the fresh list still resolved:
+        self.assertEqual(opts[librepo.LRO_URLS], ['http://fast', 'http://slow'])
+        self.assertEqual(opts[librepo.LRO_MIRRORLIST], 'http://anything')
+        self.assertNotIn(librepo.LRO_FASTESTMIRROR, opts)
+
+        repo.mirror_stats = None
+        opts.clear()
+        with mock.patch('librepo.Handle.setopt', opts.__setitem__):
+            repo._handle_new_remote('/bag')
+        self.assertNotIn(librepo.LRO_URLS, opts)
+        self.assertIn(librepo.LRO_FASTESTMIRROR, opts)
+
+    def test_payload_latency(self):
+        pload = dnf.repo.RPMPayload(mock.Mock(), mock.Mock())
+        with mock.patch('time.time', side_effect=[10.0, 10.2, 11.0]):
+            pload._progress_cb(None, 100, 0)
+            pload._progress_cb(None, 100, 50)
+            pload._progress_cb(None, 100, 100)
+        self.assertAlmostEqual(pload.latency, 0.2)
+
     def test_throttle(self):
         self.repo.throttle = '50%'
         self.repo.bandwidth = '10M'
@@ -439,6 +503,28 @@ class MDPayloadTest(unittest.TestCase):
         self.assertIsNotNone(pload.progress)
 
 
+class RPMPayloadTest(unittest.TestCase):
+    def _payload(self, chksum_type):
+        pkg = mock.Mock()
+        pkg.returnIdSum.return_value = (chksum_type, 'abcd')
+        return dnf.repo.RPMPayload(pkg, dnf.callback.NullDownloadProgress())
+
+    def test_end_cb_verified(self):
+        pload = self._payload('sha256')
+        pload._end_cb(None, librepo.TRANSFER_SUCCESSFUL, None)
+        self.assertTrue(pload.pkg._mark_verified.called)
+
+    def test_end_cb_unknown_checksum(self):
+        pload = self._payload('nosuchsum')
+        pload._end_cb(None, librepo.TRANSFER_SUCCESSFUL, None)
+        self.assertFalse(pload.pkg._mark_verified.called)
+
+    def test_end_cb_failed(self):
+        pload = self._payload('sha256')
+        pload._end_cb(None, librepo.TRANSFER_ERROR, 'Curl error')
+        self.assertFalse(pload.pkg._mark_verified.called)
+
+
 class SavingTest(unittest.TestCase):
     def test_update_saving(self):
         progress = dnf.callback.NullDownloadProgress()
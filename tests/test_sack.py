@@ -22,7 +22,42 @@ from tests.support import mock
 
 import dnf.exceptions
 import dnf.repo
+import dnf.rpm
 import dnf.sack
+import dnf.util
+import os
+import tempfile
+
+class RpmdbCookieTest(support.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='dnf-cookie-test-')
+        self.addCleanup(dnf.util.rm_rf, self.root)
+        self.dbfile = os.path.join(self.root, 'var/lib/rpm/rpmdb.sqlite')
+        os.makedirs(os.path.dirname(self.dbfile))
+        dnf.util.touch(self.dbfile)
+
+    def _cookie(self, yumdb=None):
+        with mock.patch('rpm.expandMacro', return_value='/var/lib/rpm'):
+            return dnf.rpm.rpmdb_cookie(self.root, yumdb)
+
+    def test_missing(self):
+        os.unlink(self.dbfile)
+        self.assertIsNone(self._cookie())
+
+    def test_wal(self):
+        cookie = self._cookie()
+        with open(self.dbfile + '-wal', 'w') as wal:
+            wal.write('frame')
+        self.assertNotEqual(self._cookie(), cookie)
+
+    def test_yumdb(self):
+        yumdb = mock.Mock()
+        yumdb.cookie.return_value = 'one'
+        cookie = self._cookie(yumdb)
+        self.assertNotEqual(self._cookie(), cookie)
+        yumdb.cookie.return_value = 'two'
+        self.assertNotEqual(self._cookie(yumdb), cookie)
+
 
 class SackTest(support.TestCase):
     def test_rpmdb_version(self):
@@ -0,0 +1,109 @@
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from tests import support
+from tests.support import mock
+
+import dnf.search_index
+import dnf.util
+import os
+import tempfile
+
+
+def package(name, summary, description=None, url=None):
+    pkg = mock.Mock(summary=summary, description=description, url=url)
+    # 'name' is taken by the Mock constructor:
+    pkg.name = name
+    return pkg
+
+
+class SearchIndexTest(support.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='dnf-search-index-test-')
+        self.addCleanup(dnf.util.rm_rf, self.tmpdir)
+        self.index = dnf.search_index.SearchIndex(
+            os.path.join(self.tmpdir, 'main-search.sqlite'))
+        self.addCleanup(self.index.close)
+        pkgs = [package('pepper', 'Hot pepper', 'Make a reservation.'),
+                package('pepper', 'Hot pepper', 'An invitation.'),
+                package('tour', 'A Tour', None, 'http://tour.example.com'),
+                package('lotus', 'Tourist lotus, abcxbcd')]
+        self.index.build(pkgs, 'cookie')
+
+    def test_cookie(self):
+        self.assertEqual(self.index.cookie(), 'cookie')
+        index = dnf.search_index.SearchIndex(
+            os.path.join(self.tmpdir, 'other-search.sqlite'))
+        self.assertIsNone(index.cookie())
+
+    def test_names(self):
+        self.assertEqual(self.index.names('description', 'ATION'),
+                         set(['pepper']))
+        self.assertEqual(self.index.names('summary', 'a tou'),
+                         set(['tour', 'lotus']))
+        self.assertEqual(self.index.names('summary', 'tour lot'),
+                         set(['lotus']))
+        self.assertEqual(self.index.names('url', 'example'), set(['tour']))
+        self.assertEqual(self.index.names('name', 'otu'), set(['lotus']))
+        self.assertEmpty(self.index.names('name', 'rose'))
+        self.assertIsNone(self.index.names('name', ' '))
+
+    def test_names_grams(self):
+        # all the substrings of 'abcd' are in 'abcxbcd', abcd itself is not:
+        self.assertEmpty(self.index.names('summary', 'abcd'))
+        self.assertEqual(self.index.names('summary', 'bcxb'), set(['lotus']))
+
+    def test_names_short(self):
+        self.assertIsNone(self.index.names('summary', 'o'))
+        self.assertIsNone(self.index.names('summary', 'a to'))
+
+
+class RepoIndexTest(support.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='dnf-search-index-test-')
+        self.addCleanup(dnf.util.rm_rf, self.tmpdir)
+        self.base = mock.Mock()
+        self.base.conf.cachedir = self.tmpdir
+        self.repo = mock.Mock(id='main')
+        self.repo.metadata.repomd_fn = os.path.join(self.tmpdir, 'repomd.xml')
+        with open(self.repo.metadata.repomd_fn, 'w') as repomd:
+            repomd.write('revision 1')
+
+    @mock.patch('dnf.search_index._repo_packages')
+    def test_repo_index(self, repo_packages):
+        repo_packages.return_value = [package('tour', 'A Tour')]
+        index = dnf.search_index.repo_index(self.base, self.repo)
+        self.addCleanup(index.close)
+        # the excludes of the sack of the base do not matter:
+        self.assertFalse(self.base.sack.query.called)
+        repo_packages.assert_called_once_with(self.base, self.repo)
+        self.assertEqual(index.names('summary', 'tour'), set(['tour']))
+
+        index = dnf.search_index.repo_index(self.base, self.repo)
+        self.addCleanup(index.close)
+        self.assertEqual(repo_packages.call_count, 1)
+
+        with open(self.repo.metadata.repomd_fn, 'w') as repomd:
+            repomd.write('revision 2')
+        dnf.search_index.repo_index(self.base, self.repo).close()
+        self.assertEqual(repo_packages.call_count, 2)
+
+    def test_no_metadata(self):
+        self.repo.metadata = None
+        self.assertIsNone(dnf.search_index.repo_index(self.base, self.repo))
@@ -54,3 +54,21 @@ class SubjectTest(support.TestCase):
         for sltr in sltrs:
             for pkg in sltr.matches():
                 self.assertEqual(pkg.evr, '1-1')
+
+class ResolveSpecsTest(support.TestCase):
+    def setUp(self):
+        self.sack = support.mock_sack('main')
+
+    def test_resolve_specs(self):
+        specs = ['pepper', 'tour', 'lotus.x86_64', 'p*', 'no-such-package']
+        queries = dnf.subject.resolve_specs(self.sack, specs)
+        for (spec, query) in zip(specs, queries):
+            subj = dnf.subject.Subject(spec)
+            self.assertCountEqual(query, subj.get_best_query(self.sack))
+
+    def test_memoized(self):
+        subj = dnf.subject.Subject('pepper')
+        subj.get_best_query(self.sack)
+        self.assertLength(self.sack._subject_cache, 1)
+        self.sack.add_excludes(self.sack.query().filter(name='tour'))
+        self.assertEmpty(self.sack._subject_cache)
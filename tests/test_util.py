@@ -160,6 +160,22 @@ class Util(support.TestCase):
         self.assertIsInstance(out, list)
         self.assertEqual(out, [2, 4, 6])
 
+    def test_parallel_imap(self):
+        l = list(range(10))
+        out = dnf.util.parallel_imap(lambda n: 2 * n, l, 3)
+        self.assertEqual(list(out), [2 * n for n in l])
+
+    def test_parallel_imap_raises(self):
+        def fn(n):
+            if n in (3, 7):
+                raise ValueError(n)
+            return n
+        out = dnf.util.parallel_imap(fn, range(10), 4)
+        self.assertEqual([next(out) for _ in range(3)], [0, 1, 2])
+        with self.assertRaises(ValueError) as ctx:
+            next(out)
+        self.assertEqual(ctx.exception.args, (3,))
+
     def test_partition(self):
         l = list(range(6))
         smaller, larger = dnf.util.partition(lambda i: i > 4, l)
@@ -20,7 +20,11 @@ from __future__ import unicode_literals
 from tests import support
 from tests.support import mock
 
+import dnf.util
+import dnf.yum.misc
 import dnf.yum.rpmsack
+import os
+import tempfile
 import unittest
 
 
@@ -43,3 +47,167 @@ class TestAdditionalPkgDB(unittest.TestCase):
         directory = pkgdb._get_dir_name(pkg.pkgtup, None)
         self.assertEqual('%s/yumdb/p/<nopkgid>-pepper-20-0-x86_64' %
                          base.conf.persistdir, directory)
+
+
+class TestAdditionalPkgDBTree(support.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='dnf-yumdb-test-')
+        self.addCleanup(dnf.util.rm_rf, self.tmpdir)
+        self.pkg = mock.Mock(pkgtup=('pepper', 'x86_64', '0', '20', '0'),
+                             pkgid='bad9')
+
+    def _assertChanges(self, yumdb, path, fn):
+        cookie = yumdb.cookie()
+        if os.path.exists(path):
+            # stat times can be too coarse to tell two quick writes apart:
+            os.utime(path, (0, 0))
+            cookie = yumdb.cookie()
+        fn()
+        self.assertNotEqual(yumdb.cookie(), cookie)
+
+    def test_cookie_files(self):
+        path = os.path.join(self.tmpdir, 'yumdb')
+        yumdb = dnf.yum.rpmsack.AdditionalPkgDB(path)
+        stamp = os.path.join(path, yumdb.CHANGED_STAMP)
+        pkgdb = yumdb.get_package(self.pkg)
+        self._assertChanges(yumdb, stamp,
+                            lambda: setattr(pkgdb, 'reason', 'user'))
+        self._assertChanges(yumdb, stamp, lambda: delattr(pkgdb, 'reason'))
+
+    def test_cookie_write_attrs(self):
+        other = mock.Mock(pkgtup=('tour', 'noarch', '0', '5', '0'),
+                          pkgid='ee1')
+        yumdb = dnf.yum.rpmsack.AdditionalPkgDB(
+            os.path.join(self.tmpdir, 'yumdb'))
+        with mock.patch('dnf.util.touch') as touch:
+            yumdb.write_attrs([(self.pkg, 'reason', 'dep'),
+                               (self.pkg, 'from_repo', 'main'),
+                               (other, 'reason', 'user')])
+        # one stamp for the whole batch:
+        self.assertEqual(touch.call_count, 1)
+        self.assertEqual(yumdb.read_attrs([self.pkg, other], 'reason'),
+                         ['dep', 'user'])
+
+    def _assertOutsideChange(self, open_db, path):
+        writer = open_db()
+        writer.write_attrs([(self.pkg, 'reason', 'dep')])
+        os.utime(path, (0, 0))
+        yumdb = open_db()
+        self.assertEqual(yumdb.read_attrs([self.pkg], 'reason'), ['dep'])
+        # another process changes the value:
+        writer.write_attrs([(self.pkg, 'reason', 'user')])
+        self.assertEqual(yumdb.read_attrs([self.pkg], 'reason'), ['user'])
+        self.assertEqual(yumdb.get_package(self.pkg).reason, 'user')
+
+    def test_stale_cache_files(self):
+        path = os.path.join(self.tmpdir, 'yumdb')
+        self._assertOutsideChange(
+            lambda: dnf.yum.rpmsack.AdditionalPkgDB(path),
+            os.path.join(path, dnf.yum.rpmsack.AdditionalPkgDB.CHANGED_STAMP))
+
+    def test_stale_cache_sqlite(self):
+        db_file = os.path.join(self.tmpdir, 'yumdb.sqlite')
+        self._assertOutsideChange(
+            lambda: dnf.yum.rpmsack.SqliteAdditionalPkgDB(db_file), db_file)
+
+    def test_cookie_sqlite(self):
+        db_file = os.path.join(self.tmpdir, 'yumdb.sqlite')
+        yumdb = dnf.yum.rpmsack.SqliteAdditionalPkgDB(db_file)
+        pkgdb = yumdb.get_package(self.pkg)
+        self._assertChanges(yumdb, db_file,
+                            lambda: setattr(pkgdb, 'reason', 'user'))
+        self._assertChanges(yumdb, db_file, lambda: delattr(pkgdb, 'reason'))
+
+    def test_get_attrs(self):
+        path = os.path.join(self.tmpdir, 'yumdb')
+        yumdb = dnf.yum.rpmsack.AdditionalPkgDB(path)
+        yumdb.get_package(self.pkg).reason = 'dep'
+        other = mock.Mock(pkgtup=('tour', 'noarch', '0', '5', '0'),
+                          pkgid='ee1')
+        yumdb = dnf.yum.rpmsack.AdditionalPkgDB(path)
+        with mock.patch('dnf.yum.misc.stat_f',
+                        wraps=dnf.yum.misc.stat_f) as stat_f:
+            attrs = yumdb.get_attrs([self.pkg, other], ('reason', 'from_repo'))
+        self.assertEqual(attrs, {self.pkg : {'reason' : 'dep'}, other : {}})
+        # only the one file there is gets read, next to the cookie stamp:
+        stamp = os.path.join(path, yumdb.CHANGED_STAMP)
+        reason_fn = yumdb.get_package(self.pkg)._attr2fn('reason')
+        self.assertCountEqual([call[0][0] for call in stat_f.call_args_list],
+                              [stamp, reason_fn])
+
+
+class TestSqliteAdditionalPkgDB(support.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='dnf-yumdb-test-')
+        self.addCleanup(dnf.util.rm_rf, self.tmpdir)
+        self.tree_path = os.path.join(self.tmpdir, 'yumdb')
+        self.pkg = mock.Mock(pkgtup=('pepper', 'x86_64', '0', '20', '0'),
+                             pkgid='bad9')
+
+    def _instantiate(self):
+        return dnf.yum.rpmsack.SqliteAdditionalPkgDB(
+            self.tree_path + '.sqlite', self.tree_path)
+
+    def test_attributes(self):
+        yumdb = self._instantiate()
+        pkgdb = yumdb.get_package(self.pkg)
+        self.assertNotIn('reason', pkgdb)
+        pkgdb.reason = 'user'
+        self.assertEqual(yumdb.get_package(self.pkg).reason, 'user')
+        self.assertCountEqual(pkgdb, ['reason'])
+        del pkgdb.reason
+        self.assertIsNone(yumdb.get_package(self.pkg).get('reason'))
+
+    def test_bulk(self):
+        other = mock.Mock(pkgtup=('tour', 'noarch', '0', '5', '0'),
+                          pkgid='ee1')
+        yumdb = self._instantiate()
+        yumdb.write_attrs([(self.pkg, 'reason', 'dep'),
+                           (self.pkg, 'from_repo', 'main')])
+        self.assertEqual(yumdb.read_attrs([other, self.pkg], 'reason'),
+                         [None, 'dep'])
+
+    def test_migrate(self):
+        tree = dnf.yum.rpmsack.AdditionalPkgDB(self.tree_path)
+        tree.get_package(self.pkg).reason = 'user'
+        tree.get_package(self.pkg).from_repo = 'main'
+
+        yumdb = self._instantiate()
+        pkgdb = yumdb.get_package(self.pkg)
+        self.assertEqual(pkgdb.reason, 'user')
+        self.assertEqual(pkgdb.from_repo, 'main')
+
+    def test_get_attrs(self):
+        other = mock.Mock(pkgtup=('tour', 'noarch', '0', '5', '0'),
+                          pkgid='ee1')
+        yumdb = self._instantiate()
+        yumdb.get_package(self.pkg).reason = 'dep'
+        attrs = yumdb.get_attrs([self.pkg, other], ('reason', 'from_repo'))
+        self.assertEqual(attrs, {self.pkg : {'reason' : 'dep'}, other : {}})
+
+        # writes go through the cache:
+        yumdb.get_package(other).reason = 'user'
+        del yumdb.get_package(self.pkg).reason
+        attrs = yumdb.get_attrs([self.pkg, other], ('reason',))
+        self.assertEqual(attrs, {self.pkg : {}, other : {'reason' : 'user'}})
+
+    def test_get_attrs_chunks(self):
+        pkgs = [mock.Mock(pkgtup=('pkg%d' % num, 'noarch', '0', '1', '1'),
+                          pkgid='%d' % num) for num in range(5)]
+        yumdb = self._instantiate()
+        yumdb.write_attrs([(pkg, 'reason', pkg.pkgtup[0]) for pkg in pkgs])
+        yumdb = self._instantiate()
+        yumdb.KEYS_CHUNK = 2
+        self.assertEqual(yumdb.read_attrs(pkgs[:3], 'reason'),
+                         ['pkg0', 'pkg1', 'pkg2'])
+        # only the packages asked for are read:
+        self.assertLength(yumdb._attr_cache, 3)
+
+    def test_missing_dir(self):
+        db_file = os.path.join(self.tmpdir, 'var', 'lib', 'yum', 'yumdb.sqlite')
+        yumdb = dnf.yum.rpmsack.SqliteAdditionalPkgDB(db_file)
+        self.assertTrue(yumdb.writable)
+        yumdb.get_package(self.pkg).reason = 'user'
+        self.assertTrue(os.path.exists(db_file))
+        yumdb = dnf.yum.rpmsack.SqliteAdditionalPkgDB(db_file)
+        self.assertEqual(yumdb.get_package(self.pkg).reason, 'user')